@@ -2,19 +2,44 @@
 # Authentication and authorization utilities for the NYPD Citation system.
 # =========================================================
 
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from cache import TTLCache
+import models
 
 # Secret key
 SECRET_KEY = "WSP_SECRET_KEY"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Verified tokens are cached by digest until they expire
+TOKEN_CACHE_MAXSIZE = int(os.getenv("TOKEN_CACHE_MAXSIZE", "10000"))
+
+# Password hashing cost and the process pool bcrypt runs in
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "64"))
+HASH_TIMEOUT = float(os.getenv("HASH_TIMEOUT", "5"))
+
+# Hashes with a different cost than BCRYPT_ROUNDS are reported by needs_update and rehashed on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+verified_tokens = TTLCache("verified_tokens", maxsize=TOKEN_CACHE_MAXSIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
 
 # Password hashing logic
 def verify_password(plain_password, hashed_password):
@@ -23,6 +48,76 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password, hashed_password):
+    """ Verify a password, returning (valid, new_hash). new_hash is set when the stored hash should be upgraded. """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+# ========================================================
+# --- Password hashing pool ---
+
+_hash_pool = None
+_hash_pending = 0
+
+def init_hash_pool():
+    """ Create the process pool used for password verification. Safe to call more than once. """
+    global _hash_pool
+    if _hash_pool is None:
+        # Spawned workers do not inherit the event loop or the database pools of the API process
+        _hash_pool = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _hash_pool
+
+def close_hash_pool():
+    """ Shut down the password hashing pool, dropping verifications that have not started. """
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
+
+def hash_pool_stats():
+    """ Return the size and backlog of the password hashing pool. """
+    return {
+        "workers": HASH_WORKERS,
+        "pending": _hash_pending,
+        "max_pending": HASH_MAX_PENDING,
+        "timeout": HASH_TIMEOUT,
+        "rounds": BCRYPT_ROUNDS,
+    }
+
+async def verify_password_async(plain_password, hashed_password):
+    """
+    Verify a password in the hashing pool, returning (valid, new_hash).
+
+    At most HASH_MAX_PENDING verifications are queued or running at once, and each must
+    finish within HASH_TIMEOUT seconds, otherwise the login is rejected with 503 so a login
+    storm cannot starve the rest of the API.
+    """
+    global _hash_pending
+    if not hashed_password:
+        return False, None
+
+    busy_exception = HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many logins in progress, try again shortly",
+        headers={"Retry-After": "1"},
+    )
+    if _hash_pending >= HASH_MAX_PENDING:
+        raise busy_exception
+
+    pool = init_hash_pool()
+    _hash_pending += 1
+    try:
+        return await asyncio.wait_for(
+            asyncio.get_running_loop().run_in_executor(pool, verify_and_update_password, plain_password, hashed_password),
+            HASH_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        raise busy_exception
+    finally:
+        _hash_pending -= 1
+
+# --- End of Password hashing pool ---
+# ========================================================
+
 # JWT token creation
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -31,8 +126,23 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def principal_claims(principal: models.Principal):
+    """ Return the claims to put in a new token for a principal, e.g. when refreshing it. """
+    claims = {"sub": principal.username, "user_type": principal.user_type}
+    if principal.Officer_ID is not None:
+        claims["Officer_ID"] = principal.Officer_ID
+    if principal.Driver_ID is not None:
+        claims["Driver_ID"] = principal.Driver_ID
+    return claims
+
 # Token verification
-def verify_token(token: str = Depends(oauth2_scheme)):
+async def get_current_principal(token: str = Depends(oauth2_scheme)) -> models.Principal:
+    """ Return the principal of a bearer token, decoding it only the first time it is seen. """
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    principal = verified_tokens.get(digest)
+    if principal is not None:
+        return principal
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -40,14 +150,30 @@ def verify_token(token: str = Depends(oauth2_scheme)):
     )
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        print(f"DEBUG: Decoded Payload: {payload}")
-        username: str = payload.get("sub")
-        if username is None:
-            print("DEBUG: Sub not found in payload")
-            raise credentials_exception
-        return username
-    except JWTError as e:
-        print(f"DEBUG: JWT Error: {e}")
+    except JWTError:
         raise credentials_exception
+
+    username = payload.get("sub")
+    if username is None:
+        raise credentials_exception
+
+    # Tokens issued before the identity claims were added only carry the subject
+    principal = models.Principal(
+        username=username,
+        user_type=payload.get("user_type"),
+        Officer_ID=payload.get("Officer_ID"),
+        Driver_ID=payload.get("Driver_ID"),
+    )
+
+    # Never keep a token in the cache past its own expiry
+    expires = payload.get("exp")
+    ttl = expires - time.time() if isinstance(expires, (int, float)) else None
+    if ttl is None or ttl > 0:
+        verified_tokens.set(digest, principal, ttl=ttl)
+    return principal
+
+async def verify_token(principal: models.Principal = Depends(get_current_principal)):
+    """ Return the username (badge or license number) of the current token. """
+    return principal.username
     
-# end of auth.py
\ No newline at end of file
+# end of auth.py
@@ -0,0 +1,113 @@
+# bench_async_db.py
+# Benchmark comparing the synchronous (threadpool) and asyncio database layers.
+# Run against the docker-compose MySQL: python -m benchmarks.bench_async_db
+# =========================================================
+
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import database.database as database
+import database.async_database as async_database
+
+# Simulates a request that spends most of its time waiting on MySQL
+QUERY = "SELECT SLEEP(%s) AS waited, COUNT(*) AS drivers FROM Driver"
+
+
+def percentile(samples, pct):
+    """ Return the pct-th percentile of a list of samples. """
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(mode, requests, elapsed, latencies):
+    """ Print one line of results for a benchmark run. """
+    print(
+        f"{mode:<6} requests={requests:<6} elapsed={elapsed:7.3f}s "
+        f"throughput={requests / elapsed:9.1f} req/s "
+        f"p50={statistics.median(latencies) * 1000:7.2f}ms "
+        f"p99={percentile(latencies, 99) * 1000:7.2f}ms"
+    )
+
+
+# ========================================================
+# --- Sync mode: one threadpool worker blocked per request ---
+
+def run_sync(requests, concurrency, threads, delay):
+    """ Run requests through the sync helpers on a bounded threadpool, like Starlette does for def endpoints. """
+    database.POOL_SIZE = concurrency
+    database.close_pool()
+    pool = database.init_pool()
+    latencies = []
+
+    def handle():
+        started = time.perf_counter()
+        connection = pool.acquire()
+        try:
+            database.execute_query(connection, QUERY, (delay,), fetch="one")
+        finally:
+            pool.release(connection)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for future in [executor.submit(handle) for _ in range(requests)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    database.close_pool()
+    report("sync", requests, elapsed, latencies)
+
+# --- End of Sync mode ---
+# ========================================================
+# --- Async mode: coroutines waiting on I/O without holding a thread ---
+
+async def run_async(requests, concurrency, delay):
+    """ Run requests through the async helpers with `concurrency` requests in flight. """
+    async_database.POOL_SIZE = concurrency
+    await async_database.close_pool()
+    pool = await async_database.init_pool()
+    limiter = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def handle():
+        async with limiter:
+            started = time.perf_counter()
+            connection = await pool.acquire()
+            try:
+                await async_database.execute_query(connection, QUERY, (delay,), fetch="one")
+                await connection.rollback()
+            finally:
+                pool.release(connection)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(handle() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    await async_database.close_pool()
+    report("async", requests, elapsed, latencies)
+
+# --- End of Async mode ---
+# ========================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sync and async database layers.")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100, help="Requests in flight / connections")
+    parser.add_argument("--threads", type=int, default=40, help="Threadpool size for sync mode (Starlette default is 40)")
+    parser.add_argument("--delay", type=float, default=0.02, help="Simulated per-query server time in seconds")
+    args = parser.parse_args()
+
+    print(f"Benchmarking {args.requests} requests, concurrency {args.concurrency}, query delay {args.delay}s")
+    run_sync(args.requests, args.concurrency, args.threads, args.delay)
+    asyncio.run(run_async(args.requests, args.concurrency, args.delay))
+
+
+if __name__ == "__main__":
+    main()
+
+# end of bench_async_db.py
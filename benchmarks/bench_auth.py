@@ -0,0 +1,59 @@
+# bench_auth.py
+# Microbenchmark of the per-request cost of bearer token verification.
+# Compares a full jwt.decode on every request (the previous verify_token) with the
+# verified-token cache in auth.get_current_principal. Needs no database:
+#   python -m benchmarks.bench_auth --requests 100000 --tokens 50
+# =========================================================
+
+import argparse
+import asyncio
+import time
+
+from jose import jwt
+
+import auth
+
+
+def decode_every_time(token):
+    """ The previous verification path: decode and check the signature on every request. """
+    payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+    return payload.get("sub")
+
+
+async def cached(tokens, requests):
+    """ Verify `requests` tokens through auth.get_current_principal. """
+    for number in range(requests):
+        await auth.get_current_principal(tokens[number % len(tokens)])
+
+
+def report(label, elapsed, requests):
+    print(f"{label:<22} {requests} requests in {elapsed:7.3f}s  {elapsed / requests * 1_000_000:8.2f} us/request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure token verification overhead per request.")
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--tokens", type=int, default=50, help="Distinct tokens, i.e. concurrently logged in users")
+    args = parser.parse_args()
+
+    tokens = [
+        auth.create_access_token({"sub": f"B{number:05d}", "user_type": "officer", "Officer_ID": number})
+        for number in range(args.tokens)
+    ]
+
+    started = time.perf_counter()
+    for number in range(args.requests):
+        decode_every_time(tokens[number % len(tokens)])
+    report("decode every request", time.perf_counter() - started, args.requests)
+
+    auth.verified_tokens.clear()
+    started = time.perf_counter()
+    asyncio.run(cached(tokens, args.requests))
+    report("cached principal", time.perf_counter() - started, args.requests)
+    print(f"token cache: {auth.verified_tokens.stats()}")
+
+
+if __name__ == "__main__":
+    main()
+
+# end of bench_auth.py
@@ -0,0 +1,243 @@
+# bench_backends.py
+# Compares the MySQL and SQLite backends (DATABASE_BACKEND) on the same seeded data.
+# Generates one deterministic data set with database.seed, then for each backend, in a fresh
+# process: migrates, loads the data set, builds Citation_View and sends the load test's read and
+# write requests through the API in process (httpx ASGITransport, so no network or server
+# process is involved). Tokens are issued directly, so bcrypt logins do not drown out the
+# database work. Reports load time and p50/p95/p99 latency and throughput per endpoint:
+#   python -m benchmarks.bench_backends --notices 100000 --requests 2000 --out backends.json
+#   python -m benchmarks.bench_backends --backends sqlite --concurrency 1
+# MySQL must be the docker-compose server with an empty, migrated database, or pass --truncate.
+#
+# Recorded so far, SQLite only (100k notices, 1000 requests, concurrency 8): GET /citations p50
+# 15.7ms 452 req/s, GET /citations/driver p50 9.1ms 743 req/s, GET /notices/officer p50 86ms
+# 50 req/s, POST /citations p50 4.3ms p99 182ms 432 req/s. The MySQL side of the comparison
+# has not been run yet, so there are no MySQL numbers to compare against.
+# =========================================================
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.load_test import Users, build_operations, git_commit, summarize
+from database import seed
+
+# The load test's endpoints without POST /token, officer logins are bcrypt bound on any backend
+ENDPOINTS = [
+    "GET /citations",
+    "GET /citations/driver/{license}",
+    "GET /notices/officer/{badge}",
+    "POST /citations",
+]
+
+
+def data_set_size(args):
+    """ Return (officers, drivers, vehicles) for --notices, with the defaults of database.seed. """
+    officers = max(10, args.notices // 2000)
+    drivers = max(100, args.notices // 4)
+    return officers, drivers, int(drivers * 1.1)
+
+# ========================================================
+# --- Worker, one backend per process ---
+
+def load_data(args, officers, drivers):
+    """ Migrate and load the generated data set into the configured backend. Returns the seconds taken. """
+    import database.database as database
+    from database import migrate, read_model
+
+    connection = seed.connect()
+    try:
+        migrate.migrate(connection)
+        if args.truncate:
+            seed.truncate(connection)
+        elif seed.non_empty_tables(connection):
+            raise SystemExit("Tables already have rows, use --truncate to replace them")
+
+        started = time.perf_counter()
+        seed.load(connection, args.data, "insert" if database.DATABASE_BACKEND == "sqlite" else "infile")
+        read_model.rebuild(connection)
+        return time.perf_counter() - started
+    finally:
+        connection.close()
+
+
+def issue_tokens(officers, drivers, sample):
+    """ Return Users holding tokens for `sample` officers and drivers of the data set, without logging in. """
+    import auth
+
+    users = Users()
+    for officer_id in range(1, min(officers, sample) + 1):
+        token = auth.create_access_token({"sub": seed.badge_for(officer_id), "user_type": "officer", "Officer_ID": officer_id})
+        users.officers.append((seed.badge_for(officer_id), {"Authorization": f"Bearer {token}"}))
+    for driver_id in range(1, min(drivers, sample) + 1):
+        token = auth.create_access_token({"sub": seed.license_for(driver_id), "user_type": "driver", "Driver_ID": driver_id})
+        users.drivers.append((seed.license_for(driver_id), {"Authorization": f"Bearer {token}"}))
+    return users
+
+
+async def measure(client, operation, args):
+    """ Send --requests requests from --concurrency closed-loop clients. Returns (samples, elapsed seconds). """
+    samples = []
+    numbers = iter(range(args.warmup + args.requests))
+
+    async def client_loop(worker):
+        rng = random.Random(f"{args.seed}:{worker}")
+        for number in numbers:
+            started = time.perf_counter()
+            try:
+                status = (await operation(client, rng, number)).status_code
+            except httpx.HTTPError:
+                status = 0
+            if number >= args.warmup:
+                samples.append((time.perf_counter() - started, status))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop(worker) for worker in range(args.concurrency)))
+    return samples, time.perf_counter() - started
+
+
+async def run_endpoints(args, officers, drivers):
+    """ Send each endpoint's requests through the app in process, returning the per-endpoint statistics. """
+    import database.database as database
+    import database.async_database as async_database
+    import main
+    from violation_catalog import catalog
+
+    database.init_pool()
+    await async_database.init_pool()
+    async with async_database.connection() as connection:
+        await catalog.reload(connection)
+
+    operations = build_operations(
+        issue_tokens(officers, drivers, args.users),
+        argparse.Namespace(password="", drivers=drivers, seed=args.seed),
+    )
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for endpoint in ENDPOINTS:
+                samples, elapsed = await measure(client, operations[endpoint], args)
+                results[endpoint] = summarize({endpoint: samples}, elapsed)["endpoints"][endpoint]
+                print(f"  {endpoint:<34} p50 {results[endpoint]['p50_ms']:8.2f}ms  {results[endpoint]['throughput_rps']:8.1f} req/s",
+                      file=sys.stderr)
+    finally:
+        await async_database.close_pool()
+        database.close_pool()
+    return results
+
+
+def worker(args):
+    """ Benchmark the backend chosen by DATABASE_BACKEND and write the result to --result. """
+    import database.database as database
+
+    officers, drivers, _ = data_set_size(args)
+    result = {"backend": database.DATABASE_BACKEND}
+    try:
+        result["load_s"] = round(load_data(args, officers, drivers), 3)
+        print(f"{database.DATABASE_BACKEND}: loaded in {result['load_s']}s", file=sys.stderr)
+        result["endpoints"] = asyncio.run(run_endpoints(args, officers, drivers))
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    with open(args.result, "w") as result_file:
+        json.dump(result, result_file)
+    return 1 if "error" in result else 0
+
+# --- End of Worker, one backend per process ---
+# ========================================================
+# --- Comparison ---
+
+def run_backend(args, backend, directory):
+    """ Benchmark one backend in a child process, the backend is fixed when the database modules are imported. """
+    result_path = os.path.join(directory, f"{backend}.json")
+    env = dict(os.environ, DATABASE_BACKEND=backend, DATABASE_MIGRATE_ON_STARTUP="0", SLOW_QUERY_MS="1000000")
+    env["SQLITE_PATH"] = os.path.join(directory, "bench.db")
+    command = [
+        sys.executable, "-m", "benchmarks.bench_backends", "--worker",
+        "--data", os.path.join(directory, "data"), "--result", result_path,
+        "--notices", str(args.notices), "--requests", str(args.requests), "--warmup", str(args.warmup),
+        "--concurrency", str(args.concurrency), "--users", str(args.users), "--seed", str(args.seed),
+    ] + (["--truncate"] if args.truncate else [])
+
+    print(f"Benchmarking {backend}", flush=True)
+    subprocess.run(command, env=env)
+    with open(result_path) as result_file:
+        return json.load(result_file)
+
+
+def print_table(results):
+    """ Print the load time and per-endpoint latencies of every backend side by side. """
+    backends = [result["backend"] for result in results if "endpoints" in result]
+    for result in results:
+        if "error" in result:
+            print(f"{result['backend']}: not measured, {result['error']}")
+    if not backends:
+        return
+
+    print(f"\n{'':<34} " + " ".join(f"{backend:>26}" for backend in backends))
+    print(f"{'load + Citation_View build (s)':<34} " + " ".join(f"{result['load_s']:>26}" for result in results if "endpoints" in result))
+    for endpoint in ENDPOINTS:
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "errors"):
+            values = [result["endpoints"][endpoint][metric] for result in results if "endpoints" in result]
+            print(f"{endpoint if metric == 'p50_ms' else '':<34} " + " ".join(f"{metric:>14} {value:>11}" for value in values))
+
+
+def compare(args):
+    officers, drivers, vehicles = data_set_size(args)
+    directory = tempfile.mkdtemp(prefix="nypd_backends_")
+    try:
+        os.makedirs(os.path.join(directory, "data"))
+        manifest = seed.generate(os.path.join(directory, "data"), args.notices, officers, drivers, vehicles, args.seed)
+        results = [run_backend(args, backend, directory) for backend in args.backends]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print_table(results)
+    report = {
+        "label": git_commit(),
+        "config": {key: getattr(args, key) for key in ("notices", "requests", "warmup", "concurrency", "users", "seed")},
+        "data_set": {table: {"rows": count, "sha256": digest} for table, (count, digest) in manifest.items()},
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+            report_file.write("\n")
+    return 1 if any("error" in result for result in results) else 0
+
+# --- End of Comparison ---
+# ========================================================
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the MySQL and SQLite backends on the same seeded data.")
+    parser.add_argument("--backends", nargs="+", choices=["mysql", "sqlite"], default=["sqlite", "mysql"])
+    parser.add_argument("--notices", type=int, default=100_000, help="Correction notices in the data set")
+    parser.add_argument("--requests", type=int, default=2000, help="Measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=100, help="Requests per endpoint before measuring")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent closed-loop clients")
+    parser.add_argument("--users", type=int, default=500, help="Officers and drivers to send requests as")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the data set and the request sequence")
+    parser.add_argument("--truncate", action="store_true", help="Empty the MySQL tables before loading")
+    parser.add_argument("--out", help="Write the JSON report to a file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--data", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    return worker(args) if args.worker else compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# end of bench_backends.py
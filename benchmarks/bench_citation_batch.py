@@ -0,0 +1,73 @@
+# bench_citation_batch.py
+# Benchmark for bulk citation ingestion: one POST /citations/batch versus one POST /citations per citation.
+# Start the API first (uvicorn main:app) against the docker-compose MySQL, then run:
+#   python -m benchmarks.bench_citation_batch --count 1000
+# =========================================================
+
+import argparse
+import random
+import time
+
+import httpx
+
+
+def make_citations(count, seed):
+    """ Build `count` citation payloads, reusing a pool of drivers like a real shift would. """
+    rng = random.Random(seed)
+    violation_types = ["Speeding", "Red Light", "Parking", "Seatbelt", "Reckless", "Lane Change", "Registration"]
+    return [
+        {
+            "driver_license": f"BENCH{rng.randrange(count // 2 + 1):07d}",
+            "driver_name": f"Bench Driver{rng.randrange(1000)}",
+            "violation_location": f"{rng.randrange(1, 200)} Atlantic Ave, Brooklyn",
+            "violation_type": rng.choice(violation_types),
+            "fine_amount": rng.choice([50, 100, 150, 250]),
+        }
+        for _ in range(count)
+    ]
+
+
+def login(client, badge, password):
+    """ Log in as an officer and return the Authorization header. """
+    response = client.post("/token", data={"username": badge, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched citation ingestion.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--badge", default="B99001")
+    parser.add_argument("--password", default="johndoe")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-single", action="store_true", help="Only time the batch endpoint")
+    args = parser.parse_args()
+
+    with httpx.Client(base_url=args.base_url, timeout=120) as client:
+        headers = login(client, args.badge, args.password)
+
+        # One request carrying every citation
+        citations = make_citations(args.count, args.seed)
+        started = time.perf_counter()
+        response = client.post("/citations/batch", json=citations, headers=headers)
+        elapsed = time.perf_counter() - started
+        response.raise_for_status()
+        print(f"batch   {response.json()['created']:>5} citations in {elapsed:7.3f}s ({args.count / elapsed:8.1f}/s)")
+
+        if args.skip_single:
+            return
+
+        # The same number of citations posted one at a time
+        citations = make_citations(args.count, args.seed + 1)
+        started = time.perf_counter()
+        for citation in citations:
+            client.post("/citations", json=citation, headers=headers).raise_for_status()
+        elapsed = time.perf_counter() - started
+        print(f"single  {args.count:>5} citations in {elapsed:7.3f}s ({args.count / elapsed:8.1f}/s)")
+
+
+if __name__ == "__main__":
+    main()
+
+# end of bench_citation_batch.py
@@ -0,0 +1,75 @@
+# bench_create_citation.py
+# Latency benchmark for POST /citations.
+# Start the API first (uvicorn main:app) against the docker-compose MySQL, then run it on two
+# commits to compare, e.g.:
+#   python -m benchmarks.bench_create_citation --requests 500 --concurrency 8
+# =========================================================
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+
+def percentile(samples, pct):
+    """ Return the pct-th percentile of a list of samples. """
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    latencies = []
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+        response = await client.post("/token", data={"username": args.badge, "password": args.password})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        # Half of the citations go to drivers that already exist, like repeat offenders would
+        async def create(number):
+            citation = {
+                "driver_license": f"LAT{rng.randrange(args.requests // 2 + 1):07d}",
+                "driver_name": "Latency Bench",
+                "violation_location": f"{number} Flatbush Ave, Brooklyn",
+                "violation_type": rng.choice(["Speeding", "Parking", "Red Light", "Seatbelt"]),
+            }
+            started = time.perf_counter()
+            response = await client.post("/citations", json=citation, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+        limiter = asyncio.Semaphore(args.concurrency)
+
+        async def limited(number):
+            async with limiter:
+                await create(number)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(limited(number) for number in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    print(
+        f"POST /citations x{args.requests} concurrency={args.concurrency} "
+        f"throughput={args.requests / elapsed:.1f} req/s "
+        f"p50={statistics.median(latencies) * 1000:.2f}ms "
+        f"p95={percentile(latencies, 95) * 1000:.2f}ms "
+        f"p99={percentile(latencies, 99) * 1000:.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure POST /citations latency.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--badge", default="B99001")
+    parser.add_argument("--password", default="johndoe")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(main(parser.parse_args()))
+
+# end of bench_create_citation.py
@@ -0,0 +1,119 @@
+# bench_fetch_memory.py
+# Memory benchmark for the fetch modes and row formats of database.execute_query.
+# Creates a Bench_Rows table with --rows rows (1M by default) shaped like a citation row
+# and reports time and peak Python memory for reading all of it in each mode.
+# Run against the docker-compose MySQL: python -m benchmarks.bench_fetch_memory
+# =========================================================
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+import database.database as database
+import database.async_database as async_database
+
+QUERY = "SELECT Row_ID, Violation_Date, Location, Driver_ID, Officer_ID, VIN FROM Bench_Rows"
+
+
+def seed(connection, total):
+    """ Create and fill Bench_Rows with `total` rows unless it already holds that many. """
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Bench_Rows (
+            Row_ID INT PRIMARY KEY,
+            Violation_Date DATE,
+            Location VARCHAR(255),
+            Driver_ID INT,
+            Officer_ID INT,
+            VIN VARCHAR(17)
+        )
+    """)
+    cursor.execute("SELECT COUNT(*) FROM Bench_Rows")
+    if cursor.fetchone()[0] == total:
+        cursor.close()
+        return
+
+    print(f"Seeding Bench_Rows with {total} rows...")
+    cursor.execute("TRUNCATE TABLE Bench_Rows")
+
+    # Generate rows server side from a 0-9 digits table, one million at most per statement
+    cursor.execute("CREATE TEMPORARY TABLE Bench_Digits (d INT)")
+    cursor.execute("INSERT INTO Bench_Digits VALUES (0),(1),(2),(3),(4),(5),(6),(7),(8),(9)")
+    for offset in range(0, total, 1_000_000):
+        cursor.execute("""
+            INSERT INTO Bench_Rows
+            SELECT n, DATE_ADD('2020-01-01', INTERVAL MOD(n, 2000) DAY),
+                   CONCAT('Atlantic Ave & ', MOD(n, 977), ' St, Brooklyn'), MOD(n, 50000), MOD(n, 300),
+                   LPAD(MOD(n, 20000), 17, 'V')
+            FROM (
+                SELECT %s + a.d + b.d * 10 + c.d * 100 + e.d * 1000 + f.d * 10000 + g.d * 100000 AS n
+                FROM Bench_Digits a, Bench_Digits b, Bench_Digits c, Bench_Digits e, Bench_Digits f, Bench_Digits g
+            ) numbers
+            WHERE n < %s
+        """, (offset, total))
+        connection.commit()
+    cursor.close()
+
+
+def measure(label, run):
+    """ Run a benchmark case and print its duration and peak traced memory. """
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = run()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} rows={count:<9} time={elapsed:7.2f}s peak={peak / 1024 / 1024:9.1f} MiB")
+
+
+def sync_case(connection, fetch, row_format, batch_size):
+    """ Build a sync benchmark case reading every row in the given mode. """
+    def run():
+        result = database.execute_query(connection, QUERY, fetch=fetch, row_format=row_format, batch_size=batch_size)
+        return sum(1 for _ in result)
+    return run
+
+
+def async_case(row_format, batch_size):
+    """ Build an async benchmark case streaming every row through the async iter mode. """
+    async def consume():
+        async with async_database.connection() as connection:
+            result = await async_database.execute_query(
+                connection, QUERY, fetch="iter", row_format=row_format, batch_size=batch_size
+            )
+            count = 0
+            async for _ in result:
+                count += 1
+        await async_database.close_pool()
+        return count
+    return lambda: asyncio.run(consume())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare memory use of execute_query fetch modes.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    pool = database.init_pool()
+    connection = pool.acquire()
+    try:
+        seed(connection, args.rows)
+
+        for fetch in ("all", "iter"):
+            for row_format in ("dict", "tuple", "row"):
+                measure(f"sync fetch={fetch} {row_format}", sync_case(connection, fetch, row_format, args.batch_size))
+                connection.commit()
+    finally:
+        pool.release(connection)
+        database.close_pool()
+
+    for row_format in ("dict", "tuple", "row"):
+        measure(f"async fetch=iter {row_format}", async_case(row_format, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
+
+# end of bench_fetch_memory.py
@@ -0,0 +1,108 @@
+# bench_json_response.py
+# Benchmark for serializing 10k-row list responses. Needs no database: the same rows are
+# served in-process by three routes, one per response path:
+#   untyped    response_model=Page[dict], the previous citation routes (jsonable_encoder + json.dumps)
+#   validated  a typed response_model, validated and dumped by Pydantic
+#   trusted    TrustedJSONResponse, no validation (orjson when installed)
+# Run: python -m benchmarks.bench_json_response --rows 10000 --requests 50
+# =========================================================
+
+import argparse
+import time
+from datetime import date, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import models
+from json_responses import TrustedJSONResponse, orjson
+
+
+def make_citations(count):
+    """ Build `count` formatted citations like format_citation returns. """
+    start = date(2020, 1, 1)
+    return [
+        {
+            "citation_id": number,
+            "citation_number": f"CIT-{number:06d}",
+            "driver_license": f"D{number % 50000:07d}",
+            "driver_name": "John Doe",
+            "violation_type": "Vehicle Speeding by 1-10 mph over limit.",
+            "violation_code": "SPD0110",
+            "date_issued": (start + timedelta(days=number % 2000)).isoformat(),
+            "violation_location": f"{number % 977} Atlantic Ave, Brooklyn",
+            "fine_amount": 0,
+            "status": "active",
+            "issued_by_badge": "B99001",
+        }
+        for number in range(count)
+    ]
+
+
+def make_drivers(count):
+    """ Build `count` Driver rows like SELECT * FROM Driver returns. """
+    return [
+        {
+            "Driver_ID": number,
+            "First_Name": "John",
+            "Last_Name": "Doe",
+            "Address": f"{number % 977} Main St, Brooklyn, NY",
+            "Birth_Date": date(1980, 1, 1) + timedelta(days=number % 9000),
+            "License_Number": f"D{number:07d}",
+            "License_State": "NY",
+        }
+        for number in range(count)
+    ]
+
+
+def build_app(citations, drivers):
+    """ Serve the same pages through each response path. """
+    app = FastAPI()
+    citation_page = {"items": citations, "next_cursor": None}
+    driver_page = {"items": drivers, "next_cursor": None}
+
+    @app.get("/citations/untyped", response_model=models.Page[dict])
+    async def citations_untyped():
+        return citation_page
+
+    @app.get("/citations/validated", response_model=models.Page[models.CitationResponse])
+    async def citations_validated():
+        return citation_page
+
+    @app.get("/citations/trusted", response_model=models.Page[models.CitationResponse])
+    async def citations_trusted():
+        return TrustedJSONResponse(citation_page)
+
+    @app.get("/drivers/validated", response_model=models.Page[models.DriverResponse])
+    async def drivers_validated():
+        return driver_page
+
+    @app.get("/drivers/trusted", response_model=models.Page[models.DriverResponse])
+    async def drivers_trusted():
+        return TrustedJSONResponse(driver_page)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON response paths for large list responses.")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    client = TestClient(build_app(make_citations(args.rows), make_drivers(args.rows)))
+    print(f"rows={args.rows} requests={args.requests} orjson={'yes' if orjson else 'no'}")
+
+    for path in ("/citations/untyped", "/citations/validated", "/citations/trusted", "/drivers/validated", "/drivers/trusted"):
+        client.get(path).raise_for_status()
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            response = client.get(path)
+        elapsed = time.perf_counter() - started
+        print(f"{path:<22} {elapsed / args.requests * 1000:8.2f} ms/request  {len(response.content) / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
+
+# end of bench_json_response.py
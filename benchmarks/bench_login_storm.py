@@ -0,0 +1,102 @@
+# bench_login_storm.py
+# Benchmark for a shift-change login storm: many concurrent POST /token officer logins while
+# other clients keep reading GET /violations/. Reports p50/p99 of the non-login requests
+# without and during the storm. Start the API first (uvicorn main:app), then run:
+#   python -m benchmarks.bench_login_storm --logins 400 --concurrency 100
+# =========================================================
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from benchmarks.bench_create_citation import percentile
+
+
+async def login(client, args):
+    """ Log in as the benchmark officer, returning the status code. """
+    response = await client.post("/token", data={"username": args.badge, "password": args.password})
+    return response.status_code
+
+
+async def read_until(client, headers, stop, latencies):
+    """ Keep reading the violation list until stop is set, recording each latency. """
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/violations/", headers=headers)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+
+
+async def measure_reads(client, headers, args, storm=None):
+    """ Run the readers alone for --duration seconds, or for as long as the storm lasts. """
+    stop = asyncio.Event()
+    latencies = []
+    readers = [asyncio.create_task(read_until(client, headers, stop, latencies)) for _ in range(args.readers)]
+
+    statuses = []
+    started = time.perf_counter()
+    if storm is None:
+        await asyncio.sleep(args.duration)
+    else:
+        statuses = await storm
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await asyncio.gather(*readers)
+    return latencies, statuses, elapsed
+
+
+async def storm(client, args):
+    """ Fire --logins officer logins, at most --concurrency at a time. """
+    limiter = asyncio.Semaphore(args.concurrency)
+
+    async def limited():
+        async with limiter:
+            return await login(client, args)
+
+    return await asyncio.gather(*(limited() for _ in range(args.logins)))
+
+
+def report(label, latencies):
+    print(
+        f"{label:<16} reads={len(latencies):<6} "
+        f"p50={statistics.median(latencies) * 1000:8.2f}ms "
+        f"p99={percentile(latencies, 99) * 1000:8.2f}ms"
+    )
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.concurrency + args.readers)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120, limits=limits) as client:
+        response = await client.post("/token", data={"username": args.badge, "password": args.password})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        latencies, _, _ = await measure_reads(client, headers, args)
+        report("baseline", latencies)
+
+        latencies, statuses, elapsed = await measure_reads(client, headers, args, storm(client, args))
+        report("during storm", latencies)
+
+    accepted = statuses.count(201)
+    print(
+        f"logins={len(statuses)} accepted={accepted} rejected_503={statuses.count(503)} "
+        f"in {elapsed:.2f}s ({accepted / elapsed:.1f} logins/s)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure API latency during a login storm.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--badge", default="B99001")
+    parser.add_argument("--password", default="johndoe")
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds to measure the baseline for")
+    asyncio.run(main(parser.parse_args()))
+
+# end of bench_login_storm.py
@@ -0,0 +1,75 @@
+# bench_metrics.py
+# Microbenchmark of the hot path cost of the metrics in metrics.py.
+# Times a histogram observation, recording a statement with a derived name, and a full request
+# through a small FastAPI app with and without MetricsMiddleware. Needs no database:
+#   python -m benchmarks.bench_metrics --requests 20000
+# =========================================================
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+import metrics
+import query_trace
+
+
+def per_call(label, elapsed, calls):
+    print(f"{label:<34} {elapsed / calls * 1_000_000_000:9.0f} ns/call")
+
+
+def build_app(instrumented):
+    app = FastAPI()
+    if instrumented:
+        app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"item_id": item_id}
+
+    return app
+
+
+async def time_requests(app, requests):
+    """ Return the seconds taken by `requests` sequential requests to the app. """
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for number in range(100):
+            await client.get(f"/items/{number}")
+        started = time.perf_counter()
+        for number in range(requests):
+            await client.get(f"/items/{number}")
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the overhead of request and query metrics.")
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    histogram = metrics.Histogram("bench_seconds", "Benchmark histogram.", ("route",))
+    started = time.perf_counter()
+    for number in range(args.calls):
+        histogram.observe(0.003, "/items/{item_id}")
+    per_call("Histogram.observe", time.perf_counter() - started, args.calls)
+
+    query = "SELECT * FROM Driver WHERE Driver_ID = %s"
+    started = time.perf_counter()
+    for number in range(args.calls):
+        query_trace.record(None, query, (1,), time.perf_counter(), 1)
+    per_call("query_trace.record (derived name)", time.perf_counter() - started, args.calls)
+
+    plain = asyncio.run(time_requests(build_app(False), args.requests))
+    instrumented = asyncio.run(time_requests(build_app(True), args.requests))
+    per_call("request without middleware", plain, args.requests)
+    per_call("request with MetricsMiddleware", instrumented, args.requests)
+    print(f"middleware overhead: {(instrumented - plain) / args.requests * 1_000_000:.2f} us/request "
+          f"({(instrumented / plain - 1) * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
+
+# end of bench_metrics.py
@@ -0,0 +1,129 @@
+# bench_query_times.py
+# Query time of every endpoint's SQL against a seeded database, to compare schemas.
+# Typical before/after run against the docker-compose MySQL:
+#   python -m database.migrate --target 2 && python -m benchmarks.bench_query_times --save before.json
+#   python -m database.migrate            && python -m benchmarks.bench_query_times --compare before.json
+# (run the first line on a database without the 0003 indexes, e.g. a fresh volume)
+# =========================================================
+
+import argparse
+import json
+import statistics
+import time
+
+import database.database as database
+
+# (endpoint, SQL, name of the sample parameters) for the queries each endpoint runs
+QUERIES = [
+    ("POST /token", """
+        SELECT 'officer' AS User_Type, Officer_ID AS User_ID, Badge_Number AS Username, Secret_Hash
+        FROM Officer WHERE Badge_Number = %s
+        UNION ALL
+        SELECT 'driver' AS User_Type, Driver_ID AS User_ID, License_Number AS Username, NULL AS Secret_Hash
+        FROM Driver WHERE License_Number = %s
+        ORDER BY User_Type = 'driver'
+    """, ("badge", "badge")),
+    ("GET /citations", """
+        SELECT * FROM Citation_View cv ORDER BY cv.Violation_Date DESC, cv.Notice_ID DESC LIMIT 101
+    """, ()),
+    ("GET /citations/driver/{license}", """
+        SELECT * FROM Citation_View cv WHERE cv.License_Number = %s
+        ORDER BY cv.Violation_Date DESC, cv.Notice_ID DESC LIMIT 101
+    """, ("license",)),
+    ("GET /notices/officer/{badge}", """
+        SELECT cn.*, GROUP_CONCAT(nv.Violation_Code) as Violations
+        FROM Correction_Notice cn
+        JOIN Officer o ON cn.Officer_ID = o.Officer_ID
+        LEFT JOIN Notice_Violation nv ON cn.Notice_ID = nv.Notice_ID
+        WHERE o.Badge_Number = %s
+        GROUP BY cn.Notice_ID
+    """, ("badge",)),
+    ("GET /drivers/", "SELECT * FROM Driver WHERE Driver_ID > %s ORDER BY Driver_ID LIMIT 101", ("zero",)),
+    ("GET /drivers/license/{license}", "SELECT * FROM Driver WHERE License_Number = %s", ("license",)),
+    ("GET /vehicles/", "SELECT * FROM Vehicle WHERE VIN > %s ORDER BY VIN LIMIT 101", ("empty",)),
+    ("POST /citations/batch", """
+        SELECT Notice_ID, Driver_ID, Location FROM Correction_Notice
+        WHERE Notice_ID BETWEEN %s AND %s AND Officer_ID = %s ORDER BY Notice_ID
+    """, ("last_notice", "last_notice", "officer_id")),
+    ("driver notices (0003 index)", """
+        SELECT Notice_ID FROM Correction_Notice WHERE Driver_ID = %s ORDER BY Violation_Date DESC, Notice_ID DESC LIMIT 101
+    """, ("driver_id",)),
+]
+
+
+def sample_values(connection):
+    """ Pick parameter values from the busiest officer and driver so the queries return rows. """
+    officer = database.execute_query(connection, """
+        SELECT o.Officer_ID, o.Badge_Number FROM Officer o
+        JOIN Correction_Notice cn ON cn.Officer_ID = o.Officer_ID
+        GROUP BY o.Officer_ID ORDER BY COUNT(*) DESC LIMIT 1
+    """, fetch="one")
+    driver = database.execute_query(connection, """
+        SELECT d.Driver_ID, d.License_Number FROM Driver d
+        JOIN Correction_Notice cn ON cn.Driver_ID = d.Driver_ID
+        GROUP BY d.Driver_ID ORDER BY COUNT(*) DESC LIMIT 1
+    """, fetch="one")
+    last_notice = database.execute_query(connection, "SELECT MAX(Notice_ID) AS id FROM Correction_Notice", fetch="one")
+    return {
+        "badge": officer['Badge_Number'],
+        "officer_id": officer['Officer_ID'],
+        "license": driver['License_Number'],
+        "driver_id": driver['Driver_ID'],
+        "last_notice": last_notice['id'],
+        "zero": 0,
+        "empty": "",
+    }
+
+
+def time_query(connection, sql, params, repeat):
+    """ Return the median wall time of a query in milliseconds, after one warm-up run. """
+    cursor = connection.cursor()
+    samples = []
+    try:
+        for run in range(repeat + 1):
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            if run:
+                samples.append((time.perf_counter() - started) * 1000)
+    finally:
+        cursor.close()
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the SQL behind each endpoint.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--save", help="Write the timings to a JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier --save run to compare against")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    pool = database.init_pool()
+    connection = pool.acquire()
+    timings = {}
+    try:
+        values = sample_values(connection)
+        for endpoint, sql, names in QUERIES:
+            timings[endpoint] = time_query(connection, sql, tuple(values[name] for name in names), args.repeat)
+            line = f"{endpoint:<34} {timings[endpoint]:9.3f} ms"
+            if endpoint in baseline:
+                line += f"   before {baseline[endpoint]:9.3f} ms   x{baseline[endpoint] / max(timings[endpoint], 1e-6):6.1f}"
+            print(line)
+    finally:
+        pool.release(connection)
+        database.close_pool()
+
+    if args.save:
+        with open(args.save, "w") as output:
+            json.dump(timings, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
+
+# end of bench_query_times.py
@@ -0,0 +1,291 @@
+# load_test.py
+# End-to-end load test of the API with a realistic mix of officer and driver traffic.
+# Logs in as many synthetic officers and drivers, then sends requests at a fixed arrival rate
+# (open loop, so a slow server builds a backlog instead of slowing the test down) and reports
+# throughput and p50/p95/p99 latency per endpoint as JSON.
+#
+# Seed the docker-compose MySQL with python -m database.seed, start the API (uvicorn main:app)
+# and run the same command on each commit to compare:
+#   python -m benchmarks.load_test --rate 200 --duration 60 --out before.json
+#   python -m benchmarks.load_test --rate 200 --duration 60 --out after.json --compare before.json
+# Latencies are measured from the time a request was scheduled, so client-side queueing counts.
+# =========================================================
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.bench_create_citation import percentile
+from database.seed import badge_for, license_for
+
+# Relative share of each endpoint in the traffic, overridable with --mix
+DEFAULT_MIX = {
+    "POST /token": 5,
+    "GET /citations": 25,
+    "GET /citations/driver/{license}": 30,
+    "GET /notices/officer/{badge}": 25,
+    "POST /citations": 15,
+}
+
+VIOLATION_TYPES = ["Speeding", "Parking", "Red Light", "Seatbelt", "Lane Change", "Registration", "Reckless"]
+
+
+class Users:
+    """ Logged in officers and drivers with their bearer tokens. """
+
+    def __init__(self):
+        self.officers = []
+        self.drivers = []
+
+    def officer(self, rng):
+        return rng.choice(self.officers)
+
+    def driver(self, rng):
+        return rng.choice(self.drivers)
+
+
+async def login(client, username, password):
+    """ Log in and return the Authorization header, or None if the login failed. """
+    response = await client.post("/token", data={"username": username, "password": password})
+    if response.status_code != 201:
+        return None
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def log_in_users(client, args):
+    """ Log in --officers officers and --drivers drivers from the synthetic data set. """
+    users = Users()
+    limiter = asyncio.Semaphore(args.max_in_flight)
+
+    async def one(username, password, into):
+        async with limiter:
+            headers = await login(client, username, password)
+        if headers is not None:
+            into.append((username, headers))
+
+    await asyncio.gather(
+        *(one(badge_for(number), args.password, users.officers) for number in range(1, args.officers + 1)),
+        *(one(license_for(number), "", users.drivers) for number in range(1, args.drivers + 1)),
+    )
+    if not users.officers or not users.drivers:
+        raise SystemExit("Could not log in any officer or driver, seed the database with python -m database.seed first")
+    return users
+
+
+def build_operations(users, args):
+    """ Return {endpoint: coroutine function(client, rng, number)} sending one request of that endpoint. """
+
+    async def token(client, rng, number):
+        if rng.random() < 0.5:
+            return await client.post("/token", data={"username": users.officer(rng)[0], "password": args.password})
+        return await client.post("/token", data={"username": users.driver(rng)[0], "password": ""})
+
+    async def citations(client, rng, number):
+        return await client.get("/citations", headers=users.officer(rng)[1])
+
+    async def driver_citations(client, rng, number):
+        license_number, headers = users.driver(rng)
+        return await client.get(f"/citations/driver/{license_number}", headers=headers)
+
+    async def officer_notices(client, rng, number):
+        badge, headers = users.officer(rng)
+        return await client.get(f"/notices/officer/{badge}", headers=headers)
+
+    # Mostly drivers the data set already has, like repeat offenders, and some new ones
+    async def create(client, rng, number):
+        if rng.random() < 0.8:
+            license_number = license_for(rng.randint(1, args.drivers))
+        else:
+            license_number = f"LOAD{args.seed:04d}{number:08d}"
+        citation = {
+            "driver_license": license_number,
+            "driver_name": "Load Test",
+            "violation_location": f"{number} Flatbush Ave, Brooklyn",
+            "violation_type": rng.choice(VIOLATION_TYPES),
+        }
+        return await client.post("/citations", json=citation, headers=users.officer(rng)[1])
+
+    return {
+        "POST /token": token,
+        "GET /citations": citations,
+        "GET /citations/driver/{license}": driver_citations,
+        "GET /notices/officer/{badge}": officer_notices,
+        "POST /citations": create,
+    }
+
+
+async def run(client, operations, mix, args):
+    """ Send requests with Poisson arrivals at --rate for --warmup + --duration seconds. Returns the samples. """
+    rng = random.Random(args.seed)
+    endpoints = list(mix)
+    weights = [mix[endpoint] for endpoint in endpoints]
+
+    # endpoint -> list of (latency in seconds, status code), status 0 is a transport error
+    samples = defaultdict(list)
+    limiter = asyncio.Semaphore(args.max_in_flight)
+    tasks = []
+
+    async def send(endpoint, scheduled, number, request_rng, measured):
+        async with limiter:
+            try:
+                response = await operations[endpoint](client, request_rng, number)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+        if measured:
+            samples[endpoint].append((time.perf_counter() - scheduled, status))
+
+    started = time.perf_counter()
+    measure_from = started + args.warmup
+    stop_at = measure_from + args.duration
+    scheduled = started
+    number = 0
+
+    while True:
+        scheduled += rng.expovariate(args.rate)
+        if scheduled >= stop_at:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        # Each request gets its own random stream, so the request sequence does not depend on timing
+        endpoint = rng.choices(endpoints, weights)[0]
+        request_rng = random.Random(rng.getrandbits(64))
+        tasks.append(asyncio.create_task(send(endpoint, scheduled, number, request_rng, scheduled >= measure_from)))
+        number += 1
+
+    await asyncio.gather(*tasks)
+    return samples, time.perf_counter() - measure_from
+
+
+def summarize(samples, elapsed):
+    """ Return the per-endpoint and total statistics of a run, latencies in milliseconds. """
+
+    def stats(entries):
+        latencies = [latency * 1000 for latency, _ in entries]
+        statuses = defaultdict(int)
+        for _, status in entries:
+            statuses[str(status)] += 1
+        return {
+            "requests": len(entries),
+            "errors": sum(1 for _, status in entries if status == 0 or status >= 400),
+            "status": dict(sorted(statuses.items())),
+            "throughput_rps": round(len(entries) / elapsed, 2),
+            "mean_ms": round(statistics.fmean(latencies), 3),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "max_ms": round(max(latencies), 3),
+        }
+
+    every = [entry for entries in samples.values() for entry in entries]
+    return {
+        "total": stats(every) if every else None,
+        "endpoints": {endpoint: stats(entries) for endpoint, entries in sorted(samples.items())},
+    }
+
+
+def git_commit():
+    """ Return the short hash of the checked out commit, to label the report. """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_comparison(report, baseline):
+    """ Print throughput and percentiles of report next to those of an earlier report. """
+    print(f"\n{report['label']} vs {baseline['label']}")
+    print(f"{'endpoint':<34} {'metric':<14} {'before':>10} {'after':>10} {'change':>8}")
+    rows = {"total": report["total"], **report["endpoints"]}
+    before_rows = {"total": baseline["total"], **baseline["endpoints"]}
+    for endpoint, after in rows.items():
+        before = before_rows.get(endpoint)
+        if not before or not after:
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "errors"):
+            change = (after[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            print(f"{endpoint:<34} {metric:<14} {before[metric]:>10} {after[metric]:>10} {change:>+7.1f}%")
+
+
+def parse_mix(text):
+    """ Parse --mix, e.g. "POST /token=5,GET /citations=25", into {endpoint: weight}. """
+    mix = {}
+    for part in text.split(","):
+        endpoint, _, weight = part.rpartition("=")
+        if endpoint.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint {endpoint.strip()!r}, expected one of {list(DEFAULT_MIX)}")
+        mix[endpoint.strip()] = float(weight)
+    return mix
+
+
+async def main(args):
+    mix = args.mix or DEFAULT_MIX
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        users = await log_in_users(client, args)
+        print(f"Logged in {len(users.officers)} officers and {len(users.drivers)} drivers")
+        samples, elapsed = await run(client, build_operations(users, args), mix, args)
+
+    report = {
+        "label": args.label or git_commit(),
+        "config": {
+            "base_url": args.base_url,
+            "rate": args.rate,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "officers": args.officers,
+            "drivers": args.drivers,
+            "max_in_flight": args.max_in_flight,
+            "seed": args.seed,
+            "mix": mix,
+        },
+        "elapsed_s": round(elapsed, 3),
+        **summarize(samples, elapsed),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as report_file:
+            report_file.write(output + "\n")
+    print(output)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            print_comparison(report, json.load(baseline_file))
+
+    # Fail the run when the server errored, so scripted comparisons notice
+    return 1 if report["total"] and report["total"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the API with a mix of officer and driver requests.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--rate", type=float, default=100, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=60, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds of traffic before measuring")
+    parser.add_argument("--officers", type=int, default=50, help="Synthetic officers to log in as")
+    parser.add_argument("--drivers", type=int, default=500, help="Synthetic drivers to log in as")
+    parser.add_argument("--password", default="johndoe", help="Password of the synthetic officers")
+    parser.add_argument("--mix", type=parse_mix, help="Endpoint weights, e.g. \"POST /token=5,GET /citations=25\"")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Most concurrent requests and connections")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", help="Name of this run in the report (default: the git commit)")
+    parser.add_argument("--out", help="Write the JSON report to a file")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare against")
+    sys.exit(asyncio.run(main(parser.parse_args())))
+
+# end of load_test.py
@@ -0,0 +1,173 @@
+# cache.py
+# Read-through caches for entity lookups in the NYPD Citation system.
+# Officers by badge number, drivers by license number and vehicles by VIN are looked up on
+# almost every request, so recent rows are kept in bounded LRU caches with a TTL.
+# Write routes invalidate the affected entries.
+# =========================================================
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from fastapi import HTTPException
+import database.async_database as database
+
+CACHE_MAXSIZE = int(os.getenv("ENTITY_CACHE_MAXSIZE", "10000"))
+CACHE_TTL = float(os.getenv("ENTITY_CACHE_TTL", "300"))
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire `ttl` seconds after they were stored.
+
+    All operations take a lock, so the cache can be shared between the event loop and
+    threadpool workers. A load that races with an invalidation is not stored, so a
+    write can never be followed by a stale read from the cache.
+    """
+
+    def __init__(self, name, maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """ Return the cached value for key, or None if it is missing or expired. """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, generation=None, ttl=None):
+        """ Store a value, unless the cache was invalidated since `generation` was read. `ttl` overrides the cache TTL. """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+
+            self._entries[key] = (value, time.monotonic() + min(self.ttl, ttl if ttl is not None else self.ttl))
+            self._entries.move_to_end(key)
+
+            # Evict the least recently used entries beyond maxsize
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """ Drop the entry for key. """
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """ Drop every entry whose value matches predicate. """
+        with self._lock:
+            self._generation += 1
+            for key in [key for key, (value, _) in self._entries.items() if predicate(value)]:
+                del self._entries[key]
+
+    def clear(self):
+        """ Drop every entry. """
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    async def get_or_load(self, key, loader):
+        """ Return the cached value for key, calling the async loader on a miss. Misses (None) are not cached. """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            generation = self._generation
+
+        value = await loader()
+        if value is not None:
+            self.set(key, value, generation)
+        return value
+
+    def stats(self):
+        """ Return size and hit-rate counters. """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+# ========================================================
+# --- Entity caches ---
+
+officers_by_badge = TTLCache("officers_by_badge")
+drivers_by_license = TTLCache("drivers_by_license")
+vehicles_by_vin = TTLCache("vehicles_by_vin")
+
+async def _fetch_one_or_none(connection, query, params):
+    """ Run a single-row lookup, returning None instead of raising 404. """
+    try:
+        return await database.execute_query(connection, query, params, fetch="one")
+    except HTTPException as e:
+        if e.status_code == 404:
+            return None
+        raise
+
+async def get_officer(connection, badge_number):
+    """ Look up an Officer row by badge number through the cache. Returns None if not found. """
+    row = await officers_by_badge.get_or_load(
+        str(badge_number),
+        lambda: _fetch_one_or_none(connection, "SELECT * FROM Officer WHERE Badge_Number = %s", (badge_number,))
+    )
+    return dict(row) if row else None
+
+async def get_driver(connection, license_number):
+    """ Look up a Driver row by license number through the cache. Returns None if not found. """
+    row = await drivers_by_license.get_or_load(
+        license_number,
+        lambda: _fetch_one_or_none(connection, "SELECT * FROM Driver WHERE License_Number = %s", (license_number,))
+    )
+    return dict(row) if row else None
+
+async def get_vehicle(connection, vin):
+    """ Look up a Vehicle row by VIN through the cache. Returns None if not found. """
+    row = await vehicles_by_vin.get_or_load(
+        vin,
+        lambda: _fetch_one_or_none(connection, "SELECT * FROM Vehicle WHERE VIN = %s", (vin,))
+    )
+    return dict(row) if row else None
+
+def invalidate_driver(driver_id=None, license_number=None):
+    """ Drop a cached driver by license number or Driver_ID after it was written. """
+    if license_number is not None:
+        drivers_by_license.invalidate(license_number)
+    if driver_id is not None:
+        drivers_by_license.invalidate_where(lambda row: row['Driver_ID'] == driver_id)
+
+def invalidate_vehicle(vin):
+    """ Drop a cached vehicle after it was written. """
+    vehicles_by_vin.invalidate(vin)
+
+def stats():
+    """ Return the counters of every entity cache. """
+    return {cache.name: cache.stats() for cache in (officers_by_badge, drivers_by_license, vehicles_by_vin)}
+
+# --- End of Entity caches ---
+# ========================================================
+
+# end of cache.py
@@ -0,0 +1,224 @@
+# async_database.py
+# Asyncio counterparts of the database helpers for the NYPD Citation system, built on aiomysql.
+# The synchronous helpers in database.py remain available for scripts and tooling during the migration.
+# With DATABASE_BACKEND=sqlite the pool hands out SQLite connections with the same interface instead.
+# =========================================================
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+import aiomysql
+import pymysql
+from fastapi import HTTPException
+from database import rows, sqlite_backend
+import metrics
+import query_trace
+from database.database import (
+    DATABASE_BACKEND, DB_CONFIG, POOL_SIZE, POOL_MAX_OVERFLOW, POOL_TIMEOUT, POOL_RECYCLE, SQLITE_PATH
+)
+
+# Shared async pool, created by init_pool() in the application lifespan
+_pool = None
+_pool_lock = asyncio.Lock()
+
+# Traced cursors, every statement is recorded with query_trace
+class TracedCursorMixin:
+    """ Records each executed statement. `statement_name` labels the cursor's statements in the metrics. """
+
+    statement_name = None
+
+    async def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            result = await super().execute(query, args)
+        except Exception:
+            query_trace.record(self.statement_name, query, args, started, None)
+            raise
+        query_trace.record(self.statement_name, query, args, started, self.rowcount)
+        return result
+
+class Cursor(TracedCursorMixin, aiomysql.Cursor):
+    """ Traced aiomysql.Cursor, the default cursor of pooled connections. """
+
+class DictCursor(TracedCursorMixin, aiomysql.DictCursor):
+    """ Traced aiomysql.DictCursor. """
+
+class SSCursor(TracedCursorMixin, aiomysql.SSCursor):
+    """ Traced aiomysql.SSCursor. """
+
+class SSDictCursor(TracedCursorMixin, aiomysql.SSDictCursor):
+    """ Traced aiomysql.SSDictCursor. """
+
+# Cursor classes by (streaming, row_format)
+CURSOR_CLASSES = {
+    (False, "dict"): DictCursor,
+    (False, "tuple"): Cursor,
+    (False, "row"): Cursor,
+    (True, "dict"): SSDictCursor,
+    (True, "tuple"): SSCursor,
+    (True, "row"): SSCursor,
+}
+
+# Helper for GET endpoints
+async def execute_query(connection, query, params=None, fetch="all", batch_size=1000, row_format="dict", name=None):
+    """ 
+    Async counterpart of database.execute_query. fetch: 'one', 'all' or 'iter'. `name` labels
+    the statement in the query metrics, derived from the SQL if omitted.
+    
+    In 'iter' mode the awaited result is an async generator streaming rows from a
+    server-side cursor, batch_size rows per round trip. Query errors are raised when
+    awaiting, before any row is consumed. The connection stays busy until the generator
+    is exhausted; abandoning it part way closes the connection.
+    """
+    rows.check_row_format(row_format)
+    cursor = await connection.cursor(CURSOR_CLASSES[(fetch == "iter", row_format)])
+    cursor.statement_name = name
+
+    # Attempt to execute the query
+    try:
+        await cursor.execute(query, params or ())
+
+        # Hand the open cursor over to the streaming generator, which closes it
+        if fetch == "iter":
+            streaming, cursor = cursor, None
+            return _iterate(connection, streaming, batch_size, row_format)
+
+        if fetch == "one":
+            result = await cursor.fetchone()
+            if result is not None and row_format == "row":
+                result = rows.shape_rows([result], cursor.description, row_format)[0]
+        else:
+            result = rows.shape_rows(await cursor.fetchall(), cursor.description, row_format)
+
+        # Check if it exists and raise 404 if not found
+        if result is None:
+            raise HTTPException(status_code=404, detail="Record not found")
+
+        return result
+
+    # Handle any database errors
+    except pymysql.MySQLError as err:
+        raise HTTPException(status_code=500, detail=f"Database error: {err}")
+
+    # Ensure the cursor is closed after operation
+    finally:
+        if cursor is not None:
+            await cursor.close()
+
+async def _iterate(connection, cursor, batch_size, row_format):
+    """ Yield rows from an executed server-side cursor, batch_size rows per round trip. """
+    finished = False
+
+    try:
+        while True:
+            batch = await cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            for row in rows.shape_rows(batch, cursor.description, row_format):
+                yield row
+        finished = True
+
+    # Handle any database errors raised while streaming
+    except pymysql.MySQLError as err:
+        raise HTTPException(status_code=500, detail=f"Database error: {err}")
+
+    # Close the cursor, or drop the connection if the consumer stopped before the end of the result
+    finally:
+        if finished:
+            await cursor.close()
+        else:
+            connection.close()
+
+# Helper for POST endpoints
+async def execute_insert(connection, query, params, name=None):
+    """ Async counterpart of database.execute_insert. """
+    async with connection.cursor() as cursor:
+        cursor.statement_name = name
+
+        # Attempt to execute the insert
+        try:
+            await cursor.execute(query, params)
+            await connection.commit()
+            return cursor.lastrowid
+
+        # Handle any database errors
+        except pymysql.MySQLError as err:
+            await connection.rollback()
+            raise HTTPException(status_code=500, detail=f"Database error: {err}")
+
+# Connection pool lifecycle
+async def init_pool():
+    """ Create the shared async connection pool. Safe to call more than once. """
+    global _pool
+    async with _pool_lock:
+        if _pool is None and DATABASE_BACKEND == "sqlite":
+            _pool = await sqlite_backend.create_pool(SQLITE_PATH, POOL_SIZE + POOL_MAX_OVERFLOW, cursorclass=Cursor)
+        elif _pool is None:
+            _pool = await aiomysql.create_pool(
+                minsize=0,
+                maxsize=POOL_SIZE + POOL_MAX_OVERFLOW,
+                pool_recycle=POOL_RECYCLE,
+                host=DB_CONFIG["host"],
+                port=DB_CONFIG["port"],
+                db=DB_CONFIG["database"],
+                user=DB_CONFIG["user"],
+                password=DB_CONFIG["password"],
+                autocommit=False,
+                cursorclass=Cursor,
+            )
+    return _pool
+
+async def close_pool():
+    """ Close the shared async connection pool. """
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+def pool_stats():
+    """ Return usage counters for the shared async connection pool. """
+    if _pool is None:
+        return {}
+    return {
+        "size": _pool.size,
+        "max_size": _pool.maxsize,
+        "idle": _pool.freesize,
+        "checked_out": _pool.size - _pool.freesize,
+    }
+
+# Borrow a pooled connection outside of a request dependency
+@asynccontextmanager
+async def connection():
+    """ Borrow a connection from the async pool for the duration of an async with block. """
+    pool = _pool or await init_pool()
+
+    # Attempt to borrow a connection, surfacing failures as 503 Service Unavailable
+    started = time.perf_counter()
+    try:
+        conn = await asyncio.wait_for(pool.acquire(), POOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Database unavailable: timed out waiting for a connection")
+    except (pymysql.MySQLError, OSError) as e:
+        raise HTTPException(status_code=503, detail=f"Database unavailable: {e}")
+    finally:
+        metrics.db_pool_acquire_wait.observe(time.perf_counter() - started, "async")
+
+    # Ensure the connection is reset and returned to the pool after use
+    try:
+        yield conn
+    finally:
+        try:
+            if not conn.closed and conn.get_transaction_status():
+                await conn.rollback()
+        except pymysql.MySQLError:
+            conn.close()
+        pool.release(conn)
+
+# Database connection dependency
+async def get_db_connection():
+    """ Borrow a connection to the NYPD Citation System database from the async pool """
+    async with connection() as conn:
+        yield conn
+
+# end of async_database.py
@@ -0,0 +1,162 @@
+# change_feed.py
+# Citation change feed for the NYPD Citation system.
+# Change_Log gets a row, in the same transaction, for every citation a write route inserts,
+# updates or deletes. GET /citations/changes?since= returns the rows after a client's cursor
+# joined to the current Citation_View row, so a client downloads what changed instead of its
+# whole citation list. Rows only point at citations: a citation missing from Citation_View
+# (deleted) or now belonging to another driver is returned as a tombstone.
+#
+# Notices written outside the API (e.g. by database.seed) are added with backfill, and rows
+# superseded by a newer row for the same citation and driver are removed with compact:
+#   python -m database.change_feed backfill
+#   python -m database.change_feed compact
+# =========================================================
+
+import argparse
+import sys
+import database.database as database
+
+# Records the current driver of the given notices, {where} selects the notices from Citation_View
+RECORD_QUERY = """
+    INSERT INTO Change_Log (Notice_ID, License_Number)
+    SELECT cv.Notice_ID, cv.License_Number
+    FROM Citation_View cv
+    {where}
+    ORDER BY cv.Notice_ID
+"""
+
+# Records the driver a notice was moved away from, read before the move
+MOVED_QUERY = "INSERT INTO Change_Log (Notice_ID, License_Number) VALUES (%s, %s)"
+
+# Serializes Change_Log writers from their first recorded row until they commit
+LOCK_QUERY = "UPDATE Change_Log_Lock SET Locked_At = CURRENT_TIMESTAMP WHERE Lock_ID = 1"
+
+# Rows of a citation and driver that a newer row of the same citation and driver supersedes
+SUPERSEDED_QUERY = """
+    SELECT old.Change_ID
+    FROM Change_Log old
+    WHERE old.Change_ID BETWEEN %s AND %s
+      AND EXISTS (SELECT 1 FROM Change_Log newer
+                  WHERE newer.Notice_ID = old.Notice_ID
+                    AND newer.License_Number <=> old.License_Number
+                    AND newer.Change_ID > old.Change_ID)
+"""
+
+# ========================================================
+# --- Write path recording ---
+
+async def record(cursor, notice_ids):
+    """
+    Add a Change_Log row for each of the given notices with its current Citation_View driver.
+    Call inside the transaction that changed them, after read_model.refresh_notices and
+    rollups.add_notices and as close to the commit as possible: it takes the Change_Log_Lock
+    row lock, which other writers wait for until this transaction ends. Every writer takes it
+    after its Citation_Rollup rows, so writers never wait for each other in opposite orders.
+    Routes deleting a notice call it before the delete, so the feed gets the row that turns
+    into a tombstone.
+    """
+    notice_ids = list(notice_ids)
+    if not notice_ids:
+        return
+
+    # Without the lock, a transaction holding a lower Change_ID could commit after a client
+    # already read a higher one, and that client would never see the change
+    await cursor.execute(LOCK_QUERY)
+    placeholders = ", ".join(["%s"] * len(notice_ids))
+    await cursor.execute(RECORD_QUERY.format(where=f"WHERE cv.Notice_ID IN ({placeholders})"), notice_ids)
+
+async def record_moved(cursor, notice_id, license_number):
+    """
+    Add a Change_Log row for the driver a notice was moved away from, which their feed returns
+    as a tombstone. license_number is the notice's Citation_View driver read before the move.
+    Call it right before record(), after the Citation_Rollup writes, like record() itself.
+    """
+    await cursor.execute(LOCK_QUERY)
+    await cursor.execute(MOVED_QUERY, (notice_id, license_number))
+
+# --- End of Write path recording ---
+# ========================================================
+# --- Backfill and compaction ---
+
+def change_id_range(connection):
+    """ Return the lowest and highest Change_ID in Change_Log. """
+    row = database.execute_query(connection, """
+        SELECT COALESCE(MIN(Change_ID), 0) AS lo, COALESCE(MAX(Change_ID), 0) AS hi FROM Change_Log
+    """, fetch="one")
+    return row['lo'], row['hi']
+
+def backfill(connection, batch_size=10000):
+    """ Add a Change_Log row for every Citation_View row with none, one Notice_ID range per transaction. Returns rows written. """
+    cursor = connection.cursor()
+    row = database.execute_query(connection, """
+        SELECT COALESCE(MIN(Notice_ID), 0) AS lo, COALESCE(MAX(Notice_ID), 0) AS hi FROM Citation_View
+    """, fetch="one")
+    low, high = row['lo'], row['hi']
+    written = 0
+    try:
+        for start in range(low, high + 1, batch_size):
+            end = start + batch_size - 1
+            cursor.execute(LOCK_QUERY)
+            cursor.execute(RECORD_QUERY.format(where="""
+                WHERE cv.Notice_ID BETWEEN %s AND %s
+                  AND NOT EXISTS (SELECT 1 FROM Change_Log cl WHERE cl.Notice_ID = cv.Notice_ID)
+            """), (start, end))
+            written += cursor.rowcount
+            connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return written
+
+def compact(connection, batch_size=10000):
+    """
+    Delete Change_Log rows superseded by a newer row for the same citation and driver, one
+    Change_ID range per transaction. Clients at any cursor still get the newer row, so the feed
+    they see is unchanged. Returns rows deleted.
+    """
+    cursor = connection.cursor()
+    low, high = change_id_range(connection)
+    deleted = 0
+    try:
+        for start in range(low, high + 1, batch_size):
+            cursor.execute(SUPERSEDED_QUERY, (start, start + batch_size - 1))
+            change_ids = [row[0] for row in cursor.fetchall()]
+            if change_ids:
+                placeholders = ", ".join(["%s"] * len(change_ids))
+                cursor.execute(f"DELETE FROM Change_Log WHERE Change_ID IN ({placeholders})", change_ids)
+                deleted += cursor.rowcount
+            connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return deleted
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the Change_Log citation change feed.")
+    parser.add_argument("command", choices=["backfill", "compact"])
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    pool = database.init_pool()
+    connection = pool.acquire()
+    try:
+        if args.command == "backfill":
+            print(f"Change_Log backfilled, {backfill(connection, args.batch_size)} rows written")
+        else:
+            print(f"Change_Log compacted, {compact(connection, args.batch_size)} rows deleted")
+        return 0
+    finally:
+        pool.release(connection)
+        database.close_pool()
+
+# --- End of Backfill and compaction ---
+# ========================================================
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# end of change_feed.py
@@ -1,19 +1,79 @@
 # database.py
 
+import os
+import time
 import mysql.connector
 from mysql.connector import Error
 from fastapi import HTTPException
+from database.pool import ConnectionPool, PoolError
+from database import rows, sqlite_backend
+import metrics
+import query_trace
+
+# Storage engine, "mysql" or "sqlite" for the embedded database file at SQLITE_PATH (see sqlite_backend.py)
+DATABASE_BACKEND = os.getenv("DATABASE_BACKEND", "mysql").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "nypd_citations.db")
+
+if DATABASE_BACKEND not in ("mysql", "sqlite"):
+    raise ValueError(f"DATABASE_BACKEND must be 'mysql' or 'sqlite', got {DATABASE_BACKEND!r}")
+
+# Connection settings for the NYPD Citation System MySQL database
+DB_CONFIG = {
+    "host": os.getenv("DATABASE_HOST", "127.0.0.1"),
+    "port": int(os.getenv("DATABASE_PORT", "3307")),
+    "database": os.getenv("DATABASE_NAME", "NYPD_Citation_System"),
+    "user": os.getenv("DATABASE_USER", "root"),
+    "password": os.getenv("DATABASE_PASSWORD", "awsp3142"),
+}
+
+# Connection pool settings
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
+POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", "3600"))
+
+# Shared pool, created by init_pool() in the application lifespan
+_pool = None
 
 # Helper for GET endpoints
-def execute_query(connection, query, params=None, fetch="all"):
-    """ A helper function to execute a query and fetch results. fetch: 'one' or 'all' """
-    cursor = connection.cursor(dictionary=True)
+def execute_query(connection, query, params=None, fetch="all", batch_size=1000, row_format="dict", name=None):
+    """ 
+    A helper function to execute a query and fetch results.
+    
+    Args:
+        connection: Database connection
+        query: SQL statement with %s placeholders
+        params: Parameters for the placeholders
+        fetch: 'one', 'all' or 'iter'. 'iter' returns a generator that streams rows from an
+            unbuffered cursor, fetching batch_size rows per round trip. The connection stays busy
+            until the generator is exhausted; abandoning it part way closes the connection.
+        batch_size: Rows fetched per round trip in 'iter' mode
+        row_format: 'dict' (default), 'tuple' or 'row' (a compact namedtuple per result shape)
+        name: Statement name in the query metrics, derived from the SQL if omitted
+    """
+    rows.check_row_format(row_format)
+    cursor = connection.cursor(dictionary=row_format == "dict", buffered=False if fetch == "iter" else None)
+    started = time.perf_counter()
     
     # Attempt to execute the query
     try:
         cursor.execute(query, params or ())
         
-        result = cursor.fetchone() if fetch == "one" else cursor.fetchall()
+        # Hand the open cursor over to the streaming generator, which closes it
+        if fetch == "iter":
+            query_trace.record(name, query, params, started, None)
+            streaming, cursor = cursor, None
+            return _iterate(connection, streaming, batch_size, row_format)
+        
+        if fetch == "one":
+            result = cursor.fetchone()
+            if result is not None and row_format == "row":
+                result = rows.shape_rows([result], cursor.description, row_format)[0]
+            query_trace.record(name, query, params, started, 0 if result is None else 1)
+        else:
+            result = rows.shape_rows(cursor.fetchall(), cursor.description, row_format)
+            query_trace.record(name, query, params, started, len(result))
         
         # Check if it exists and raise 404 if not found
         if result is None:
@@ -27,17 +87,45 @@ def execute_query(connection, query, params=None, fetch="all"):
     
     # Ensure the cursor is closed after operation
     finally:
-        cursor.close()
+        if cursor is not None:
+            cursor.close()
+
+def _iterate(connection, cursor, batch_size, row_format):
+    """ Yield rows from an executed unbuffered cursor, batch_size rows per round trip. """
+    finished = False
+    
+    try:
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield from rows.shape_rows(batch, cursor.description, row_format)
+        finished = True
+    
+    # Handle any database errors raised while streaming
+    except mysql.connector.Error as err:
+        raise HTTPException(status_code=500, detail=f"Database error: {err}")
+    
+    # Close the cursor, or drop the connection if the consumer stopped before the end of the result
+    finally:
+        if finished:
+            cursor.close()
+        elif _pool is not None:
+            _pool.invalidate(connection)
+        else:
+            connection.close()
 
 # Helper for POST endpoints
-def execute_insert(connection, query, params):
-    """ A helper function to execute an insert query. """
+def execute_insert(connection, query, params, name=None):
+    """ A helper function to execute an insert query. `name` labels it in the query metrics. """
     cursor = connection.cursor()
+    started = time.perf_counter()
     
     # Attempt to execute the insert
     try:
         cursor.execute(query, params)
         connection.commit()
+        query_trace.record(name, query, params, started, cursor.rowcount)
         return cursor.lastrowid
     
     # Handle any database errors
@@ -49,30 +137,58 @@ def execute_insert(connection, query, params):
     finally:
         cursor.close()
 
+# Connection pool lifecycle
+def init_pool():
+    """ Create the shared connection pool. Safe to call more than once. """
+    global _pool
+    if _pool is None and DATABASE_BACKEND == "sqlite":
+        _pool = sqlite_backend.ThreadConnectionPool(SQLITE_PATH)
+    elif _pool is None:
+        _pool = ConnectionPool(
+            DB_CONFIG,
+            size=POOL_SIZE,
+            max_overflow=POOL_MAX_OVERFLOW,
+            timeout=POOL_TIMEOUT,
+            health_check_interval=POOL_HEALTH_CHECK_INTERVAL,
+            recycle=POOL_RECYCLE,
+        )
+    return _pool
+
+def close_pool():
+    """ Close the shared connection pool and all of its idle connections. """
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
+def pool_stats():
+    """ Return usage counters for the shared connection pool. """
+    return _pool.stats() if _pool is not None else {}
+
+def connect(**options):
+    """ Open a dedicated connection outside the pool, e.g. for bulk loads. `options` are extra mysql.connector settings. """
+    if DATABASE_BACKEND == "sqlite":
+        return sqlite_backend.Connection(SQLITE_PATH)
+    return mysql.connector.connect(**DB_CONFIG, **options)
+
 # Database connection dependency
 def get_db_connection():
-    """ Establish a connection to the NYPD Citation System MySQL databse """
-    connection = None
+    """ Borrow a connection to the NYPD Citation System database from the pool """
+    pool = _pool or init_pool()
     
-    # Attempt to connect to the database
+    # Attempt to borrow a connection, surfacing failures as 503 Service Unavailable
+    started = time.perf_counter()
     try:
-        connection = mysql.connector.connect(
-            host='127.0.0.1',
-            port=3307,
-            database='NYPD_Citation_System',
-            user='root',
-            password='awsp3142'
-        )
-        if connection.is_connected():
-            yield connection
-    
-    # Handle any connection errors
-    except Error as e:
-        print(f"Error while connecting to MySQL: {e}")
+        connection = pool.acquire()
+    except (PoolError, Error) as e:
+        raise HTTPException(status_code=503, detail=f"Database unavailable: {e}")
+    finally:
+        metrics.db_pool_acquire_wait.observe(time.perf_counter() - started, "sync")
     
-    # Ensure the connection is closed after use
+    # Ensure the connection is returned to the pool after use
+    try:
+        yield connection
     finally:
-        if connection and connection.is_connected():
-            connection.close()
+        pool.release(connection)
             
 # end of database.py
\ No newline at end of file
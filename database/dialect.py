@@ -0,0 +1,371 @@
+# dialect.py
+# MySQL to SQLite translation for the NYPD Citation system.
+# The routers, helpers and migrations are written in MySQL's dialect. When the API runs on the
+# embedded SQLite backend (DATABASE_BACKEND=sqlite, see sqlite_backend.py), every statement is
+# rewritten here before it is executed, and SQLite errors are mapped to the MySQL error numbers
+# the callers check for (e.g. 1452 for a missing foreign key parent).
+#
+# Translations are cached per statement text. Only the constructs this code base uses are
+# covered, anything else is passed through unchanged and left for SQLite to reject.
+# =========================================================
+
+import re
+import sqlite3
+from collections import namedtuple
+from functools import lru_cache
+
+# SQLite added ORDER BY inside aggregate calls in 3.44, older versions use ORDERED_GROUP_CONCAT
+NATIVE_ORDERED_AGGREGATES = sqlite3.sqlite_version_info >= (3, 44, 0)
+
+# MySQL error numbers raised for SQLite errors
+ER_DUP_ENTRY = 1062
+ER_DUP_KEYNAME = 1061
+ER_TABLE_EXISTS = 1050
+ER_BAD_NULL = 1048
+ER_BAD_FIELD = 1054
+ER_PARSE = 1064
+ER_NO_SUCH_TABLE = 1146
+ER_LOCK_WAIT_TIMEOUT = 1205
+ER_ROW_IS_REFERENCED = 1451
+ER_NO_REFERENCED_ROW = 1452
+ER_CHECK_CONSTRAINT = 3819
+ER_DATA_OUT_OF_RANGE = 1264
+ER_UNKNOWN = 1105
+
+INTEGRITY_ERRORS = {ER_DUP_ENTRY, ER_BAD_NULL, ER_ROW_IS_REFERENCED, ER_NO_REFERENCED_ROW, ER_CHECK_CONSTRAINT}
+PROGRAMMING_ERRORS = {ER_DUP_KEYNAME, ER_TABLE_EXISTS, ER_BAD_FIELD, ER_PARSE, ER_NO_SUCH_TABLE}
+DATA_ERRORS = {ER_DATA_OUT_OF_RANGE}
+
+# A translated statement. sql is None for statements with no SQLite counterpart (e.g. SET SESSION),
+# returning_id names the column whose value stands in for LAST_INSERT_ID(column),
+# extra holds statements to run afterwards (indexes declared inside CREATE TABLE)
+Statement = namedtuple("Statement", ("sql", "returning_id", "extra"))
+
+# String literals and comments, masked while rewriting so their contents are never touched
+LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|--[^\n]*|/\*.*?\*/", re.DOTALL)
+MASKED = re.compile(r"\x00(\d+)\x00")
+
+SET_STATEMENT = re.compile(r"^\s*SET\s+(?:SESSION\s+|GLOBAL\s+)?(.*)$", re.IGNORECASE | re.DOTALL)
+SET_ASSIGNMENT = re.compile(r"(\w+)\s*=\s*(\w+)")
+TRUNCATE_STATEMENT = re.compile(r"^\s*TRUNCATE\s+(?:TABLE\s+)?(\w+)\s*$", re.IGNORECASE)
+ANALYZE_STATEMENT = re.compile(r"^\s*ANALYZE\s+(?:NO_WRITE_TO_BINLOG\s+|LOCAL\s+)?TABLE\b", re.IGNORECASE)
+CREATE_TABLE = re.compile(r"^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?", re.IGNORECASE)
+AUTO_INCREMENT_KEY = re.compile(
+    r"\b(?:BIG|SMALL|MEDIUM|TINY)?INT(?:\(\d+\))?\s+(?:UNSIGNED\s+)?(?:NOT\s+NULL\s+)?AUTO_INCREMENT\s+PRIMARY\s+KEY",
+    re.IGNORECASE
+)
+INLINE_INDEX = re.compile(r",\s*(UNIQUE\s+|FULLTEXT\s+)?(?:INDEX|KEY)\s+`?(\w+)`?\s*\(([^()]*)\)", re.IGNORECASE)
+TABLE_OPTIONS = re.compile(r"\)\s*(?:ENGINE|(?:DEFAULT\s+)?CHARSET|(?:DEFAULT\s+)?CHARACTER\s+SET|COLLATE)\b[^)]*$", re.IGNORECASE)
+CREATE_FULLTEXT_INDEX = re.compile(
+    r"^\s*CREATE\s+FULLTEXT\s+INDEX\s+`?(\w+)`?\s+ON\s+`?(\w+)`?\s*\(([^()]*)\)\s*$", re.IGNORECASE
+)
+ON_DUPLICATE_KEY = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b(.*)$", re.IGNORECASE | re.DOTALL)
+
+
+def mask(sql):
+    """ Replace string literals and comments with numbered markers, returning the masked SQL and the literals. """
+    literals = []
+
+    def keep(match):
+        literals.append(match.group(0))
+        return f"\x00{len(literals) - 1}\x00"
+
+    return LITERAL.sub(keep, sql), literals
+
+def unmask(sql, literals, placeholders):
+    """
+    Put the literals back, converting MySQL backslash escapes to SQLite's doubled quotes. The
+    MySQL drivers format parameters into the whole statement, so %% is a percent sign in
+    literals too when there are parameters.
+    """
+    def restore(match):
+        literal = literals[int(match.group(1))]
+        if literal.startswith("'") and "\\" in literal:
+            literal = "'" + re.sub(r"\\(.)", lambda escape: "''" if escape.group(1) == "'" else escape.group(1), literal[1:-1]) + "'"
+        if placeholders and literal.startswith("'"):
+            literal = literal.replace("%%", "%")
+        return literal
+    return MASKED.sub(restore, sql)
+
+def top_level(sql, pattern):
+    """ Return the first match of pattern outside of parentheses, or None. """
+    depth = 0
+    for position, character in enumerate(sql):
+        if character == "(":
+            depth += 1
+        elif character == ")":
+            depth -= 1
+        elif depth == 0:
+            match = pattern.match(sql, position)
+            if match and (position == 0 or not sql[position - 1].isalnum()):
+                return match
+    return None
+
+def closing_paren(sql, opening):
+    """ Return the index of the parenthesis closing the one at `opening`. """
+    depth = 0
+    for position in range(opening, len(sql)):
+        if sql[position] == "(":
+            depth += 1
+        elif sql[position] == ")":
+            depth -= 1
+            if depth == 0:
+                return position
+    raise ValueError("Unbalanced parentheses in SQL statement")
+
+# ========================================================
+# --- Statement translation ---
+
+GROUP_CONCAT = re.compile(r"\bGROUP_CONCAT\s*\(", re.IGNORECASE)
+ORDER_BY = re.compile(r"ORDER\s+BY\s+", re.IGNORECASE)
+SEPARATOR = re.compile(r"SEPARATOR\s+", re.IGNORECASE)
+DESCENDING = re.compile(r"\s+DESC\s*$", re.IGNORECASE)
+ASCENDING = re.compile(r"\s+ASC\s*$", re.IGNORECASE)
+
+def rewrite_group_concat(sql):
+    """ Rewrite GROUP_CONCAT(expr [ORDER BY key] [SEPARATOR s]) into SQLite's argument order. """
+    output = []
+    position = 0
+    while True:
+        match = GROUP_CONCAT.search(sql, position)
+        if match is None:
+            output.append(sql[position:])
+            return "".join(output)
+
+        close = closing_paren(sql, match.end() - 1)
+        inner = rewrite_group_concat(sql[match.end():close])
+
+        separator = "','"
+        found = top_level(inner, SEPARATOR)
+        if found:
+            inner, separator = inner[:found.start()].rstrip(), inner[found.end():].strip()
+
+        order = None
+        found = top_level(inner, ORDER_BY)
+        if found:
+            inner, order = inner[:found.start()].rstrip(), inner[found.end():].strip()
+
+        if order is None:
+            call = f"GROUP_CONCAT({inner}, {separator})"
+        elif NATIVE_ORDERED_AGGREGATES:
+            call = f"GROUP_CONCAT({inner}, {separator} ORDER BY {order})"
+        else:
+            descending = 1 if DESCENDING.search(order) else 0
+            keys = ASCENDING.sub("", DESCENDING.sub("", order))
+            call = f"ORDERED_GROUP_CONCAT({inner}, {separator}, {descending}, {keys})"
+
+        output.append(sql[position:match.start()] + call)
+        position = close + 1
+
+def rewrite_set(assignments):
+    """ SET statements only matter for foreign key checks, the other session variables have no SQLite counterpart. """
+    for name, value in SET_ASSIGNMENT.findall(assignments):
+        if name.lower() == "foreign_key_checks":
+            return f"PRAGMA foreign_keys = {'OFF' if value in ('0', 'OFF', 'off') else 'ON'}"
+    return None
+
+def rewrite_create_table(sql):
+    """ Rewrite MySQL column and index definitions, moving inline indexes to CREATE INDEX statements. """
+    table = CREATE_TABLE.match(sql).group(1)
+    extra = []
+
+    def move_index(match):
+        kind, name, columns = match.group(1), match.group(2), match.group(3)
+        if kind and kind.strip().upper() == "FULLTEXT":
+            return ""
+        unique = "UNIQUE " if kind else ""
+        extra.append(f"CREATE {unique}INDEX IF NOT EXISTS {name} ON {table} ({columns.strip()})")
+        return ""
+
+    sql = AUTO_INCREMENT_KEY.sub("INTEGER PRIMARY KEY AUTOINCREMENT", sql)
+    sql = INLINE_INDEX.sub(move_index, sql)
+    sql = TABLE_OPTIONS.sub(")", sql.rstrip())
+    return sql, extra
+
+def rewrite_fulltext_index(match):
+    """
+    Rewrite CREATE FULLTEXT INDEX as an FTS5 table of the same name over the table's rowid, kept
+    current by triggers and built from the existing rows. Queries read it with MATCH themselves,
+    MySQL's MATCH ... AGAINST is not translated.
+    """
+    name, table = match.group(1), match.group(2)
+    columns = [column.strip().strip("`") for column in match.group(3).split(",")]
+    listed = ", ".join(columns)
+    new = ", ".join(f"new.{column}" for column in columns)
+    old = ", ".join(f"old.{column}" for column in columns)
+
+    insert = f"INSERT INTO {name} (rowid, {listed}) VALUES (new.rowid, {new});"
+    delete = f"INSERT INTO {name} ({name}, rowid, {listed}) VALUES ('delete', old.rowid, {old});"
+    sql = (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5("
+        f"{listed}, content='{table}', tokenize='unicode61 remove_diacritics 2')"
+    )
+    extra = [
+        f"CREATE TRIGGER IF NOT EXISTS {name}_insert AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {name}_delete AFTER DELETE ON {table} BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {name}_update AFTER UPDATE ON {table} BEGIN {delete} {insert} END",
+        f"INSERT INTO {name} ({name}) VALUES ('rebuild')",
+    ]
+    return sql, extra
+
+def rewrite_upsert(sql):
+    """ Rewrite ON DUPLICATE KEY UPDATE as an SQLite upsert, LAST_INSERT_ID(column) becomes RETURNING column. """
+    match = ON_DUPLICATE_KEY.search(sql)
+    if match is None:
+        return sql, None
+
+    returning = None
+    clause = re.sub(r"\bVALUES\s*\(\s*(\w+)\s*\)", r"excluded.\1", match.group(1), flags=re.IGNORECASE)
+    found = re.search(r"\bLAST_INSERT_ID\s*\(\s*(\w+)\s*\)", clause, re.IGNORECASE)
+    if found:
+        returning = found.group(1)
+        clause = clause[:found.start()] + returning + clause[found.end():]
+
+    head = sql[:match.start()].rstrip()
+
+    # An upsert after INSERT ... SELECT needs a WHERE clause to parse unambiguously
+    if not re.search(r"\bVALUES\s*\(", head, re.IGNORECASE) and not re.search(r"\bWHERE\b", head, re.IGNORECASE):
+        head += " WHERE true"
+
+    sql = f"{head} ON CONFLICT DO UPDATE SET {clause.strip()}"
+    if returning:
+        sql += f" RETURNING {returning}"
+    return sql, returning
+
+@lru_cache(maxsize=1024)
+def translate(query, placeholders=True):
+    """
+    Translate one MySQL statement to SQLite.
+
+    Args:
+        query: SQL in MySQL's dialect
+        placeholders: Whether the statement is executed with parameters, so %s and %(name)s
+            are placeholders and %% is a literal percent sign
+
+    Returns:
+        Statement: The SQLite statement, the LAST_INSERT_ID column if any and follow-up statements
+    """
+    sql, literals = mask(query)
+    extra = []
+
+    match = SET_STATEMENT.match(sql)
+    if match:
+        sql = rewrite_set(match.group(1))
+        return Statement(sql, None, ())
+
+    match = TRUNCATE_STATEMENT.match(sql)
+    if match:
+        sql = f"DELETE FROM {match.group(1)}"
+
+    if ANALYZE_STATEMENT.match(sql):
+        return Statement("ANALYZE", None, ())
+
+    if CREATE_TABLE.match(sql):
+        sql, extra = rewrite_create_table(sql)
+
+    match = CREATE_FULLTEXT_INDEX.match(sql)
+    if match:
+        sql, extra = rewrite_fulltext_index(match)
+        return Statement(sql, None, tuple(extra))
+
+    sql = re.sub(r"\bINSERT\s+IGNORE\s+INTO\b", "INSERT OR IGNORE INTO", sql, flags=re.IGNORECASE)
+    sql, returning_id = rewrite_upsert(sql)
+    sql = rewrite_group_concat(sql)
+    sql = sql.replace("<=>", " IS ")
+    sql = re.sub(r"\bLEAST\s*\(", "MIN(", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bGREATEST\s*\(", "MAX(", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bNOW\s*\(\s*\)", "DATETIME('now', 'localtime')", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bCURDATE\s*\(\s*\)", "DATE('now', 'localtime')", sql, flags=re.IGNORECASE)
+
+    # Named locks serialize processes sharing a MySQL server, an SQLite file is only written by one
+    sql = re.sub(
+        r"\b(?:GET_LOCK|RELEASE_LOCK)\s*\(([^()]*)\)",
+        lambda lock: "(1 OR " + " OR ".join(argument.strip() for argument in lock.group(1).split(",")) + ")",
+        sql, flags=re.IGNORECASE
+    )
+
+    if placeholders:
+        sql = re.sub(r"%\((\w+)\)s", r":\1", sql)
+        sql = sql.replace("%s", "?").replace("%%", "%")
+
+    return Statement(
+        unmask(sql, literals, placeholders), returning_id, tuple(unmask(statement, literals, placeholders) for statement in extra)
+    )
+
+# --- End of Statement translation ---
+# ========================================================
+# --- Functions, aggregates and errors ---
+
+class OrderedGroupConcat:
+    """ GROUP_CONCAT with an ORDER BY for SQLite versions before 3.44, registered as ORDERED_GROUP_CONCAT. """
+
+    def __init__(self):
+        self.values = []
+        self.separator = ","
+        self.descending = False
+
+    def step(self, value, separator, descending, *keys):
+        if value is None:
+            return
+        self.separator = separator
+        self.descending = bool(descending)
+        self.values.append((tuple((key is not None, key) for key in keys), value))
+
+    def finalize(self):
+        if not self.values:
+            return None
+        self.values.sort(key=lambda entry: entry[0], reverse=self.descending)
+        return self.separator.join(str(value) for _, value in self.values)
+
+def find_in_set(needle, haystack):
+    """ MySQL's FIND_IN_SET: the 1-based position of needle in a comma-separated list, 0 if absent. """
+    if needle is None or haystack is None:
+        return None
+    try:
+        return str(haystack).split(",").index(str(needle)) + 1
+    except ValueError:
+        return 0
+
+def mysql_errno(err, sql):
+    """ Return the MySQL error number matching an sqlite3 error, or the OverflowError of an oversized integer parameter. """
+    message = str(err)
+    if isinstance(err, OverflowError):
+        return ER_DATA_OUT_OF_RANGE
+    if isinstance(err, sqlite3.IntegrityError):
+        if "FOREIGN KEY" in message:
+            # A DELETE removes a referenced parent, any other statement writes a child without its parent
+            return ER_ROW_IS_REFERENCED if (sql or "").lstrip()[:6].upper() == "DELETE" else ER_NO_REFERENCED_ROW
+        if "UNIQUE" in message or "PRIMARY KEY" in message:
+            return ER_DUP_ENTRY
+        if "NOT NULL" in message:
+            return ER_BAD_NULL
+        if "CHECK" in message:
+            return ER_CHECK_CONSTRAINT
+        return ER_UNKNOWN
+
+    if "already exists" in message:
+        return ER_DUP_KEYNAME if message.startswith("index") else ER_TABLE_EXISTS
+    if "no such table" in message:
+        return ER_NO_SUCH_TABLE
+    if "no such column" in message:
+        return ER_BAD_FIELD
+    if "syntax error" in message or "incomplete input" in message:
+        return ER_PARSE
+    if "locked" in message or "busy" in message:
+        return ER_LOCK_WAIT_TIMEOUT
+    return ER_UNKNOWN
+
+def error_kind(errno):
+    """ Return 'integrity', 'programming', 'data' or 'operational', the DB-API exception class of a MySQL error number. """
+    if errno in INTEGRITY_ERRORS:
+        return "integrity"
+    if errno in PROGRAMMING_ERRORS:
+        return "programming"
+    if errno in DATA_ERRORS:
+        return "data"
+    return "operational"
+
+# --- End of Functions, aggregates and errors ---
+# ========================================================
+
+# end of dialect.py
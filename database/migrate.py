@@ -0,0 +1,218 @@
+# migrate.py
+# Versioned schema migrations for the NYPD Citation system.
+# Migrations are the numbered .sql files in database/migrations, applied in order and recorded
+# in the Schema_Migrations table, so running them again only applies what is missing.
+# The API applies pending migrations at startup; they can also be run by hand:
+#   python -m database.migrate               apply pending migrations
+#   python -m database.migrate --status      list applied and pending migrations
+#   python -m database.migrate --target 2    apply pending migrations up to version 2
+#   python -m database.migrate --seed examples   also load database/seeds/examples.sql
+# =========================================================
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+import mysql.connector
+import database.database as database
+from database.pool import PoolError
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+SEEDS_DIR = os.path.join(os.path.dirname(__file__), "seeds")
+
+# Apply pending migrations when the API starts
+MIGRATE_ON_STARTUP = os.getenv("DATABASE_MIGRATE_ON_STARTUP", "1") == "1"
+
+# Only one process migrates at a time, e.g. when several API workers start together
+LOCK_NAME = "NYPD_Citation_System.migrations"
+LOCK_TIMEOUT = 60
+
+# MySQL errors meaning a statement was already applied by an interrupted earlier run
+ER_DUP_KEYNAME = 1061
+
+MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+CREATE_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS Schema_Migrations (
+        Version INT PRIMARY KEY,
+        Name VARCHAR(255) NOT NULL,
+        Checksum CHAR(64) NOT NULL,
+        Applied_At DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+class MigrationError(Exception):
+    """ A migration could not be applied. """
+
+
+def split_statements(sql):
+    """ Split a .sql file into statements, dropping comment lines. Statements end with ';' at the end of a line or before a comment. """
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    statements = re.split(r";\s*(?:--[^\n]*)?$", "\n".join(lines), flags=re.MULTILINE)
+    return [statement.strip() for statement in statements if statement.strip()]
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """ Return (version, name, checksum, statements) for every migration file, ordered by version. """
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename), encoding="utf-8") as sql_file:
+            sql = sql_file.read()
+        migrations.append((int(match.group(1)), match.group(2), hashlib.sha256(sql.encode()).hexdigest(), split_statements(sql)))
+
+    versions = [version for version, _, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise MigrationError("Two migration files share a version number")
+    return migrations
+
+def applied_migrations(cursor):
+    """ Return {version: checksum} of the migrations recorded as applied. """
+    cursor.execute("SELECT Version, Checksum FROM Schema_Migrations")
+    return dict(cursor.fetchall())
+
+def run_statement(cursor, statement):
+    """ Execute one migration statement, tolerating indexes left behind by an interrupted run. """
+    try:
+        cursor.execute(statement)
+    except mysql.connector.Error as err:
+        if err.errno != ER_DUP_KEYNAME:
+            raise
+
+def migrate(connection, directory=MIGRATIONS_DIR, target=None):
+    """
+    Apply every pending migration in version order, up to and including `target` if given.
+
+    MySQL commits DDL implicitly, so a migration is not atomic: statements are written to be
+    safe to run again (IF NOT EXISTS, INSERT IGNORE), and a migration is only recorded once
+    all of its statements succeeded.
+
+    Returns:
+        list: (version, name) of the migrations applied by this call
+    """
+    cursor = connection.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+    if cursor.fetchone()[0] != 1:
+        cursor.close()
+        raise MigrationError("Timed out waiting for another process to finish migrating")
+
+    applied = []
+    try:
+        cursor.execute(CREATE_MIGRATIONS_TABLE)
+        done = applied_migrations(cursor)
+
+        for version, name, checksum, statements in load_migrations(directory):
+            if target is not None and version > target:
+                break
+            if version in done:
+                if done[version] != checksum:
+                    print(f"Warning: migration {version:04d}_{name} changed after it was applied")
+                continue
+
+            try:
+                for statement in statements:
+                    run_statement(cursor, statement)
+                cursor.execute(
+                    "INSERT INTO Schema_Migrations (Version, Name, Checksum) VALUES (%s, %s, %s)",
+                    (version, name, checksum)
+                )
+                connection.commit()
+            except mysql.connector.Error as err:
+                connection.rollback()
+                raise MigrationError(f"Migration {version:04d}_{name} failed: {err}")
+            applied.append((version, name))
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+        cursor.fetchall()
+        cursor.close()
+
+    return applied
+
+def status(connection, directory=MIGRATIONS_DIR):
+    """ Return (version, name, state) for every migration, state is 'applied', 'changed' or 'pending'. """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(CREATE_MIGRATIONS_TABLE)
+        done = applied_migrations(cursor)
+    finally:
+        cursor.close()
+
+    states = []
+    for version, name, checksum, _ in load_migrations(directory):
+        if version not in done:
+            states.append((version, name, "pending"))
+        else:
+            states.append((version, name, "applied" if done[version] == checksum else "changed"))
+    return states
+
+def seed(connection, name):
+    """ Load database/seeds/<name>.sql in one transaction. """
+    with open(os.path.join(SEEDS_DIR, f"{name}.sql"), encoding="utf-8") as sql_file:
+        statements = split_statements(sql_file.read())
+
+    cursor = connection.cursor()
+    try:
+        for statement in statements:
+            cursor.execute(statement)
+        connection.commit()
+    except mysql.connector.Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def migrate_on_startup():
+    """ Apply pending migrations through the shared pool, reporting instead of failing if MySQL is not up. """
+    if not MIGRATE_ON_STARTUP:
+        return
+
+    pool = database.init_pool()
+    try:
+        connection = pool.acquire()
+    except (PoolError, mysql.connector.Error) as e:
+        print(f"Migrations not applied at startup, database unavailable: {e}")
+        return
+
+    try:
+        for version, name in migrate(connection):
+            print(f"Applied migration {version:04d}_{name}")
+    except (MigrationError, mysql.connector.Error) as e:
+        print(f"Migrations not applied at startup: {e}")
+    finally:
+        pool.release(connection)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply the NYPD Citation System schema migrations.")
+    parser.add_argument("--status", action="store_true", help="List migrations without applying them")
+    parser.add_argument("--target", type=int, help="Highest migration version to apply")
+    parser.add_argument("--seed", help="Seed file from database/seeds to load after migrating, e.g. examples")
+    args = parser.parse_args(argv)
+
+    pool = database.init_pool()
+    connection = pool.acquire()
+    try:
+        if args.status:
+            for version, name, state in status(connection):
+                print(f"{version:04d}_{name:<30} {state}")
+            return 0
+
+        applied = migrate(connection, target=args.target)
+        for version, name in applied:
+            print(f"Applied migration {version:04d}_{name}")
+        if not applied:
+            print("Schema is up to date")
+
+        if args.seed:
+            seed(connection, args.seed)
+            print(f"Loaded seed {args.seed}")
+        return 0
+    finally:
+        pool.release(connection)
+        database.close_pool()
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# end of migrate.py
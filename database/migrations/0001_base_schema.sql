@@ -0,0 +1,77 @@
+-- 0001_base_schema.sql
+-- Base tables of the NYPD Citation system.
+
+-- 1. Create Driver Table
+CREATE TABLE IF NOT EXISTS Driver (
+    Driver_ID INT AUTO_INCREMENT PRIMARY KEY,
+    First_Name VARCHAR(50),
+    Last_Name VARCHAR(50),
+    Address VARCHAR(255),
+    Birth_Date DATE,
+    License_Number VARCHAR(20) UNIQUE,
+    License_State CHAR(2)
+);
+
+-- 2. Create Officer Table
+CREATE TABLE IF NOT EXISTS Officer (
+    Officer_ID INT AUTO_INCREMENT PRIMARY KEY,
+    Badge_Number VARCHAR(20) UNIQUE,
+    Secret_Hash VARCHAR(255),
+    First_Name VARCHAR(50),
+    Last_Name VARCHAR(50)
+);
+
+-- 3. Create Vehicle Table
+CREATE TABLE IF NOT EXISTS Vehicle (
+    VIN VARCHAR(17) PRIMARY KEY,
+    Make VARCHAR(50),
+    Model VARCHAR(50),
+    Color VARCHAR(20),
+    License_Plate VARCHAR(10),
+    License_State CHAR(2)
+);
+
+-- 4. Create Correction Notice Table
+CREATE TABLE IF NOT EXISTS Correction_Notice (
+    Notice_ID INT AUTO_INCREMENT PRIMARY KEY,
+    Violation_Date DATE,
+    Violation_Time VARCHAR(8),
+    Location VARCHAR(255),
+    Driver_ID INT,
+    Officer_ID INT,
+    VIN VARCHAR(17),
+    FOREIGN KEY (Driver_ID) REFERENCES Driver(Driver_ID),
+    FOREIGN KEY (Officer_ID) REFERENCES Officer(Officer_ID),
+    FOREIGN KEY (VIN) REFERENCES Vehicle(VIN)
+);
+
+-- 5. Create the Violation lookup table (The 'Catalog')
+CREATE TABLE IF NOT EXISTS Violation (
+    Violation_Code VARCHAR(10) PRIMARY KEY,
+    Violation_Description VARCHAR(255)
+);
+
+-- 6. Create the Linking Table (The 'Bridge')
+CREATE TABLE IF NOT EXISTS Notice_Violation (
+    Notice_ID INT,
+    Violation_Code VARCHAR(10),
+    PRIMARY KEY (Notice_ID, Violation_Code),
+    FOREIGN KEY (Notice_ID) REFERENCES Correction_Notice(Notice_ID) ON DELETE CASCADE,
+    FOREIGN KEY (Violation_Code) REFERENCES Violation(Violation_Code)
+);
+
+-- Violation codes are reference data the API relies on (e.g. OTHER for unmatched citations)
+INSERT IGNORE INTO Violation (Violation_Code, Violation_Description) VALUES
+('SPEED0110', 'Speeding 1-10 mph over limit'),
+('SPEED1120', 'Speeding 11-20 mph over limit'),
+('SPEED2130', 'Speeding 21-30 mph over limit'),
+('SPEED31', 'Speeding 31+ mph over limit'),
+('REDLT', 'Running Red Light'),
+('PARK', 'Illegal Parking'),
+('SEATB', 'No Seatbelt'),
+('RECK', 'Reckless Driving'),
+('LANEC', 'Improper Lane Change'),
+('REG', 'Expired Registration'),
+('OTHER', 'Other Violation');
+
+-- end of 0001_base_schema.sql
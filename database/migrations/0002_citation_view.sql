@@ -0,0 +1,39 @@
+-- 0002_citation_view.sql
+-- Denormalized citation read model, see database/read_model.py.
+
+-- One denormalized row per notice for the citation endpoints
+-- Kept in sync by the API write routes, rebuilt with: python -m database.read_model rebuild
+CREATE TABLE IF NOT EXISTS Citation_View (
+    Notice_ID INT PRIMARY KEY,
+    Violation_Date DATE,
+    Violation_Time VARCHAR(8),
+    Location VARCHAR(255),
+    Driver_ID INT,
+    License_Number VARCHAR(20),
+    First_Name VARCHAR(50),
+    Last_Name VARCHAR(50),
+    Officer_ID INT,
+    Badge_Number VARCHAR(20),
+    VIN VARCHAR(17),
+    Violation_Codes TEXT,
+    Violation_Descriptions TEXT,
+    INDEX idx_citation_view_date (Violation_Date, Notice_ID),
+    INDEX idx_citation_view_license (License_Number, Violation_Date, Notice_ID),
+    FOREIGN KEY (Notice_ID) REFERENCES Correction_Notice(Notice_ID) ON DELETE CASCADE
+);
+
+-- Backfill notices written before the read model existed
+INSERT IGNORE INTO Citation_View (Notice_ID, Violation_Date, Violation_Time, Location, Driver_ID, License_Number, First_Name,
+                                  Last_Name, Officer_ID, Badge_Number, VIN, Violation_Codes, Violation_Descriptions)
+SELECT cn.Notice_ID, cn.Violation_Date, cn.Violation_Time, cn.Location, cn.Driver_ID, d.License_Number, d.First_Name,
+       d.Last_Name, cn.Officer_ID, o.Badge_Number, cn.VIN,
+       (SELECT GROUP_CONCAT(nv.Violation_Code ORDER BY nv.Violation_Code)
+            FROM Notice_Violation nv WHERE nv.Notice_ID = cn.Notice_ID),
+       (SELECT GROUP_CONCAT(v.Violation_Description ORDER BY nv.Violation_Code)
+            FROM Notice_Violation nv JOIN Violation v ON nv.Violation_Code = v.Violation_Code
+            WHERE nv.Notice_ID = cn.Notice_ID)
+FROM Correction_Notice cn
+JOIN Driver d ON cn.Driver_ID = d.Driver_ID
+JOIN Officer o ON cn.Officer_ID = o.Officer_ID;
+
+-- end of 0002_citation_view.sql
@@ -0,0 +1,19 @@
+-- 0003_query_indexes.sql
+-- Indexes for the filters and joins of the router queries.
+-- Already covered elsewhere, so not repeated here:
+--   Driver.License_Number and Officer.Badge_Number   UNIQUE keys from 0001 (logins, driver lookups, notices by officer)
+--   Notice_Violation(Notice_ID)                       leftmost column of its primary key (violation subqueries)
+--   Citation_View list orders                         indexes from 0002 (citation pages and export)
+-- Each index below starts with a foreign key column, so MySQL uses it for the foreign key
+-- and drops the index it created implicitly for that key.
+
+-- Notices by officer (GET /notices/officer/{badge_number}, POST /citations/batch read-back)
+CREATE INDEX idx_notice_officer ON Correction_Notice (Officer_ID, Notice_ID);
+
+-- Notices of a driver, newest first
+CREATE INDEX idx_notice_driver_date ON Correction_Notice (Driver_ID, Violation_Date, Notice_ID);
+
+-- Notices referencing a violation code, checked when violation codes are removed
+CREATE INDEX idx_notice_violation_code ON Notice_Violation (Violation_Code, Notice_ID);
+
+-- end of 0003_query_indexes.sql
@@ -0,0 +1,33 @@
+-- 0004_change_log.sql
+-- Citation change feed, see database/change_feed.py.
+
+-- One row per citation touched by a write, in commit order, read by GET /citations/changes.
+-- License_Number is the driver the citation belonged to when it was recorded, so a driver's
+-- feed also lists citations moved to another driver or deleted (as tombstones).
+-- There is no foreign key to Correction_Notice: rows of deleted notices must stay behind.
+CREATE TABLE IF NOT EXISTS Change_Log (
+    Change_ID BIGINT AUTO_INCREMENT PRIMARY KEY,
+    Notice_ID INT NOT NULL,
+    License_Number VARCHAR(20),
+    Changed_At DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_change_log_license (License_Number, Change_ID),
+    INDEX idx_change_log_notice (Notice_ID, Change_ID)
+);
+
+-- Writers update this row before adding Change_Log rows and hold its lock until they commit,
+-- so Change_IDs become visible in increasing order and a client never skips past a
+-- transaction that committed after a newer Change_ID was already read
+CREATE TABLE IF NOT EXISTS Change_Log_Lock (
+    Lock_ID INT PRIMARY KEY,
+    Locked_At DATETIME
+);
+
+INSERT IGNORE INTO Change_Log_Lock (Lock_ID, Locked_At) VALUES (1, NULL);
+
+-- Backfill notices written before the change feed existed, so since=0 starts a full sync
+INSERT INTO Change_Log (Notice_ID, License_Number)
+SELECT Notice_ID, License_Number
+FROM Citation_View
+ORDER BY Notice_ID;
+
+-- end of 0004_change_log.sql
@@ -0,0 +1,11 @@
+-- 0005_citation_search.sql
+-- Full-text index for GET /citations/search.
+-- Citation_View already holds the searched columns of every notice and is refreshed by the
+-- write routes, so indexing it keeps search current without extra work in the routes.
+-- The first FULLTEXT index on an InnoDB table rebuilds the table, run this off-peak on large data.
+-- On SQLite the index becomes an FTS5 table of the same name kept current by triggers (see database/dialect.py).
+
+-- Location, driver name and violation descriptions, in the column order MATCH must list them
+CREATE FULLTEXT INDEX idx_citation_view_search ON Citation_View (Location, First_Name, Last_Name, Violation_Descriptions);
+
+-- end of 0005_citation_search.sql
@@ -0,0 +1,36 @@
+-- 0006_citation_rollup.sql
+-- Citation counters for the /stats dashboards, see database/rollups.py.
+
+-- Notices per day, and per officer, violation code and location per month.
+-- Dimension is 'day' (Period 'YYYY-MM-DD', Bucket ''), 'officer' (Bucket Officer_ID),
+-- 'violation' (Bucket Violation_Code) or 'location' (Bucket Location), the last three with
+-- Period 'YYYY-MM'. Monthly periods keep the location buckets far fewer than the notices.
+-- Kept in step by the API write routes, rebuilt with: python -m database.rollups rebuild
+CREATE TABLE IF NOT EXISTS Citation_Rollup (
+    Dimension VARCHAR(10) NOT NULL,
+    Period VARCHAR(10) NOT NULL,
+    Bucket VARCHAR(255) NOT NULL,
+    Notices INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Dimension, Period, Bucket)
+);
+
+-- Backfill the counters of notices written before the rollup existed
+INSERT INTO Citation_Rollup (Dimension, Period, Bucket, Notices)
+SELECT 'day', SUBSTR(cn.Violation_Date, 1, 10), '', COUNT(*)
+FROM Correction_Notice cn
+GROUP BY SUBSTR(cn.Violation_Date, 1, 10)
+UNION ALL
+SELECT 'officer', SUBSTR(cn.Violation_Date, 1, 7), CAST(cn.Officer_ID AS CHAR), COUNT(*)
+FROM Correction_Notice cn
+GROUP BY SUBSTR(cn.Violation_Date, 1, 7), cn.Officer_ID
+UNION ALL
+SELECT 'location', SUBSTR(cn.Violation_Date, 1, 7), COALESCE(cn.Location, ''), COUNT(*)
+FROM Correction_Notice cn
+GROUP BY SUBSTR(cn.Violation_Date, 1, 7), COALESCE(cn.Location, '')
+UNION ALL
+SELECT 'violation', SUBSTR(cn.Violation_Date, 1, 7), nv.Violation_Code, COUNT(*)
+FROM Correction_Notice cn
+JOIN Notice_Violation nv ON nv.Notice_ID = cn.Notice_ID
+GROUP BY SUBSTR(cn.Violation_Date, 1, 7), nv.Violation_Code;
+
+-- end of 0006_citation_rollup.sql
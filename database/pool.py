@@ -0,0 +1,237 @@
+# pool.py
+# Managed MySQL connection pool for the NYPD Citation system.
+# Connections are borrowed by the get_db_connection dependency and returned after each request,
+# so requests no longer pay a full TCP + auth handshake.
+# =========================================================
+
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector import Error
+
+
+class PoolError(Exception):
+    """ Base error raised by the connection pool. """
+
+
+class PoolTimeout(PoolError):
+    """ Raised when no connection could be acquired within the acquire timeout. """
+
+
+class PoolClosed(PoolError):
+    """ Raised when acquiring from a pool that has been closed. """
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of MySQL connections.
+
+    Keeps up to `size` idle connections around for reuse and allows up to `max_overflow`
+    extra connections under load; overflow connections are closed when they are returned.
+    Borrowers wait up to `timeout` seconds for a free slot before PoolTimeout is raised.
+
+    Connections idle for longer than `health_check_interval` seconds are pinged before
+    being handed out, connections older than `recycle` seconds are replaced, and every
+    returned connection has its open transaction rolled back so no state leaks between requests.
+    """
+
+    def __init__(self, config, size=10, max_overflow=10, timeout=5.0,
+                 health_check_interval=30.0, recycle=3600.0):
+        self._config = dict(config)
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.recycle = recycle
+
+        # Idle connections as (connection, created_at, returned_at), most recently used on the right
+        self._idle = deque()
+        self._checked_out = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+
+        # Counters exposed through stats()
+        self._created = 0
+        self._discarded = 0
+        self._acquired = 0
+        self._timeouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._birth = {}
+
+        # Borrowed connections closed by their borrower, discarded instead of reset on release
+        self._invalid = set()
+
+    # ========================================================
+    # --- Borrowing and returning ---
+
+    def acquire(self):
+        """ Borrow a healthy connection, waiting up to the acquire timeout for a free slot. """
+        deadline = time.monotonic() + self.timeout
+        started = time.monotonic()
+
+        with self._available:
+            while True:
+                if self._closed:
+                    raise PoolClosed("Connection pool is closed")
+
+                # Reuse the most recently returned idle connection if there is one
+                if self._idle:
+                    connection, created_at, returned_at = self._idle.pop()
+                    self._checked_out += 1
+                    break
+
+                # Otherwise open a new connection if we are under size + overflow
+                if self._checked_out < self.size + self.max_overflow:
+                    connection, created_at, returned_at = None, None, None
+                    self._checked_out += 1
+                    break
+
+                # Pool exhausted, wait for a connection to be returned
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"Timed out after {self.timeout}s waiting for a database connection"
+                    )
+                self._waits += 1
+                self._available.wait(remaining)
+
+        # Network work (connect / ping) happens outside the lock
+        try:
+            if connection is not None and not self._is_usable(connection, created_at, returned_at):
+                self._discard(connection)
+                connection = None
+            if connection is None:
+                connection = self._connect()
+        except Exception:
+            self._release_slot()
+            raise
+
+        with self._lock:
+            self._acquired += 1
+            self._wait_time += time.monotonic() - started
+
+        return connection
+
+    def release(self, connection):
+        """ Return a borrowed connection, resetting its session state first. """
+        with self._lock:
+            invalid = id(connection) in self._invalid
+            self._invalid.discard(id(connection))
+        healthy = not invalid and self._reset(connection)
+
+        with self._available:
+            self._checked_out -= 1
+
+            # Keep the connection only if it is healthy and the idle set is not full
+            if healthy and not self._closed and len(self._idle) < self.size:
+                self._idle.append((connection, self._birth.get(id(connection), time.monotonic()), time.monotonic()))
+                connection = None
+
+            self._available.notify()
+
+        if connection is not None:
+            self._discard(connection)
+
+    def invalidate(self, connection):
+        """
+        Close a borrowed connection and have release() discard it. mysql.connector reports no
+        open result or transaction on a closed connection, so _reset cannot tell it is dead.
+        """
+        with self._lock:
+            if id(connection) in self._birth:
+                self._invalid.add(id(connection))
+        connection.close()
+
+    def close(self):
+        """ Close every idle connection and refuse further borrowing. """
+        with self._available:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._available.notify_all()
+
+        for connection, _, _ in idle:
+            self._discard(connection)
+
+    def stats(self):
+        """ Return a snapshot of pool usage counters. """
+        with self._lock:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "idle": len(self._idle),
+                "checked_out": self._checked_out,
+                "overflow": max(0, self._checked_out + len(self._idle) - self.size),
+                "created": self._created,
+                "discarded": self._discarded,
+                "acquired": self._acquired,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "avg_acquire_ms": round(self._wait_time / self._acquired * 1000, 3) if self._acquired else 0.0,
+            }
+
+    # --- End of Borrowing and returning ---
+    # ========================================================
+    # --- Internal helpers ---
+
+    def _connect(self):
+        """ Open a brand new connection to MySQL. """
+        connection = mysql.connector.connect(**self._config)
+        with self._lock:
+            self._created += 1
+            self._birth[id(connection)] = time.monotonic()
+        return connection
+
+    def _is_usable(self, connection, created_at, returned_at):
+        """ Check whether an idle connection can be handed out again. """
+        now = time.monotonic()
+
+        # Replace connections that have been alive for too long
+        if self.recycle and now - created_at > self.recycle:
+            return False
+
+        # Only ping connections that have been sitting idle for a while
+        if now - returned_at > self.health_check_interval:
+            try:
+                connection.ping(reconnect=False)
+            except Error:
+                return False
+
+        return True
+
+    def _reset(self, connection):
+        """ Roll back any open transaction so the next borrower starts clean. """
+        try:
+            if connection.unread_result:
+                connection.consume_results()
+            if connection.in_transaction:
+                connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, connection):
+        """ Close a connection that is no longer kept by the pool. """
+        with self._lock:
+            self._discarded += 1
+            self._birth.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _release_slot(self):
+        """ Give back a reserved slot when opening a connection failed. """
+        with self._available:
+            self._checked_out -= 1
+            self._available.notify()
+
+    # --- End of Internal helpers ---
+    # ========================================================
+
+# end of pool.py
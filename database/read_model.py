@@ -0,0 +1,158 @@
+# read_model.py
+# Denormalized citation read model for the NYPD Citation system.
+# Citation_View holds one row per correction notice with the driver, officer and violation
+# columns the citation endpoints return, so reading a page of citations is a single range
+# scan on (Violation_Date, Notice_ID) instead of a five-table join.
+#
+# The notice and citation write routes refresh the affected rows inside their own transaction.
+# Changes made outside the API (e.g. to Violation descriptions) are repaired with:
+#   python -m database.read_model rebuild
+#   python -m database.read_model check
+# =========================================================
+
+import argparse
+import sys
+from fastapi import HTTPException
+import database.database as database
+
+# Builds Citation_View rows from the normalized tables, {where} selects the notices to build
+VIEW_SELECT = """
+    SELECT
+        cn.Notice_ID,
+        cn.Violation_Date,
+        cn.Violation_Time,
+        cn.Location,
+        cn.Driver_ID,
+        d.License_Number,
+        d.First_Name,
+        d.Last_Name,
+        cn.Officer_ID,
+        o.Badge_Number,
+        cn.VIN,
+        (SELECT GROUP_CONCAT(nv.Violation_Code ORDER BY nv.Violation_Code)
+            FROM Notice_Violation nv
+            WHERE nv.Notice_ID = cn.Notice_ID) AS Violation_Codes,
+        (SELECT GROUP_CONCAT(v.Violation_Description ORDER BY nv.Violation_Code)
+            FROM Notice_Violation nv
+            JOIN Violation v ON nv.Violation_Code = v.Violation_Code
+            WHERE nv.Notice_ID = cn.Notice_ID) AS Violation_Descriptions
+    FROM Correction_Notice cn
+    JOIN Driver d ON cn.Driver_ID = d.Driver_ID
+    JOIN Officer o ON cn.Officer_ID = o.Officer_ID
+    {where}
+"""
+
+VIEW_COLUMNS = (
+    "Notice_ID", "Violation_Date", "Violation_Time", "Location", "Driver_ID", "License_Number", "First_Name",
+    "Last_Name", "Officer_ID", "Badge_Number", "VIN", "Violation_Codes", "Violation_Descriptions",
+)
+
+REFRESH_QUERY = f"REPLACE INTO Citation_View ({', '.join(VIEW_COLUMNS)}) " + VIEW_SELECT
+
+# Notices whose Citation_View row is missing or differs from the normalized tables
+CHECK_QUERY = f"""
+    SELECT expected.Notice_ID, cv.Notice_ID IS NULL AS Missing
+    FROM ({VIEW_SELECT.format(where="WHERE cn.Notice_ID BETWEEN %s AND %s")}) expected
+    LEFT JOIN Citation_View cv ON cv.Notice_ID = expected.Notice_ID
+    WHERE cv.Notice_ID IS NULL
+       OR NOT ({' AND '.join(f'cv.{column} <=> expected.{column}' for column in VIEW_COLUMNS[1:])})
+    UNION ALL
+    SELECT cv.Notice_ID, 0 AS Missing
+    FROM Citation_View cv
+    LEFT JOIN Correction_Notice cn ON cn.Notice_ID = cv.Notice_ID
+    WHERE cv.Notice_ID BETWEEN %s AND %s AND cn.Notice_ID IS NULL
+"""
+
+# ========================================================
+# --- Write path maintenance ---
+
+async def refresh_notices(cursor, notice_ids):
+    """ Rebuild the Citation_View rows of the given notices. Call inside the transaction that changed them. """
+    notice_ids = list(notice_ids)
+    if not notice_ids:
+        return
+
+    placeholders = ", ".join(["%s"] * len(notice_ids))
+    await cursor.execute(REFRESH_QUERY.format(where=f"WHERE cn.Notice_ID IN ({placeholders})"), notice_ids)
+
+# --- End of Write path maintenance ---
+# ========================================================
+# --- Rebuild and consistency check ---
+
+def notice_id_range(connection):
+    """ Return the lowest and highest Notice_ID in Correction_Notice or Citation_View. """
+    row = database.execute_query(connection, """
+        SELECT LEAST(COALESCE(MIN(a.lo), 0), COALESCE(MIN(b.lo), 0)) AS lo,
+               GREATEST(COALESCE(MAX(a.hi), 0), COALESCE(MAX(b.hi), 0)) AS hi
+        FROM (SELECT MIN(Notice_ID) AS lo, MAX(Notice_ID) AS hi FROM Correction_Notice) a,
+             (SELECT MIN(Notice_ID) AS lo, MAX(Notice_ID) AS hi FROM Citation_View) b
+    """, fetch="one")
+    return row['lo'], row['hi']
+
+def rebuild(connection, batch_size=10000):
+    """ Rebuild Citation_View from the normalized tables, one Notice_ID range per transaction. Returns rows written. """
+    cursor = connection.cursor()
+    low, high = notice_id_range(connection)
+    written = 0
+    try:
+        for start in range(low, high + 1, batch_size):
+            end = start + batch_size - 1
+            cursor.execute("DELETE FROM Citation_View WHERE Notice_ID BETWEEN %s AND %s", (start, end))
+            cursor.execute(REFRESH_QUERY.format(where="WHERE cn.Notice_ID BETWEEN %s AND %s"), (start, end))
+            written += cursor.rowcount
+            connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return written
+
+def check(connection, batch_size=10000):
+    """ Compare Citation_View with the normalized tables. Returns (missing, stale) lists of Notice_IDs. """
+    low, high = notice_id_range(connection)
+    missing = []
+    stale = []
+    for start in range(low, high + 1, batch_size):
+        end = start + batch_size - 1
+        try:
+            rows = database.execute_query(connection, CHECK_QUERY, (start, end, start, end))
+        except HTTPException as e:
+            if e.status_code != 404:
+                raise
+            continue
+        for row in rows:
+            (missing if row['Missing'] else stale).append(row['Notice_ID'])
+    return missing, stale
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the Citation_View read model.")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    pool = database.init_pool()
+    connection = pool.acquire()
+    try:
+        if args.command == "rebuild":
+            print(f"Citation_View rebuilt, {rebuild(connection, args.batch_size)} rows written")
+            return 0
+
+        missing, stale = check(connection, args.batch_size)
+        connection.commit()
+        print(f"Citation_View: {len(missing)} missing, {len(stale)} stale")
+        for label, notice_ids in (("missing", missing), ("stale", stale)):
+            if notice_ids:
+                print(f"  {label}: {', '.join(str(notice_id) for notice_id in notice_ids[:50])}")
+        return 1 if missing or stale else 0
+    finally:
+        pool.release(connection)
+        database.close_pool()
+
+# --- End of Rebuild and consistency check ---
+# ========================================================
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# end of read_model.py
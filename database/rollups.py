@@ -0,0 +1,153 @@
+# rollups.py
+# Citation counters for the NYPD Citation system dashboards.
+# Citation_Rollup holds the number of notices per day, and per officer, violation code and
+# location per month, so the /stats endpoints read a few hundred counter rows instead of
+# aggregating Correction_Notice and Notice_Violation.
+#
+# The write routes take a notice's counts away before they change it and add them back
+# afterwards, inside their own transaction, so updates and violation resyncs decrement the
+# buckets the notice leaves. Changes made outside the API are repaired with:
+#   python -m database.rollups rebuild
+#   python -m database.rollups check
+# =========================================================
+
+import argparse
+import sys
+import database.database as database
+
+# Counter rows of the notices selected by {where}, one SELECT per dimension
+ROLLUP_SELECT = """
+    SELECT 'day' AS Dimension, SUBSTR(cn.Violation_Date, 1, 10) AS Period, '' AS Bucket, COUNT(*) AS Delta
+    FROM Correction_Notice cn
+    {where}
+    GROUP BY SUBSTR(cn.Violation_Date, 1, 10)
+    UNION ALL
+    SELECT 'officer', SUBSTR(cn.Violation_Date, 1, 7), CAST(cn.Officer_ID AS CHAR), COUNT(*)
+    FROM Correction_Notice cn
+    {where}
+    GROUP BY SUBSTR(cn.Violation_Date, 1, 7), cn.Officer_ID
+    UNION ALL
+    SELECT 'location', SUBSTR(cn.Violation_Date, 1, 7), COALESCE(cn.Location, ''), COUNT(*)
+    FROM Correction_Notice cn
+    {where}
+    GROUP BY SUBSTR(cn.Violation_Date, 1, 7), COALESCE(cn.Location, '')
+    UNION ALL
+    SELECT 'violation', SUBSTR(cn.Violation_Date, 1, 7), nv.Violation_Code, COUNT(*)
+    FROM Correction_Notice cn
+    JOIN Notice_Violation nv ON nv.Notice_ID = cn.Notice_ID
+    {where}
+    GROUP BY SUBSTR(cn.Violation_Date, 1, 7), nv.Violation_Code
+"""
+
+# Adds the counter rows times the first parameter (1 or -1) to Citation_Rollup.
+# The WHERE keeps SQLite from reading ON CONFLICT as a join constraint.
+APPLY_QUERY = f"""
+    INSERT INTO Citation_Rollup (Dimension, Period, Bucket, Notices)
+    SELECT r.Dimension, r.Period, r.Bucket, r.Delta * %s
+    FROM ({ROLLUP_SELECT}) r
+    WHERE true
+    ON DUPLICATE KEY UPDATE Notices = Notices + VALUES(Notices)
+"""
+
+# ========================================================
+# --- Write path maintenance ---
+
+async def add_notices(cursor, notice_ids, sign=1):
+    """
+    Add the counts of the given notices to Citation_Rollup, or take them away with sign=-1.
+    Call with sign=-1 before a route changes or deletes notices and with sign=1 after it wrote
+    them, inside the transaction that changes them.
+    """
+    notice_ids = list(notice_ids)
+    if not notice_ids:
+        return
+
+    placeholders = ", ".join(["%s"] * len(notice_ids))
+    query = APPLY_QUERY.format(where=f"WHERE cn.Notice_ID IN ({placeholders})")
+    await cursor.execute(query, [sign] + notice_ids * 4)
+
+async def remove_notices(cursor, notice_ids):
+    """ Take the counts of the given notices away from Citation_Rollup, before they change. """
+    await add_notices(cursor, notice_ids, sign=-1)
+
+# --- End of Write path maintenance ---
+# ========================================================
+# --- Rebuild and consistency check ---
+
+def notice_id_range(connection):
+    """ Return the lowest and highest Notice_ID in Correction_Notice. """
+    row = database.execute_query(connection, """
+        SELECT COALESCE(MIN(Notice_ID), 0) AS lo, COALESCE(MAX(Notice_ID), 0) AS hi FROM Correction_Notice
+    """, fetch="one")
+    return row['lo'], row['hi']
+
+def rebuild(connection, batch_size=100000):
+    """
+    Recount Citation_Rollup from the normalized tables, adding one Notice_ID range at a time.
+    The whole rebuild is one transaction, so dashboards never read half the counts. Returns the
+    number of counter rows.
+    """
+    cursor = connection.cursor()
+    low, high = notice_id_range(connection)
+    try:
+        cursor.execute("DELETE FROM Citation_Rollup")
+        for start in range(low, high + 1, batch_size):
+            end = start + batch_size - 1
+            query = APPLY_QUERY.format(where="WHERE cn.Notice_ID BETWEEN %s AND %s")
+            cursor.execute(query, [1] + [start, end] * 4)
+        cursor.execute("SELECT COUNT(*) FROM Citation_Rollup")
+        counters = cursor.fetchone()[0]
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return counters
+
+def check(connection):
+    """ Compare Citation_Rollup with a fresh count. Returns [(dimension, period, bucket, stored, expected)] of the differences. """
+    expected = {
+        (row['Dimension'], row['Period'], row['Bucket']): row['Delta']
+        for row in database.execute_query(connection, ROLLUP_SELECT.format(where=""))
+    }
+    stored = {
+        (row['Dimension'], row['Period'], row['Bucket']): row['Notices']
+        for row in database.execute_query(connection, "SELECT Dimension, Period, Bucket, Notices FROM Citation_Rollup WHERE Notices <> 0")
+    }
+    return [
+        (*key, stored.get(key, 0), expected.get(key, 0))
+        for key in sorted(set(expected) | set(stored))
+        if stored.get(key, 0) != expected.get(key, 0)
+    ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the Citation_Rollup dashboard counters.")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--batch-size", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    pool = database.init_pool()
+    connection = pool.acquire()
+    try:
+        if args.command == "rebuild":
+            print(f"Citation_Rollup rebuilt, {rebuild(connection, args.batch_size)} counter rows")
+            return 0
+
+        differences = check(connection)
+        connection.commit()
+        print(f"Citation_Rollup: {len(differences)} counters differ")
+        for dimension, period, bucket, stored, expected in differences[:50]:
+            print(f"  {dimension} {period} {bucket!r}: {stored} stored, {expected} expected")
+        return 1 if differences else 0
+    finally:
+        pool.release(connection)
+        database.close_pool()
+
+# --- End of Rebuild and consistency check ---
+# ========================================================
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# end of rollups.py
@@ -0,0 +1,33 @@
+# rows.py
+# Row shapes returned by the database helpers for the NYPD Citation system.
+# Dicts are the default; large reads can ask for plain tuples or a compact row class instead,
+# which avoid building a per-row dict of column names.
+# =========================================================
+
+from collections import namedtuple
+from functools import lru_cache
+
+ROW_FORMATS = ("dict", "tuple", "row")
+
+@lru_cache(maxsize=256)
+def row_class(columns):
+    """ Return a compact namedtuple class for a result with the given column names, cached per column set. """
+    return namedtuple("Row", columns, rename=True)
+
+def column_names(description):
+    """ Extract the column names from a DB-API cursor description. """
+    return tuple(column[0] for column in description or ())
+
+def check_row_format(row_format):
+    """ Raise ValueError for an unknown row format. """
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f"row_format must be one of {ROW_FORMATS}, got {row_format!r}")
+
+def shape_rows(rows, description, row_format):
+    """ Convert tuple rows into the requested row format. Dict rows come straight from a dict cursor. """
+    if row_format == "row":
+        make = row_class(column_names(description))._make
+        return [make(row) for row in rows]
+    return list(rows)
+
+# end of rows.py
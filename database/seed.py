@@ -0,0 +1,364 @@
+# seed.py
+# Deterministic synthetic data for scale testing the NYPD Citation system.
+# Generates officers, drivers, vehicles, correction notices and their violations with the skew
+# seen in production: a few officers write most notices, many drivers are cited repeatedly and
+# notices often carry several violations. The same --seed and scale always produce the same
+# rows, so benchmark runs on different machines or commits see identical data.
+#
+# Rows are written to tab-separated files and bulk loaded with LOAD DATA LOCAL INFILE (the
+# docker-compose MySQL enables local_infile), then Citation_View, Change_Log and the Citation_Rollup counters are built:
+#   python -m database.seed --notices 1000000                  load into an empty, migrated database
+#   python -m database.seed --notices 10000000 --truncate      replace the existing data
+#   python -m database.seed --notices 100000 --out data/ --no-load   only write the files
+# --method insert uses multi-row INSERTs instead, for servers without local_infile. It is the
+# only method on the SQLite backend (DATABASE_BACKEND=sqlite), where a batch is one executemany.
+# =========================================================
+
+import argparse
+import bisect
+import datetime
+import hashlib
+import itertools
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import mysql.connector
+
+import database.database as database
+from database import change_feed, read_model, rollups
+
+# Every synthetic officer logs in with the password "johndoe" (bcrypt hash from seeds/examples.sql),
+# hashing millions of passwords would take longer than generating the rest of the data
+OFFICER_SECRET_HASH = "$2b$12$NDX7j1uCyk1haIi4qI3SpOW/7QjPOBPn5aDx.QfXiza74rD9.DB7."
+
+# Notices are dated within DATE_SPAN_DAYS before a fixed day, not today, so runs stay comparable
+END_DATE = datetime.date(2026, 6, 30)
+DATE_SPAN_DAYS = 3 * 365
+
+# Zipf exponents: officers are very skewed, drivers less so
+OFFICER_SKEW = 1.1
+DRIVER_SKEW = 0.8
+
+# Chance a notice is for the driver's own vehicle rather than any vehicle
+OWN_VEHICLE_SHARE = 0.9
+
+# Codes from 0001_base_schema.sql with their relative frequency
+VIOLATION_WEIGHTS = [
+    ("SPEED0110", 18), ("SPEED1120", 14), ("SPEED2130", 6), ("SPEED31", 2), ("REDLT", 12), ("PARK", 20),
+    ("SEATB", 8), ("RECK", 3), ("LANEC", 9), ("REG", 6), ("OTHER", 2),
+]
+
+# Relative frequency of 1, 2, 3, 4 and 5 violations on one notice
+VIOLATIONS_PER_NOTICE = [55, 25, 12, 6, 2]
+
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth", "William",
+    "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Carlos", "Maria", "Wei", "Mei", "Ahmed",
+    "Fatima", "Raj", "Priya", "Kwame", "Ama", "Dmitri", "Olga",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez", "Hernandez",
+    "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin", "Lee", "Chen", "Wang",
+    "Kim", "Patel", "Singh", "Cohen", "Murphy", "O'Brien", "Ivanova",
+]
+STREETS = [
+    "5th Ave", "Broadway", "Flatbush Ave", "Atlantic Ave", "Nostrand Ave", "Myrtle Ave", "Queens Blvd", "Grand Concourse",
+    "Ocean Pkwy", "Court St", "Lexington Ave", "Park Ave", "Amsterdam Ave", "Jamaica Ave", "Fordham Rd", "Canal St",
+    "Houston St", "Delancey St", "Bedford Ave", "Fulton St",
+]
+BOROUGHS = ["Manhattan", "Brooklyn", "Queens", "Bronx", "Staten Island"]
+STATES = [("NY", 80), ("NJ", 10), ("CT", 4), ("PA", 3), ("MA", 3)]
+VEHICLES = [
+    ("Toyota", "Camry"), ("Toyota", "Corolla"), ("Honda", "Civic"), ("Honda", "Accord"), ("Ford", "F-150"),
+    ("Ford", "Explorer"), ("Chevrolet", "Malibu"), ("Nissan", "Altima"), ("Hyundai", "Elantra"), ("Tesla", "Model 3"),
+    ("BMW", "3 Series"), ("Jeep", "Grand Cherokee"), ("Subaru", "Outback"), ("Kia", "Sorento"),
+]
+COLORS = ["Black", "White", "Silver", "Gray", "Blue", "Red", "Green", "Beige"]
+
+# (table, columns) in load order, the generated files are named <table>.tsv
+TABLES = [
+    ("Officer", ("Officer_ID", "Badge_Number", "Secret_Hash", "First_Name", "Last_Name")),
+    ("Driver", ("Driver_ID", "First_Name", "Last_Name", "Address", "Birth_Date", "License_Number", "License_State")),
+    ("Vehicle", ("VIN", "Make", "Model", "Color", "License_Plate", "License_State")),
+    ("Correction_Notice", ("Notice_ID", "Violation_Date", "Violation_Time", "Location", "Driver_ID", "Officer_ID", "VIN")),
+    ("Notice_Violation", ("Notice_ID", "Violation_Code")),
+]
+
+# ========================================================
+# --- Generation ---
+
+class Sampler:
+    """ Draws from a fixed set of choices with the given weights, in O(log n) per draw. """
+
+    def __init__(self, choices, weights):
+        self.choices = choices
+        self.cumulative = list(itertools.accumulate(weights))
+        self.total = self.cumulative[-1]
+
+    def draw(self, rng):
+        return self.choices[bisect.bisect_right(self.cumulative, rng.random() * self.total)]
+
+def zipf_sampler(rng, count, skew):
+    """ Return a Sampler over ids 1..count where the id at rank r has weight 1 / r**skew, ranks shuffled. """
+    ids = list(range(1, count + 1))
+    rng.shuffle(ids)
+    return Sampler(ids, [1 / rank ** skew for rank in range(1, count + 1)])
+
+def weighted(pairs):
+    return Sampler([choice for choice, _ in pairs], [weight for _, weight in pairs])
+
+def badge_for(officer_id):
+    return f"S{officer_id:07d}"
+
+def license_for(driver_id):
+    return f"SYN{driver_id:09d}"
+
+def vin_for(vehicle_id):
+    return f"SYN{vehicle_id:014d}"
+
+def generate_officers(rng, count):
+    for officer_id in range(1, count + 1):
+        yield (officer_id, badge_for(officer_id), OFFICER_SECRET_HASH, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES))
+
+def generate_drivers(rng, count):
+    states = weighted(STATES)
+    for driver_id in range(1, count + 1):
+        birth_date = END_DATE - datetime.timedelta(days=rng.randint(17 * 365, 85 * 365))
+        address = f"{rng.randint(1, 9999)} {rng.choice(STREETS)}, {rng.choice(BOROUGHS)}, NY"
+        yield (driver_id, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), address, birth_date.isoformat(),
+               license_for(driver_id), states.draw(rng))
+
+def generate_vehicles(rng, count):
+    states = weighted(STATES)
+    for vehicle_id in range(1, count + 1):
+        make, model = rng.choice(VEHICLES)
+        yield (vin_for(vehicle_id), make, model, rng.choice(COLORS), f"S{vehicle_id:07d}", states.draw(rng))
+
+def generate_notices(rng, count, officers, drivers, vehicles):
+    """ Yield (notice row, violation codes) for every notice. """
+    officer_ids = zipf_sampler(rng, officers, OFFICER_SKEW)
+    driver_ids = zipf_sampler(rng, drivers, DRIVER_SKEW)
+    codes = weighted(VIOLATION_WEIGHTS)
+    violation_counts = Sampler(range(1, len(VIOLATIONS_PER_NOTICE) + 1), VIOLATIONS_PER_NOTICE)
+
+    for notice_id in range(1, count + 1):
+        driver_id = driver_ids.draw(rng)
+
+        # Drivers mostly get cited in their own vehicle
+        if rng.random() < OWN_VEHICLE_SHARE:
+            vehicle_id = (driver_id - 1) % vehicles + 1
+        else:
+            vehicle_id = rng.randint(1, vehicles)
+
+        violation_date = END_DATE - datetime.timedelta(days=rng.randrange(DATE_SPAN_DAYS))
+        violation_time = f"{rng.randrange(24):02d}:{rng.randrange(60):02d}:00"
+        location = f"{rng.choice(STREETS)} & {rng.choice(STREETS)}, {rng.choice(BOROUGHS)}"
+
+        # Distinct codes, the bridge table's primary key is (Notice_ID, Violation_Code)
+        wanted = violation_counts.draw(rng)
+        notice_codes = []
+        while len(notice_codes) < wanted:
+            code = codes.draw(rng)
+            if code not in notice_codes:
+                notice_codes.append(code)
+
+        row = (notice_id, violation_date.isoformat(), violation_time, location, driver_id, officer_ids.draw(rng),
+               vin_for(vehicle_id))
+        yield row, notice_codes
+
+class TableWriter:
+    """ Writes rows of one table to a tab-separated file, hashing the content as it goes. """
+
+    def __init__(self, directory, table):
+        self.path = os.path.join(directory, f"{table}.tsv")
+        self.file = open(self.path, "w", encoding="utf-8", newline="\n")
+        self.digest = hashlib.sha256()
+        self.rows = 0
+
+    def write(self, row):
+        line = "\t".join(str(value) for value in row) + "\n"
+        self.file.write(line)
+        self.digest.update(line.encode())
+        self.rows += 1
+
+    def close(self):
+        self.file.close()
+
+def generate(directory, notices, officers, drivers, vehicles, seed):
+    """
+    Write the synthetic data set to <table>.tsv files in directory.
+
+    Every table draws from its own random stream derived from seed, so changing the size of
+    one table does not change the rows generated for the others.
+
+    Returns:
+        dict: {table: (rows, sha256 of the file)}
+    """
+    writers = {table: TableWriter(directory, table) for table, _ in TABLES}
+    try:
+        for row in generate_officers(random.Random(f"{seed}:officers"), officers):
+            writers["Officer"].write(row)
+        for row in generate_drivers(random.Random(f"{seed}:drivers"), drivers):
+            writers["Driver"].write(row)
+        for row in generate_vehicles(random.Random(f"{seed}:vehicles"), vehicles):
+            writers["Vehicle"].write(row)
+
+        notice_rng = random.Random(f"{seed}:notices")
+        for row, codes in generate_notices(notice_rng, notices, officers, drivers, vehicles):
+            writers["Correction_Notice"].write(row)
+            for code in codes:
+                writers["Notice_Violation"].write((row[0], code))
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    return {table: (writer.rows, writer.digest.hexdigest()) for table, writer in writers.items()}
+
+# --- End of Generation ---
+# ========================================================
+# --- Loading ---
+
+def connect():
+    """ Open a dedicated connection allowed to send local files, bulk loads do not go through the pool. """
+    return database.connect(allow_local_infile=True)
+
+def non_empty_tables(connection):
+    """ Return the seeded tables that already have rows. """
+    cursor = connection.cursor()
+    tables = []
+    try:
+        for table, _ in TABLES + [("Citation_View", ())]:
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+            if cursor.fetchone()[0]:
+                tables.append(table)
+    finally:
+        cursor.close()
+    return tables
+
+def truncate(connection):
+    """ Empty the seeded tables, Violation is reference data and stays. """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        for table in ["Citation_Rollup", "Change_Log", "Citation_View"] + [table for table, _ in reversed(TABLES)]:
+            cursor.execute(f"TRUNCATE TABLE {table}")
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    finally:
+        cursor.close()
+
+def load_file(cursor, path, table, columns):
+    cursor.execute(
+        f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} "
+        "CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' ESCAPED BY '' LINES TERMINATED BY '\\n' "
+        f"({', '.join(columns)})",
+        (path,)
+    )
+
+def insert_file(cursor, path, table, columns, batch_size):
+    """ Load a file with multi-row INSERTs, the connector sends each executemany batch as one statement. """
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    with open(path, encoding="utf-8") as data_file:
+        while True:
+            batch = [line.rstrip("\n").split("\t") for line in itertools.islice(data_file, batch_size)]
+            if not batch:
+                break
+            cursor.executemany(query, batch)
+
+def load(connection, directory, method="infile", batch_size=5000):
+    """ Load the generated files in foreign key order, one commit per table. """
+    cursor = connection.cursor()
+    try:
+        # The generator guarantees unique keys and valid references, skip re-checking them row by row
+        cursor.execute("SET unique_checks = 0, foreign_key_checks = 0")
+        for table, columns in TABLES:
+            started = time.perf_counter()
+            path = os.path.join(directory, f"{table}.tsv")
+            if method == "infile":
+                load_file(cursor, path, table, columns)
+            else:
+                insert_file(cursor, path, table, columns, batch_size)
+            connection.commit()
+            print(f"Loaded {table:<18} in {time.perf_counter() - started:8.1f}s")
+        cursor.execute("SET unique_checks = 1, foreign_key_checks = 1")
+
+        # Refresh the index statistics the planners use, they are stale after a bulk load
+        cursor.execute(f"ANALYZE TABLE {', '.join(table for table, _ in TABLES)}")
+        cursor.fetchall()
+    except mysql.connector.Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# --- End of Loading ---
+# ========================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate and load deterministic synthetic citation data.")
+    parser.add_argument("--notices", type=int, default=100000, help="Correction notices to generate")
+    parser.add_argument("--officers", type=int, help="Officers (default: notices / 2000, at least 10)")
+    parser.add_argument("--drivers", type=int, help="Drivers (default: notices / 4, at least 100)")
+    parser.add_argument("--vehicles", type=int, help="Vehicles (default: drivers * 1.1)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed, the same seed gives the same data")
+    parser.add_argument("--out", help="Directory to keep the generated files in (default: a temporary directory)")
+    parser.add_argument("--no-load", action="store_true", help="Only write the files")
+    parser.add_argument("--truncate", action="store_true", help="Empty the tables before loading")
+    parser.add_argument("--method", choices=["infile", "insert"], default="infile")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per INSERT with --method insert")
+    args = parser.parse_args(argv)
+
+    officers = args.officers or max(10, args.notices // 2000)
+    drivers = args.drivers or max(100, args.notices // 4)
+    vehicles = args.vehicles or int(drivers * 1.1)
+
+    if database.DATABASE_BACKEND == "sqlite" and args.method == "infile":
+        args.method = "insert"
+
+    directory = args.out or tempfile.mkdtemp(prefix="nypd_seed_")
+    os.makedirs(directory, exist_ok=True)
+
+    try:
+        started = time.perf_counter()
+        manifest = generate(directory, args.notices, officers, drivers, vehicles, args.seed)
+        print(f"Generated seed {args.seed} in {time.perf_counter() - started:.1f}s into {directory}")
+        for table, (count, digest) in manifest.items():
+            print(f"  {table:<18} {count:>12,} rows  sha256 {digest[:16]}")
+
+        if args.no_load:
+            return 0
+
+        connection = connect()
+        try:
+            if args.truncate:
+                truncate(connection)
+            elif non_empty_tables(connection):
+                print(f"Tables already have rows ({', '.join(non_empty_tables(connection))}), use --truncate to replace them")
+                return 1
+
+            load(connection, directory, args.method, args.batch_size)
+
+            started = time.perf_counter()
+            written = read_model.rebuild(connection)
+            print(f"Built Citation_View in {time.perf_counter() - started:.1f}s, {written} rows written")
+
+            written = change_feed.backfill(connection)
+            print(f"Recorded {written} citations in Change_Log")
+
+            started = time.perf_counter()
+            counters = rollups.rebuild(connection)
+            print(f"Built Citation_Rollup in {time.perf_counter() - started:.1f}s, {counters} counter rows")
+        finally:
+            connection.close()
+        return 0
+    finally:
+        if not args.out:
+            shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# end of seed.py
@@ -0,0 +1,72 @@
+-- examples.sql
+-- Example officers, drivers, vehicles and citations for local development.
+-- Load into an empty, migrated database with: python -m database.migrate --seed examples
+
+INSERT INTO Officer (Badge_Number, Secret_Hash, First_Name, Last_Name) VALUES
+('B99001', '$2b$12$NDX7j1uCyk1haIi4qI3SpOW/7QjPOBPn5aDx.QfXiza74rD9.DB7.', 'Jake', 'Peralta'), -- Password is "johndoe"
+('B99002', '$2b$12$Upn5QUGbIlQpWDyN692QX.qirPZJ5AHVwBWlqevIx4czmfibYhKfe', 'Amy', 'Santiago'); -- Password is "janesmith"
+
+INSERT INTO Driver (First_Name, Last_Name, Address, Birth_Date, License_Number, License_State) VALUES
+('Raymond', 'Holt', '1234 Precinct Way, Brooklyn, NY', '1955-03-21', 'NY1234567', 'NY'),
+('Michael', 'Hitchcock', '5678 Duty Lane, Brooklyn, NY', '1972-08-14', 'NY7654321', 'NY'),
+('Norm', 'Scully', '9101 Donut St, Brooklyn, NY', '1970-11-08', 'NY1111111', 'NY'),
+('Charles', 'Boyle', '1121 Food Ave, Brooklyn, NY', '1984-07-10', 'NY2222222', 'NY');
+
+INSERT INTO Vehicle (VIN, Make, Model, Color, License_Plate, License_State) VALUES
+('2G1FB1E39D1234567', 'Chevrolet', 'Impala', 'Black', 'NYPD001', 'NY'),
+('3G5DA03E32S547894', 'Cadillac', 'DeVille', 'Beige', 'WHEEL', 'NY'),
+('1HGBH41JXMN109186', 'Honda', 'Civic', 'Blue', 'B99-001', 'NY'),
+('2FTRX18W1XCA12345', 'Ford', 'Taurus', 'Gray', 'B99-002', 'NY');
+
+INSERT INTO Correction_Notice (Violation_Date, Violation_Time, Location, Driver_ID, Officer_ID, VIN) VALUES
+('2026-01-15', '14:30:00', '5th Ave & Main St, Brooklyn', 1, 1, '2G1FB1E39D1234567'),
+('2026-02-20', '09:15:00', 'Flatbush Ave & Prospect Park, Brooklyn', 2, 2, '3G5DA03E32S547894'),
+('2026-03-10', '16:45:00', 'Atlantic Ave & Classon Ave, Brooklyn', 3, 1, '1HGBH41JXMN109186'),
+('2026-04-05', '11:20:00', 'Nostrand Ave & Myrtle Ave, Brooklyn', 4, 2, '2FTRX18W1XCA12345');
+
+INSERT INTO Notice_Violation (Notice_ID, Violation_Code) VALUES
+(1, 'SPEED0110'),
+(2, 'REDLT'),
+(3, 'PARK'),
+(4, 'SEATB');
+
+-- Build the citation read model for the example notices
+INSERT INTO Citation_View (Notice_ID, Violation_Date, Violation_Time, Location, Driver_ID, License_Number, First_Name,
+                           Last_Name, Officer_ID, Badge_Number, VIN, Violation_Codes, Violation_Descriptions)
+SELECT cn.Notice_ID, cn.Violation_Date, cn.Violation_Time, cn.Location, cn.Driver_ID, d.License_Number, d.First_Name,
+       d.Last_Name, cn.Officer_ID, o.Badge_Number, cn.VIN,
+       (SELECT GROUP_CONCAT(nv.Violation_Code ORDER BY nv.Violation_Code)
+            FROM Notice_Violation nv WHERE nv.Notice_ID = cn.Notice_ID),
+       (SELECT GROUP_CONCAT(v.Violation_Description ORDER BY nv.Violation_Code)
+            FROM Notice_Violation nv JOIN Violation v ON nv.Violation_Code = v.Violation_Code
+            WHERE nv.Notice_ID = cn.Notice_ID)
+FROM Correction_Notice cn
+JOIN Driver d ON cn.Driver_ID = d.Driver_ID
+JOIN Officer o ON cn.Officer_ID = o.Officer_ID;
+
+-- Record the example citations in the change feed, so since=0 starts a full sync
+INSERT INTO Change_Log (Notice_ID, License_Number)
+SELECT Notice_ID, License_Number
+FROM Citation_View
+ORDER BY Notice_ID;
+
+-- Count the example notices in the dashboard counters, see database/rollups.py
+INSERT INTO Citation_Rollup (Dimension, Period, Bucket, Notices)
+SELECT 'day', SUBSTR(cn.Violation_Date, 1, 10), '', COUNT(*)
+FROM Correction_Notice cn
+GROUP BY SUBSTR(cn.Violation_Date, 1, 10)
+UNION ALL
+SELECT 'officer', SUBSTR(cn.Violation_Date, 1, 7), CAST(cn.Officer_ID AS CHAR), COUNT(*)
+FROM Correction_Notice cn
+GROUP BY SUBSTR(cn.Violation_Date, 1, 7), cn.Officer_ID
+UNION ALL
+SELECT 'location', SUBSTR(cn.Violation_Date, 1, 7), COALESCE(cn.Location, ''), COUNT(*)
+FROM Correction_Notice cn
+GROUP BY SUBSTR(cn.Violation_Date, 1, 7), COALESCE(cn.Location, '')
+UNION ALL
+SELECT 'violation', SUBSTR(cn.Violation_Date, 1, 7), nv.Violation_Code, COUNT(*)
+FROM Correction_Notice cn
+JOIN Notice_Violation nv ON nv.Notice_ID = cn.Notice_ID
+GROUP BY SUBSTR(cn.Violation_Date, 1, 7), nv.Violation_Code;
+
+-- end of examples.sql
@@ -0,0 +1,574 @@
+# sqlite_backend.py
+# Embedded SQLite backend for the NYPD Citation system, selected with DATABASE_BACKEND=sqlite.
+# Lets tests, benchmarks and patrol car laptops run the API without a MySQL server.
+#
+# The connections here stand in for the drivers the rest of the code is written against:
+# Connection for mysql.connector (the synchronous helpers, migrations and scripts) and
+# AsyncConnection for aiomysql (the routers). Statements are translated from MySQL's dialect by
+# dialect.py, and SQLite errors are raised as the driver's own exception classes with MySQL
+# error numbers, so the helpers and routers run unchanged on both backends.
+#
+# SQLite connections must stay on one thread. The synchronous pool keeps one connection per
+# thread, and every async connection owns a single-thread executor that runs all of its work.
+# The database runs in WAL mode, so readers never block the single writer or each other.
+# =========================================================
+
+import asyncio
+import datetime
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import aiomysql
+import mysql.connector
+import pymysql
+
+import query_trace
+from database import dialect
+from database.pool import PoolClosed
+
+# Page cache per connection and memory-mapped I/O size, in MiB
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
+
+# Milliseconds a writer waits for the write lock before "database is locked" is raised
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Applied to every new connection. synchronous=NORMAL is durable across application crashes in
+# WAL mode, only a power loss can drop the last transactions.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}",
+    f"PRAGMA cache_size = -{SQLITE_CACHE_MB * 1024}",
+    f"PRAGMA mmap_size = {SQLITE_MMAP_MB * 1024 * 1024}",
+    "PRAGMA temp_store = MEMORY",
+    # REPLACE INTO deletes the conflicting row, this makes it fire the FTS5 delete triggers
+    "PRAGMA recursive_triggers = ON",
+)
+
+# MySQL returns DATE and DATETIME columns as date and datetime objects, so SQLite does too
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(" "))
+
+def _convert(parse):
+    def convert(value):
+        text = value.decode()
+        try:
+            return parse(text)
+        except ValueError:
+            return text
+    return convert
+
+sqlite3.register_converter("DATE", _convert(datetime.date.fromisoformat))
+sqlite3.register_converter("DATETIME", _convert(datetime.datetime.fromisoformat))
+sqlite3.register_converter("TIMESTAMP", _convert(datetime.datetime.fromisoformat))
+
+def open_connection(path, check_same_thread=True):
+    """
+    Open a tuned SQLite connection. Writes start with BEGIN IMMEDIATE, so a transaction takes
+    the write lock (waiting up to the busy timeout) before its first write instead of failing
+    part way through when another connection is writing.
+    """
+    connection = sqlite3.connect(
+        path,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        isolation_level="IMMEDIATE",
+        check_same_thread=check_same_thread,
+    )
+    for pragma in PRAGMAS:
+        connection.execute(pragma)
+    connection.create_function("FIND_IN_SET", 2, dialect.find_in_set, deterministic=True)
+    if not dialect.NATIVE_ORDERED_AGGREGATES:
+        connection.create_aggregate("ORDERED_GROUP_CONCAT", -1, dialect.OrderedGroupConcat)
+    return connection
+
+def run(cursor, query, params, many, raise_error):
+    """
+    Execute a MySQL statement on an sqlite3 cursor.
+
+    Returns:
+        tuple: (rowcount, lastrowid) with MySQL's meaning: executemany reports the first id of
+            a plain INSERT, and an upsert reports the id of the inserted or existing row
+    """
+    statement = dialect.translate(query, bool(params))
+    if statement.sql is None:
+        return 0, None
+
+    try:
+        if many:
+            cursor.executemany(statement.sql, params)
+            lastrowid = None
+            if cursor.rowcount > 0 and statement.sql.lstrip()[:11].upper() == "INSERT INTO":
+                lastrowid = cursor.connection.execute("SELECT last_insert_rowid()").fetchone()[0] - cursor.rowcount + 1
+        else:
+            cursor.execute(statement.sql, params or ())
+            lastrowid = cursor.lastrowid
+
+        if statement.returning_id:
+            lastrowid = cursor.fetchone()[0]
+            cursor.fetchall()
+
+        for extra in statement.extra:
+            cursor.execute(extra)
+    # sqlite3 raises OverflowError for integers beyond 64 bits, which MySQL would simply compare
+    except (sqlite3.Error, OverflowError) as err:
+        errno = dialect.mysql_errno(err, statement.sql)
+        raise raise_error(errno, f"{err} (SQLite)") from err
+
+    return cursor.rowcount, lastrowid
+
+def shape(rows, description, dictionary):
+    """ Return rows as dicts keyed by column name, or unchanged. """
+    if not dictionary or not rows:
+        return rows
+    columns = [column[0] for column in description]
+    return [dict(zip(columns, row)) for row in rows]
+
+# ========================================================
+# --- Synchronous connections (mysql.connector interface) ---
+
+CONNECTOR_ERRORS = {
+    "integrity": mysql.connector.errors.IntegrityError,
+    "programming": mysql.connector.errors.ProgrammingError,
+    "data": mysql.connector.errors.DataError,
+    "operational": mysql.connector.errors.OperationalError,
+}
+
+def connector_error(errno, message):
+    return CONNECTOR_ERRORS[dialect.error_kind(errno)](msg=message, errno=errno)
+
+
+class Cursor:
+    """ The part of a mysql.connector cursor the helpers, migrations and scripts use. """
+
+    def __init__(self, connection, dictionary=False):
+        self._cursor = connection._connection.cursor()
+        self._dictionary = dictionary
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def execute(self, query, params=()):
+        self.rowcount, self.lastrowid = run(self._cursor, query, params, False, connector_error)
+        self.description = self._cursor.description
+
+    def executemany(self, query, seq_params):
+        self.rowcount, self.lastrowid = run(self._cursor, query, list(seq_params), True, connector_error)
+        self.description = None
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return shape([row], self.description, self._dictionary)[0] if row is not None else None
+
+    def fetchmany(self, size=1):
+        return shape(self._cursor.fetchmany(size), self.description, self._dictionary)
+
+    def fetchall(self):
+        return shape(self._cursor.fetchall(), self.description, self._dictionary)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    """ An SQLite connection with the part of the mysql.connector connection interface this code base uses. """
+
+    unread_result = False
+
+    def __init__(self, path):
+        # Used by one thread at a time, but closed by whichever thread shuts the pool down
+        self._connection = open_connection(path, check_same_thread=False)
+        self.closed = False
+
+    def cursor(self, dictionary=False, buffered=None):
+        return Cursor(self, dictionary)
+
+    @property
+    def in_transaction(self):
+        return self._connection.in_transaction
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def ping(self, reconnect=False):
+        self._connection.execute("SELECT 1")
+
+    def consume_results(self):
+        pass
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._connection.close()
+
+
+class ThreadConnectionPool:
+    """
+    Stands in for ConnectionPool on SQLite: each thread borrows its own long-lived connection.
+
+    SQLite connections are cheap to keep and must not be shared between threads, so instead of
+    a shared set of connections every thread gets one of its own. A thread borrowing a second
+    connection before returning the first gets an extra one, closed when it is returned.
+    Connections of threads that have exited are closed the next time a connection is opened.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._threads = {}
+        self._busy = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._created = 0
+        self._acquired = 0
+
+    def acquire(self):
+        """ Borrow the calling thread's connection. """
+        if self._closed:
+            raise PoolClosed("Connection pool is closed")
+
+        local = self._local
+        connection = getattr(local, "connection", None)
+        if connection is not None and not connection.closed and not local.busy:
+            local.busy = True
+        else:
+            connection = self._open(extra=connection is not None and not connection.closed)
+
+        with self._lock:
+            self._acquired += 1
+            self._busy.add(connection)
+        return connection
+
+    def release(self, connection):
+        """ Return a connection, rolling back its open transaction. """
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except sqlite3.Error:
+            connection.close()
+
+        with self._lock:
+            self._busy.discard(connection)
+        if connection is getattr(self._local, "connection", None):
+            self._local.busy = False
+        else:
+            self._forget(connection)
+            connection.close()
+
+    def invalidate(self, connection):
+        """ Close a borrowed connection, acquire() opens a new one in its place. """
+        connection.close()
+
+    def close(self):
+        """ Close every connection and refuse further borrowing. """
+        with self._lock:
+            self._closed = True
+            connections = list(self._threads)
+            self._threads.clear()
+        for connection in connections:
+            connection.close()
+
+    def stats(self):
+        """ Return a snapshot of pool usage counters. """
+        with self._lock:
+            return {
+                "connections": len(self._threads),
+                "idle": len(self._threads) - len(self._busy),
+                "checked_out": len(self._busy),
+                "created": self._created,
+                "acquired": self._acquired,
+            }
+
+    def _open(self, extra):
+        connection = Connection(self.path)
+        thread = threading.current_thread()
+        with self._lock:
+            self._created += 1
+            dead = [known for known, owner in self._threads.items() if not owner.is_alive()]
+            for known in dead:
+                del self._threads[known]
+            self._threads[connection] = thread
+
+        for known in dead:
+            known.close()
+
+        if not extra:
+            self._local.connection = connection
+            self._local.busy = True
+        return connection
+
+    def _forget(self, connection):
+        with self._lock:
+            self._threads.pop(connection, None)
+
+# --- End of Synchronous connections (mysql.connector interface) ---
+# ========================================================
+# --- Async connections (aiomysql interface) ---
+
+PYMYSQL_ERRORS = {
+    "integrity": pymysql.err.IntegrityError,
+    "programming": pymysql.err.ProgrammingError,
+    "data": pymysql.err.DataError,
+    "operational": pymysql.err.OperationalError,
+}
+
+def pymysql_error(errno, message):
+    return PYMYSQL_ERRORS[dialect.error_kind(errno)](errno, message)
+
+
+class AsyncCursor:
+    """
+    The part of an aiomysql cursor the helpers and routers use, with the statements traced.
+
+    The cursor class passed to connection.cursor() picks the row shape and buffering, like
+    in aiomysql: dict cursors return dicts and SS cursors fetch rows on demand. Buffered
+    cursors execute and fetch in one hop to the connection's thread.
+    """
+
+    statement_name = None
+
+    def __init__(self, connection, cursorclass):
+        self.connection = connection
+        self._dictionary = issubclass(cursorclass, (aiomysql.DictCursor, aiomysql.SSDictCursor))
+        self._streaming = issubclass(cursorclass, aiomysql.SSCursor)
+        self._cursor = None
+        self._rows = ()
+        self._position = 0
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+
+    # `await connection.cursor()` works like aiomysql, the cursor is ready immediately
+    def __await__(self):
+        return self
+        yield
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            await self.connection._run(self._execute, query, args, False)
+        except Exception:
+            query_trace.record(self.statement_name, query, args, started, None)
+            raise
+        query_trace.record(self.statement_name, query, args, started, self.rowcount)
+        return self.rowcount
+
+    async def executemany(self, query, args):
+        started = time.perf_counter()
+        args = list(args)
+        if not args:
+            return None
+        try:
+            await self.connection._run(self._execute, query, args, True)
+        except Exception:
+            query_trace.record(self.statement_name, query, None, started, None)
+            raise
+        query_trace.record(self.statement_name, query, None, started, self.rowcount)
+        return self.rowcount
+
+    def _execute(self, query, args, many):
+        """ Runs on the connection's thread. """
+        if self._cursor is not None:
+            self._cursor.close()
+        cursor = self._cursor = self.connection._connection.cursor()
+        try:
+            self.rowcount, self.lastrowid = run(cursor, query, args, many, pymysql_error)
+            self.description = cursor.description
+            self._rows = ()
+            self._position = 0
+            if cursor.description is not None and not self._streaming:
+                self._rows = shape(cursor.fetchall(), cursor.description, self._dictionary)
+                self.rowcount = len(self._rows)
+        finally:
+            self.connection._in_transaction = self.connection._connection.in_transaction
+            if not self._streaming:
+                cursor.close()
+                self._cursor = None
+
+    async def fetchone(self):
+        if self._streaming:
+            rows = await self.fetchmany(1)
+            return rows[0] if rows else None
+        if self._position >= len(self._rows):
+            return None
+        self._position += 1
+        return self._rows[self._position - 1]
+
+    async def fetchmany(self, size=None):
+        size = size or 1
+        if self._streaming:
+            if self._cursor is None:
+                return []
+            return shape(await self.connection._run(self._cursor.fetchmany, size), self.description, self._dictionary)
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    async def fetchall(self):
+        if self._streaming:
+            if self._cursor is None:
+                return []
+            return shape(await self.connection._run(self._cursor.fetchall), self.description, self._dictionary)
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+    async def close(self):
+        cursor, self._cursor = self._cursor, None
+        if cursor is not None and not self.connection.closed:
+            await self.connection._run(cursor.close)
+
+
+class AsyncConnection:
+    """ An SQLite connection with the part of the aiomysql connection interface this code base uses. """
+
+    def __init__(self, connection, executor, cursorclass):
+        self._connection = connection
+        self._executor = executor
+        self._in_transaction = False
+        self.cursorclass = cursorclass
+        self.closed = False
+
+    @classmethod
+    async def open(cls, path, cursorclass):
+        """ Open a connection on a new thread of its own. """
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        try:
+            connection = await asyncio.get_running_loop().run_in_executor(executor, open_connection, path)
+        except sqlite3.Error as err:
+            executor.shutdown(wait=False)
+            raise pymysql.err.OperationalError(dialect.mysql_errno(err, None), f"{err} (SQLite)") from err
+        return cls(connection, executor, cursorclass)
+
+    async def _run(self, function, *args):
+        """ Run function on the connection's thread. """
+        if self.closed:
+            raise pymysql.err.InterfaceError(0, "Connection is closed")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def cursor(self, cursorclass=None):
+        return AsyncCursor(self, cursorclass or self.cursorclass)
+
+    def get_transaction_status(self):
+        return self._in_transaction
+
+    async def commit(self):
+        await self._finish(self._connection.commit)
+
+    async def rollback(self):
+        await self._finish(self._connection.rollback)
+
+    async def _finish(self, function):
+        try:
+            await self._run(function)
+        except sqlite3.Error as err:
+            raise pymysql_error(dialect.mysql_errno(err, None), f"{err} (SQLite)") from err
+        self._in_transaction = False
+
+    def close(self):
+        """ Close the connection on its thread without waiting, like aiomysql's close(). """
+        if not self.closed:
+            self.closed = True
+            self._executor.submit(self._connection.close)
+            self._executor.shutdown(wait=False)
+
+
+class AsyncPool:
+    """
+    Stands in for an aiomysql pool on SQLite: up to `maxsize` connections, each on its own thread.
+
+    Connections are opened on demand and kept until the pool is closed. A borrower waits for a
+    returned connection once `maxsize` are in use. acquire() and release() match aiomysql.Pool.
+    """
+
+    def __init__(self, path, maxsize, cursorclass):
+        self.path = path
+        self.maxsize = maxsize
+        self.cursorclass = cursorclass
+        self._free = deque()
+        self._used = set()
+        self._opening = 0
+        self._closed = False
+        self._condition = asyncio.Condition()
+
+    @property
+    def size(self):
+        return len(self._free) + len(self._used) + self._opening
+
+    @property
+    def freesize(self):
+        return len(self._free)
+
+    async def acquire(self):
+        """ Borrow a connection, opening a new one while under maxsize. """
+        async with self._condition:
+            while True:
+                if self._closed:
+                    raise PoolClosed("Connection pool is closed")
+                if self._free:
+                    connection = self._free.pop()
+                    self._used.add(connection)
+                    return connection
+                if self.size < self.maxsize:
+                    self._opening += 1
+                    break
+                await self._condition.wait()
+
+        try:
+            connection = await AsyncConnection.open(self.path, self.cursorclass)
+        except BaseException:
+            asyncio.ensure_future(self._wakeup())
+            raise
+        finally:
+            self._opening -= 1
+        self._used.add(connection)
+        return connection
+
+    def release(self, connection):
+        """ Return a borrowed connection, closed connections are dropped. """
+        self._used.discard(connection)
+        if connection.closed or self._closed:
+            connection.close()
+        else:
+            self._free.append(connection)
+        asyncio.ensure_future(self._wakeup())
+
+    async def _wakeup(self):
+        async with self._condition:
+            self._condition.notify()
+
+    def close(self):
+        """ Close the idle connections, borrowed ones are closed when they are returned. """
+        self._closed = True
+        while self._free:
+            self._free.pop().close()
+
+    async def wait_closed(self):
+        while self._used:
+            await asyncio.sleep(0.01)
+
+async def create_pool(path, maxsize, cursorclass=aiomysql.Cursor):
+    """ Create the async pool for an SQLite database file, creating the file if needed. """
+    return AsyncPool(path, maxsize, cursorclass)
+
+# --- End of Async connections (aiomysql interface) ---
+# ========================================================
+
+# end of sqlite_backend.py
@@ -0,0 +1,38 @@
+# json_responses.py
+# Fast JSON responses for the NYPD Citation system.
+# List endpoints return rows that come straight from our own queries, so they already match
+# their response model. TrustedJSONResponse renders them directly, skipping response model
+# validation, using orjson when it is installed.
+# =========================================================
+
+import json
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(content):
+    """ Serialize content to JSON bytes. Values JSON has no type for are encoded like FastAPI would. """
+    if orjson is not None:
+        return orjson.dumps(content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=jsonable_encoder, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class TrustedJSONResponse(Response):
+    """
+    JSON response for content built from trusted query results.
+
+    Returning it from a route bypasses the route's response_model validation, the
+    response_model is still used for the OpenAPI schema. Only use it for rows whose shape
+    is guaranteed by the query that produced them.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
+
+# end of json_responses.py
@@ -7,12 +7,43 @@ Description: API for managing drivers, correction notices, violations, and notic
 Author: Jake Morgan
 Last Modified: 16-02-2026
 """
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import drivers, notices, tokens, vehicles, citations
+from fastapi.responses import Response
+import auth
+import cache
+import database.database as database
+import database.async_database as async_database
+from database import migrate
+import metrics
+import profiling
+import query_trace
+from routers import drivers, notices, tokens, vehicles, citations, violations, stats
+from violation_catalog import catalog
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """ Create shared resources on startup and release them on shutdown. """
+    database.init_pool()
+    migrate.migrate_on_startup()
+    await async_database.init_pool()
+    auth.init_hash_pool()
+    
+    # Load the violation catalog up front, requests load it lazily if MySQL is not up yet
+    try:
+        async with async_database.connection() as connection:
+            await catalog.reload(connection)
+    except HTTPException as e:
+        print(f"Violation catalog not loaded at startup: {e.detail}")
+    
+    yield
+    auth.close_hash_pool()
+    await async_database.close_pool()
+    database.close_pool()
 
-app = FastAPI(title="New York Police Department API")
+app = FastAPI(title="New York Police Department API", lifespan=lifespan)
 
 # CORS configuration to allow requests from local development environments
 app.add_middleware(
@@ -31,10 +62,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in request profiling, not installed at all unless PROFILING_ENABLED=1
+if profiling.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+# Statement counts and DB time per request, see query_trace.py
+app.add_middleware(query_trace.QueryTraceMiddleware)
+
+# Outermost, so request latency includes the CORS handling
+app.add_middleware(metrics.MetricsMiddleware)
+
+def resource_gauges():
+    """ Expose the counters of the pools and caches as gauges on every scrape. """
+    pools = {"sync": database.pool_stats(), "async": async_database.pool_stats()}
+    caches = cache.stats()
+    return [
+        ("db_pool_connections", "gauge", "Database connections by pool and state.", [
+            ({"pool": pool, "state": state}, stats[state])
+            for pool, stats in pools.items() for state in ("idle", "checked_out") if state in stats
+        ]),
+        ("entity_cache_lookups_total", "counter", "Entity cache lookups by cache and result.", [
+            ({"cache": name, "result": result}, stats[counter])
+            for name, stats in caches.items() for result, counter in (("hit", "hits"), ("miss", "misses"))
+        ]),
+        ("entity_cache_size", "gauge", "Entries held by each entity cache.", [
+            ({"cache": name}, stats["size"]) for name, stats in caches.items()
+        ]),
+        ("password_hash_pending", "gauge", "Password verifications queued or running.", [
+            ({}, auth.hash_pool_stats()["pending"])
+        ]),
+    ]
+
+metrics.register_collector(resource_gauges)
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """ Request, query and pool metrics in Prometheus text format. """
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 app.include_router(drivers.router)
 app.include_router(notices.router)
 app.include_router(citations.router)
 app.include_router(tokens.router)
 app.include_router(vehicles.router)
+app.include_router(violations.router)
+app.include_router(stats.router)
 
 # end of main.py
@@ -0,0 +1,185 @@
+# metrics.py
+# Request, query and pool metrics for the NYPD Citation system, in Prometheus text format.
+# Histograms are kept in process memory and rendered by GET /metrics. They are cheap enough for
+# the hot path: an observation is a bisect and three additions under an uncontended lock
+# (see benchmarks/bench_metrics.py). With several API workers, each worker reports its own.
+# =========================================================
+
+import bisect
+import re
+import threading
+import time
+
+# Buckets in seconds for request and statement latency, and in rows for result sizes
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000, 100000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_metrics = []
+_collectors = []
+
+
+class Histogram:
+    """
+    A Prometheus histogram with a fixed set of label names.
+
+    Label values are passed positionally to observe(), so recording a sample does not build
+    a dict. Each label combination keeps per-bucket counts, a sum and a count.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, *labels):
+        """ Record one sample for the given label values. """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        """ Return the exposition lines of this histogram. """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, [list(counts), total, count]) for labels, (counts, total, count) in self._series.items())
+
+        for labels, (counts, total, count) in series:
+            base = list(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{format_labels(base + [('le', format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(base)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(base)} {count}")
+        return lines
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def register_collector(collector):
+    """
+    Register a function called on every scrape, returning (name, type, help, samples) tuples
+    where samples is a list of ({label: value}, value). Used for gauges read from existing stats().
+    """
+    _collectors.append(collector)
+
+def render():
+    """ Return every metric in Prometheus text exposition format. """
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+
+    for collector in _collectors:
+        for name, metric_type, documentation, samples in collector():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{name}{format_labels(sorted(labels.items()))} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+# ========================================================
+# --- Application metrics ---
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and status.", ("method", "route", "status")
+)
+db_statement_duration = Histogram(
+    "db_statement_duration_seconds", "Time to execute a statement and fetch its rows.", ("statement",)
+)
+db_statement_rows = Histogram(
+    "db_statement_rows", "Rows returned or affected by a statement.", ("statement",), ROW_BUCKETS
+)
+db_pool_acquire_wait = Histogram(
+    "db_pool_acquire_wait_seconds", "Time spent waiting for a pooled database connection.", ("pool",)
+)
+
+# First SQL keyword and the table it works on, e.g. "SELECT Citation_View" or "UPDATE Driver"
+STATEMENT_PATTERN = re.compile(
+    r"^\s*(?:(UPDATE)\s+`?(\w+)|(\w+).*?\b(?:FROM|INTO)\s+`?(\w+))", re.IGNORECASE | re.DOTALL
+)
+STATEMENT_NAMES_MAX = 1024
+_statement_names = {}
+
+def statement_name(query):
+    """ Derive a low-cardinality label for a statement without an explicit name, e.g. "SELECT Driver". """
+    name = _statement_names.get(query)
+    if name is None:
+        match = STATEMENT_PATTERN.match(query)
+        if match:
+            verb, table = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+            name = f"{verb.upper()} {table}"
+        else:
+            name = "other"
+
+        # Queries are constants in practice, the bound only guards against SQL built from data
+        if len(_statement_names) < STATEMENT_NAMES_MAX:
+            _statement_names[query] = name
+    return name
+
+# --- End of Application metrics ---
+# ========================================================
+# --- Request middleware ---
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency of every HTTP request.
+
+    Requests are labelled with the route template (e.g. /citations/driver/{license_number}),
+    not the raw path, so label cardinality stays bounded. Unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope it was given
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status_code,
+            )
+
+# --- End of Request middleware ---
+# ========================================================
+
+# end of metrics.py
@@ -1,8 +1,8 @@
 # models.py
 
 from pydantic import BaseModel, Field
-from datetime import date, time
-from typing import List
+from datetime import date, datetime, time
+from typing import Generic, List, TypeVar
 
 # ========================================================
 # --- Driver Models --- 
@@ -137,6 +137,68 @@ class NoticeViolationResponse(NoticeViolationBase):
 
 # --- End of NoticeViolation Models ---
 # ========================================================
+# --- Citation Models ---
+
+class CitationResponse(BaseModel):
+    """ Model for returning a citation as shown to officers and drivers. """
+    citation_id: int = Field(..., example=1)
+    citation_number: str = Field(..., example="CIT-000001")
+    driver_license: str = Field(..., example="D1234567")
+    driver_name: str = Field(..., example="John Doe")
+    violation_type: str = Field(..., example="Vehicle Speeding by 1-10 mph over limit.")
+    violation_code: str | None = Field(None, example="SPD0110")
+    date_issued: date = Field(..., example="2026-01-15")
+    violation_location: str = Field(..., example="Atlantic Ave & 4th Ave, Brooklyn")
+    fine_amount: float = Field(..., example=0)
+    status: str = Field(..., example="active")
+    issued_by_badge: str = Field(..., example="B99001")
+
+class CitationSearchResult(CitationResponse):
+    """ Model for returning a citation matching a search, with its relevance score. """
+    score: float = Field(..., example=3.52)
+
+class CitationChange(BaseModel):
+    """ Model for one entry of the citation change feed, citation is None for a tombstone. """
+    change_id: int = Field(..., example=1042)
+    citation_id: int = Field(..., example=1)
+    changed_at: datetime = Field(..., example="2026-01-15T14:30:00")
+    deleted: bool = Field(..., example=False)
+    citation: CitationResponse | None = None
+
+class CitationChangeFeed(BaseModel):
+    """ Model for returning the citation changes after a client's cursor. """
+    changes: List[CitationChange]
+    next_since: int = Field(..., example=1042)
+    has_more: bool = Field(..., example=False)
+
+# --- End of Citation Models ---
+# ========================================================
+# --- Statistics Models ---
+
+class DailyStat(BaseModel):
+    """ Model for returning the number of notices issued on a day. """
+    day: date = Field(..., example="2026-01-15")
+    notices: int = Field(..., example=412)
+
+class OfficerStat(BaseModel):
+    """ Model for returning the number of notices issued by an officer. """
+    officer_id: int = Field(..., example=1)
+    badge_number: str = Field(..., example="B99001")
+    notices: int = Field(..., example=1310)
+
+class ViolationStat(BaseModel):
+    """ Model for returning the number of notices citing a violation code. """
+    violation_code: str = Field(..., example="SPEED0110")
+    violation_description: str | None = Field(None, example="Speeding 1-10 mph over limit")
+    notices: int = Field(..., example=5120)
+
+class LocationStat(BaseModel):
+    """ Model for returning the number of notices issued at a location. """
+    location: str = Field(..., example="Atlantic Ave & 4th Ave, Brooklyn")
+    notices: int = Field(..., example=87)
+
+# --- End of Statistics Models ---
+# ========================================================
 # --- Authentication Token Models ---
 
 class Token(BaseModel):
@@ -148,6 +210,24 @@ class TokenData(BaseModel):
     """ Model for returning token data information. """
     username: str | None = None
 
+class Principal(BaseModel):
+    """ Model for the identity carried by a verified access token. """
+    username: str
+    user_type: str | None = None
+    Officer_ID: int | None = None
+    Driver_ID: int | None = None
+
 # --- End of Authentication Token Models ---
 # ========================================================
+# --- Pagination Models ---
+
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    """ Model for returning one page of results and the cursor for the next page. """
+    items: List[T]
+    next_cursor: str | None = Field(None, example="WyIyMDI2LTAxLTE1IiwxXQ")
+
+# --- End of Pagination Models ---
+# ========================================================
 # end of models.py
\ No newline at end of file
@@ -0,0 +1,58 @@
+# pagination.py
+# Keyset (cursor) pagination helpers for the NYPD Citation system.
+# Cursors are opaque to clients: they encode the sort key of the last row on a page,
+# so each page is an indexed range scan no matter how deep the client pages.
+# =========================================================
+
+import base64
+import json
+from fastapi import HTTPException
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# Largest key a cursor may carry, the range of a signed BIGINT column
+MAX_KEY = 2 ** 63 - 1
+
+def encode_cursor(values):
+    """ Encode the sort key of the last row on a page into an opaque cursor string. """
+    raw = json.dumps(list(values), default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor, size):
+    """ Decode a cursor back into its sort key values, raising 400 if it is malformed. """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Keys no column can hold would fail in the driver instead of matching nothing
+    if any(isinstance(value, int) and not -MAX_KEY <= value <= MAX_KEY for value in values):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return values
+
+def paginate(rows, limit, key):
+    """
+    Split a result fetched with LIMIT limit + 1 into one page and the cursor for the next page.
+
+    Args:
+        rows: Rows fetched with one more row than the page size
+        limit: Page size requested by the client
+        key: Function returning the sort key values of a row
+
+    Returns:
+        tuple: (rows on this page, next_cursor or None when this is the last page)
+    """
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
+
+# end of pagination.py
@@ -0,0 +1,375 @@
+# profiling.py
+# Opt-in sampling profiler for API requests in the NYPD Citation system.
+# While a request is profiled, a sampler thread records the stack of the request's asyncio task
+# every PROFILE_INTERVAL_MS. When the task is running, its stack is the event loop thread's stack.
+# When it is suspended, its stack is the chain of awaits it is parked in. Each sample is weighted
+# by the time since the previous one, because the sampler only gets the GIL between switch
+# intervals while the request is busy. Samples are folded into a call tree: one
+# "frame;frame;frame" line per distinct stack, with its weight in microseconds. The time the task
+# spent waiting is split into MySQL, password hashing, threadpool and other waits.
+#
+# Profiling is off unless PROFILING_ENABLED=1, in which case main.py installs the middleware.
+# When disabled, the middleware is not installed and adds no cost.
+#   - An authorized officer sends "X-Profile: 1" to get the profile as the response body.
+#     The route's own status is in X-Profiled-Status.
+#   - PROFILE_SAMPLE_RATE=0.01 stores a profile of 1% of all requests in PROFILE_DIR.
+# Stored profiles are aggregated with:
+#   python -m profiling aggregate --route "/citations" --folded citations.folded
+# The .folded output can be opened in speedscope or flamegraph.pl.
+# =========================================================
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from fastapi import HTTPException
+
+import auth
+import query_trace
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+
+# Share of all requests profiled and stored, 0.0 to 1.0
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+
+# Badge numbers allowed to request a profile with X-Profile, empty allows every officer
+PROFILE_OFFICERS = {badge.strip() for badge in os.getenv("PROFILE_OFFICERS", "").split(",") if badge.strip()}
+
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# Requests profiled at the same time, more are served without profiling
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "2"))
+
+PROFILE_MAX_DEPTH = 64
+
+# Wait categories, picked from the files of the frames a suspended task is parked in
+WAIT_CATEGORIES = [
+    ("db_wait", re.compile(r"[\\/](aiomysql|pymysql)[\\/]")),
+    ("hash_wait", re.compile(r"[\\/]concurrent[\\/]futures[\\/]|auth\.py$")),
+    ("threadpool_wait", re.compile(r"[\\/](anyio|starlette[\\/]concurrency)")),
+]
+
+_active = 0
+_active_lock = threading.Lock()
+
+# ========================================================
+# --- Sampling ---
+
+STDLIB_DIR = os.path.dirname(os.__file__) + os.sep
+_labels = {}
+
+def frame_label(frame):
+    """ Return "path/to/module.py:function", the path relative to site-packages, the stdlib or the project. """
+    code = frame.f_code
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        if "site-packages" + os.sep in filename:
+            filename = filename.split("site-packages" + os.sep, 1)[1]
+        elif filename.startswith(STDLIB_DIR):
+            filename = filename[len(STDLIB_DIR):]
+        elif os.path.isabs(filename):
+            filename = os.path.relpath(filename)
+        label = _labels[code] = f"{filename}:{code.co_name}"
+    return label
+
+def request_frames(frames):
+    """ Drop the server and event loop frames above the profiling middleware, keep at most PROFILE_MAX_DEPTH. """
+    for index, frame in enumerate(frames):
+        if frame.f_code is ProfilingMiddleware.__call__.__code__:
+            frames = frames[index + 1:]
+            break
+    return frames[:PROFILE_MAX_DEPTH]
+
+def awaiting_stack(task):
+    """ Return the frames of the await chain a suspended task is parked in, from the outermost to the innermost. """
+    frames = []
+    awaitable = task.get_coro()
+    while awaitable is not None and len(frames) < PROFILE_MAX_DEPTH * 2:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None) or getattr(awaitable, "ag_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None) or getattr(awaitable, "ag_await", None)
+    return frames
+
+def running_stack(thread_id):
+    """ Return the frames of a thread from the outermost to the innermost. """
+    frame = sys._current_frames().get(thread_id)
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+def wait_category(frames):
+    for frame in reversed(frames):
+        for category, pattern in WAIT_CATEGORIES:
+            if pattern.search(frame.f_code.co_filename):
+                return category
+    return "other_wait"
+
+
+class Sampler(threading.Thread):
+    """ Samples the stack of one asyncio task every `interval` seconds until stopped. """
+
+    def __init__(self, loop, task, thread_id, interval):
+        super().__init__(name="request-profiler", daemon=True)
+        self.loop = loop
+        self.task = task
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.stacks = Counter()
+        self.categories = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        previous = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            try:
+                self.sample(round((now - previous) * 1_000_000))
+            except (AttributeError, RuntimeError, ValueError):
+                # The task moved on while its stack was being read, skip this sample
+                pass
+            previous = now
+
+    def sample(self, weight):
+        """ Record the task's current stack with a weight in microseconds. """
+        if self.task.done():
+            return
+        if asyncio.current_task(self.loop) is self.task:
+            category = "running"
+            frames = request_frames(running_stack(self.thread_id))
+        else:
+            frames = request_frames(awaiting_stack(self.task))
+            category = wait_category(frames)
+        self.samples += 1
+        self.categories[category] += weight
+        self.stacks[";".join([category] + [frame_label(frame) for frame in frames])] += weight
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+# --- End of Sampling ---
+# ========================================================
+# --- Request middleware ---
+
+async def authorized_officer(scope):
+    """ Return True if the request carries the bearer token of an officer allowed to profile. """
+    headers = dict(scope["headers"])
+    authorization = headers.get(b"authorization", b"").decode()
+    if not authorization.lower().startswith("bearer "):
+        return False
+    try:
+        principal = await auth.get_current_principal(authorization[7:])
+    except HTTPException:
+        return False
+    return principal.user_type == "officer" and (not PROFILE_OFFICERS or principal.username in PROFILE_OFFICERS)
+
+def store(profile):
+    """ Write a profile to PROFILE_DIR, returning its path. """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{profile['started_at'].replace(':', '')}-{profile['id']}.json")
+    with open(path, "w", encoding="utf-8") as profile_file:
+        json.dump(profile, profile_file)
+    return path
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling requests asked for with X-Profile or picked by PROFILE_SAMPLE_RATE.
+
+    Install it inside QueryTraceMiddleware, so profiles include the request's statement count and DB time.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _active
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        requested = any(name == b"x-profile" and value == b"1" for name, value in scope["headers"])
+        if requested and not await authorized_officer(scope):
+            requested = False
+        sampled = not requested and PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+        if not requested and not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        with _active_lock:
+            if _active >= PROFILE_MAX_CONCURRENT:
+                requested = sampled = False
+            else:
+                _active += 1
+        if not requested and not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        held = []
+
+        # A requested profile replaces the response, so the route's own response is held back
+        async def capture(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            if requested:
+                held.append(message)
+            else:
+                await send(message)
+
+        sampler = Sampler(asyncio.get_running_loop(), asyncio.current_task(), threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            sampler.stop()
+            with _active_lock:
+                _active -= 1
+
+        profile = self.build_profile(scope, status_code, started_at, time.perf_counter() - started, sampler)
+        if sampled:
+            await asyncio.to_thread(store, profile)
+            return
+
+        body = json.dumps(profile).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"x-profiled-status", str(status_code).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    def build_profile(scope, status_code, started_at, elapsed, sampler):
+        trace = query_trace.current()
+        route = scope.get("route")
+        interval_ms = sampler.interval * 1000
+        return {
+            "id": uuid.uuid4().hex[:12],
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": getattr(route, "path", "unmatched"),
+            "status": status_code,
+            "started_at": started_at.isoformat(timespec="milliseconds"),
+            "duration_ms": round(elapsed * 1000, 3),
+            "interval_ms": interval_ms,
+            "samples": sampler.samples,
+            "breakdown_ms": {category: round(weight / 1000, 3) for category, weight in sampler.categories.most_common()},
+            "db": {
+                "statements": trace.statements,
+                "time_ms": round(trace.seconds * 1000, 3),
+                "rows": trace.rows,
+            } if trace is not None else None,
+            "stacks": dict(sampler.stacks.most_common()),
+        }
+
+# --- End of Request middleware ---
+# ========================================================
+# --- Aggregation ---
+
+def load_profiles(directory, route=None):
+    """ Return the stored profiles, optionally only those of one route template. """
+    profiles = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path, encoding="utf-8") as profile_file:
+            profile = json.load(profile_file)
+        if route is None or profile["route"] == route:
+            profiles.append(profile)
+    return profiles
+
+def aggregate(profiles):
+    """ Merge profiles into per-route summaries and one set of folded stacks. """
+    routes = defaultdict(lambda: {"profiles": 0, "durations": [], "breakdown_ms": Counter(), "db_ms": 0.0, "statements": 0})
+    stacks = Counter()
+    for profile in profiles:
+        summary = routes[f"{profile['method']} {profile['route']}"]
+        summary["profiles"] += 1
+        summary["durations"].append(profile["duration_ms"])
+        summary["breakdown_ms"].update(profile["breakdown_ms"])
+        if profile.get("db"):
+            summary["db_ms"] += profile["db"]["time_ms"]
+            summary["statements"] += profile["db"]["statements"]
+        stacks.update(profile["stacks"])
+    return routes, stacks
+
+def frame_totals(stacks):
+    """ Return (self weight, total weight) per frame, counting a frame once per stack for the total. """
+    own = Counter()
+    total = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")[1:]
+        if frames:
+            own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    return own, total
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate stored request profiles.")
+    parser.add_argument("command", choices=["aggregate"])
+    parser.add_argument("--dir", default=PROFILE_DIR, help="Directory of stored profiles")
+    parser.add_argument("--route", help="Only profiles of this route template, e.g. /citations")
+    parser.add_argument("--top", type=int, default=25, help="Frames listed by self and total time")
+    parser.add_argument("--folded", help="Write the merged stacks in folded format for flame graph tools")
+    args = parser.parse_args(argv)
+
+    profiles = load_profiles(args.dir, args.route)
+    if not profiles:
+        print(f"No profiles in {args.dir}")
+        return 1
+
+    routes, stacks = aggregate(profiles)
+    for name, summary in sorted(routes.items()):
+        durations = sorted(summary["durations"])
+        count = summary["profiles"]
+        print(f"{name}: {count} profiles, median {durations[len(durations) // 2]:.1f}ms, max {durations[-1]:.1f}ms, "
+              f"{summary['statements'] / count:.1f} statements and {summary['db_ms'] / count:.1f}ms DB per request")
+        for category, milliseconds in summary["breakdown_ms"].most_common():
+            print(f"  {category:<16} {milliseconds / count:9.1f}ms per request")
+
+    own, total = frame_totals(stacks)
+    weight = sum(stacks.values())
+    for title, counts in (("self", own), ("total", total)):
+        print(f"\nTop frames by {title} time")
+        for frame, count in counts.most_common(args.top):
+            print(f"  {count / weight * 100:5.1f}%  {count / 1000 / len(profiles):9.1f}ms per request  {frame}")
+
+    if args.folded:
+        with open(args.folded, "w", encoding="utf-8") as folded_file:
+            for stack, count in stacks.most_common():
+                folded_file.write(f"{stack} {count}\n")
+        print(f"\nWrote {len(stacks)} stacks to {args.folded}")
+    return 0
+
+# --- End of Aggregation ---
+# ========================================================
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# end of profiling.py
@@ -0,0 +1,194 @@
+# query_trace.py
+# Per-request query tracing for the NYPD Citation system.
+# Every statement sent through the database helpers or the traced aiomysql cursors is recorded:
+# its duration and row count go to the metrics histograms, the statement is counted against the
+# trace of the request it belongs to, and statements slower than SLOW_QUERY_MS are logged with
+# their parameters redacted.
+#
+# Routes declare how many statements they may issue with @query_budget(n). Going over budget is
+# logged, or raises QueryBudgetExceeded when QUERY_BUDGET_STRICT=1 (for test runs). With
+# QUERY_TRACE_HEADERS=1 responses carry the statement count and DB time, e.g. for load tests.
+# =========================================================
+
+import contextvars
+import os
+import re
+import time
+from contextlib import contextmanager
+
+import metrics
+
+# Statements slower than this are logged
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+# Raise instead of logging when a route exceeds its query budget
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "0") == "1"
+
+# Add X-DB-Queries, X-DB-Time-Ms, X-DB-Rows and Server-Timing headers to responses
+QUERY_TRACE_HEADERS = os.getenv("QUERY_TRACE_HEADERS", "0") == "1"
+
+# Quoted strings and numbers, replaced when SQL with inlined values (e.g. a multi-row INSERT) is logged
+SQL_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|\b\d+(?:\.\d+)?\b")
+
+SLOW_QUERY_LOG_CHARS = 500
+
+
+class QueryBudgetExceeded(Exception):
+    """ A route issued more statements than its declared query budget. """
+
+
+class QueryTrace:
+    """ Statement count, DB time and rows of one request, or of a capture() block. """
+
+    __slots__ = ("statements", "seconds", "rows", "scope", "over_budget")
+
+    def __init__(self, scope=None):
+        self.statements = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.scope = scope
+        self.over_budget = False
+
+    def budget(self):
+        """ Return the query budget of the route handling this request, or None. """
+        route = self.scope.get("route") if self.scope is not None else None
+        return getattr(getattr(route, "endpoint", None), "query_budget", None)
+
+    def route_path(self):
+        route = self.scope.get("route") if self.scope is not None else None
+        return getattr(route, "path", "unmatched")
+
+
+_current = contextvars.ContextVar("query_trace", default=None)
+
+def current():
+    """ Return the trace of the running request, or None outside of a request. """
+    return _current.get()
+
+def query_budget(statements):
+    """
+    Declare the most statements a route may issue. Place it below the route decorator:
+
+        @router.post("")
+        @query_budget(6)
+        async def create_citation(...):
+    """
+    def declare(endpoint):
+        endpoint.query_budget = statements
+        return endpoint
+    return declare
+
+@contextmanager
+def capture(scope=None):
+    """ Trace the statements issued inside a with block, e.g. to assert a budget from a script. """
+    trace = QueryTrace(scope)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+# ========================================================
+# --- Recording ---
+
+def sql_text(query):
+    """ Return a statement as text, aiomysql sends multi-row INSERTs as bytes. """
+    if isinstance(query, str):
+        return query
+    return bytes(query[:SLOW_QUERY_LOG_CHARS * 2]).decode("utf-8", errors="replace")
+
+def redact(query, params):
+    """ Return the SQL with inlined literals removed and a description of the parameters without their values. """
+    sql = " ".join(SQL_LITERAL.sub("?", sql_text(query)).split())[:SLOW_QUERY_LOG_CHARS]
+    if params is None:
+        return sql, "none"
+    if isinstance(params, dict):
+        return sql, "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in params.items()) + "}"
+    values = params if isinstance(params, (list, tuple)) else [params]
+    return sql, "(" + ", ".join(type(value).__name__ for value in values) + ")"
+
+def record(name, query, params, started, row_count):
+    """
+    Record a statement that started at perf_counter() `started`.
+
+    Args:
+        name: Statement name for the metrics, derived from the SQL if None
+        query: SQL as sent, str or bytes
+        params: Parameters of the statement, only their types are ever logged
+        started: time.perf_counter() before the statement was sent
+        row_count: Rows returned or affected, None or negative if unknown
+    """
+    elapsed = time.perf_counter() - started
+    label = name or metrics.statement_name(sql_text(query))
+    metrics.db_statement_duration.observe(elapsed, label)
+    known_rows = row_count is not None and 0 <= row_count < 2 ** 63
+    if known_rows:
+        metrics.db_statement_rows.observe(row_count, label)
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        sql, described = redact(query, params)
+        print(f"Slow query {label} took {elapsed * 1000:.1f}ms rows={row_count if known_rows else '?'} params={described}: {sql}")
+
+    trace = _current.get()
+    if trace is None:
+        return
+    trace.statements += 1
+    trace.seconds += elapsed
+    if known_rows:
+        trace.rows += row_count
+
+    budget = trace.budget()
+    if budget is not None and trace.statements > budget and not trace.over_budget:
+        trace.over_budget = True
+        if QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(
+                f"{trace.route_path()} issued more than its budget of {budget} statements (latest: {label})"
+            )
+
+# --- End of Recording ---
+# ========================================================
+# --- Request middleware ---
+
+class QueryTraceMiddleware:
+    """
+    ASGI middleware giving every HTTP request its own QueryTrace.
+
+    Routes run in the task of the middleware, and threadpool work copies the context, so every
+    statement of the request lands in the same trace. Headers show the statements issued before
+    the response started, for a streaming response that excludes the rows streamed afterwards.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = QueryTrace(scope)
+        token = _current.set(trace)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and QUERY_TRACE_HEADERS:
+                milliseconds = trace.seconds * 1000
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-db-queries", str(trace.statements).encode()),
+                    (b"x-db-time-ms", f"{milliseconds:.3f}".encode()),
+                    (b"x-db-rows", str(trace.rows).encode()),
+                    (b"server-timing", f'db;dur={milliseconds:.3f};desc="{trace.statements} queries"'.encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
+            if trace.over_budget and not QUERY_BUDGET_STRICT:
+                print(f"Query budget exceeded: {scope['method']} {trace.route_path()} issued {trace.statements} "
+                      f"statements, budget {trace.budget()}")
+
+# --- End of Request middleware ---
+# ========================================================
+
+# end of query_trace.py
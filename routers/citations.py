@@ -3,181 +3,545 @@
 # This router adapts the "notices" terminology from the database to "citations" for the frontend.
 # =========================================================
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from datetime import date, datetime
+import csv
+import io
+import json
+import re
 import auth
-import database.database as database
+import cache
+import database.async_database as database
+from database import change_feed, read_model, rollups
+from json_responses import TrustedJSONResponse
 import models as models
+import pagination
+import query_trace
+import versions
+from violation_catalog import catalog
 from typing import List
 
 router = APIRouter(prefix="/citations", tags=["Citations"])
 
+# Columns returned for a citation, shared by the citation read endpoints.
+# Citations are read from the Citation_View read model (see database/read_model.py), which
+# already holds the driver, officer and violation columns of every notice.
+CITATION_COLUMNS = """
+    cv.Notice_ID as citation_id,
+    cv.Notice_ID as citation_number,
+    cv.License_Number as driver_license,
+    cv.First_Name,
+    cv.Last_Name,
+    cv.Violation_Codes as violation_codes,
+    cv.Violation_Descriptions as violation_types,
+    cv.Violation_Date as date_issued,
+    cv.Location as violation_location,
+    0 as fine_amount,
+    'active' as status,
+    cv.Badge_Number as issued_by_badge,
+    cv.Violation_Time as violation_time
+"""
+
+# Keyset condition resuming after the last (Violation_Date, Notice_ID) of the previous page
+CITATION_KEYSET = "(cv.Violation_Date < %s OR (cv.Violation_Date = %s AND cv.Notice_ID < %s))"
+
+def format_citation(row):
+    """ Transform a citation row to match frontend expectations. """
+    return {
+        "citation_id": row['citation_id'],
+        "citation_number": f"CIT-{row['citation_number']:06d}",
+        "driver_license": row['driver_license'],
+        "driver_name": f"{row['First_Name']} {row['Last_Name']}",
+        "violation_type": row['violation_types'] or 'Unknown',
+        "violation_code": row['violation_codes'],
+        "date_issued": row['date_issued'].isoformat(),
+        "violation_location": row['violation_location'],
+        "fine_amount": row['fine_amount'],
+        "status": row['status'],
+        "issued_by_badge": row['issued_by_badge']
+    }
+
+# Column order of the CSV export
+EXPORT_FIELDS = [
+    "citation_id", "citation_number", "driver_license", "driver_name", "violation_type",
+    "violation_code", "date_issued", "violation_location", "fine_amount", "status", "issued_by_badge"
+]
+
+# Number of rows pulled from the server-side cursor per round trip while exporting
+EXPORT_BATCH_SIZE = 1000
+
+# Largest number of citations accepted by POST /citations/batch
+BATCH_MAX_SIZE = 1000
+
+# Search results are paged by offset, pages past this many results are not offered
+SEARCH_MAX_RESULTS = 10000
+
+# Words of a search query used as terms, the rest of a long query is ignored
+SEARCH_MAX_TERMS = 10
+
+# MySQL relevance of a citation, MATCH must list the columns of the FULLTEXT index from migration 0005
+SEARCH_RELEVANCE = "MATCH (cv.Location, cv.First_Name, cv.Last_Name, cv.Violation_Descriptions) AGAINST (%s IN BOOLEAN MODE)"
+
+def split_driver_name(driver_name):
+    """ Split a full driver name into first and last name, defaulting missing parts to 'Unknown'. """
+    name_parts = (driver_name or '').split()
+    first_name = name_parts[0] if len(name_parts) > 0 else 'Unknown'
+    last_name = ' '.join(name_parts[1:]) if len(name_parts) > 1 else 'Unknown'
+    return first_name, last_name
+
+def citation_sort_key(row):
+    """ Return the keyset pagination sort key of a citation row. """
+    return (row['date_issued'].isoformat(), row['citation_id'])
+
+async def resolve_officer_id(connection, principal):
+    """ Return the Officer_ID of the current user, from the token claims or the officer cache for older tokens. """
+    if principal.Officer_ID is not None:
+        return principal.Officer_ID
+
+    officer = None if principal.user_type == 'driver' else await cache.get_officer(connection, principal.username)
+    if officer is None:
+        raise HTTPException(status_code=400, detail="Officer not found in system")
+    return officer['Officer_ID']
+
 # ========================================================
 # --- GET ALL CITATIONS ---
 
-@router.get("", response_model=List[dict])
-def read_all_citations(
-    connection=Depends(database.get_db_connection),
-    current_user: str = Depends(auth.verify_token)):
+@router.get("", response_model=models.Page[models.CitationResponse])
+@query_trace.query_budget(1)
+async def read_all_citations(
+    limit: int = Query(pagination.DEFAULT_LIMIT, ge=1, le=pagination.MAX_LIMIT),
+    cursor: str | None = None,
+    current_user: str = Depends(auth.verify_token),
+    etag: str = Depends(versions.conditional(*versions.CITATION_TABLES)),
+    connection=Depends(database.get_db_connection)):
     """ 
-    Retrieve all citations (correction notices) from the system.
+    Retrieve a page of citations (correction notices) from the system, newest first.
     
-    This endpoint queries the Correction_Notice table and joins with Driver, Officer, 
-    and Violation tables to return formatted citation data for officers.
+    This endpoint reads the Citation_View read model, which holds the Correction_Notice,
+    Driver, Officer and Violation columns of each notice, to return formatted citation data for officers.
     
     Args:
-        connection: Database connection dependency
+        limit: Maximum number of citations to return
+        cursor: next_cursor from the previous page, omitted for the first page
         current_user: Current authenticated user (badge number)
+        etag: ETag of the response, a matching If-None-Match is answered with 304 before this runs
+        connection: Database connection dependency
     
     Returns:
-        List[dict]: List of all citations with driver and violation information
+        Page[CitationResponse]: Citations with driver and violation information, and the cursor for the next page
     """
     
-    # Query to retrieve all citations with related information
-    # Uses GROUP_CONCAT to combine multiple violations for a single citation
-    query = """
-        SELECT 
-            cn.Notice_ID as citation_id,
-            cn.Notice_ID as citation_number,
-            d.License_Number as driver_license,
-            d.First_Name,
-            d.Last_Name,
-            GROUP_CONCAT(nv.Violation_Code) as violation_codes,
-            GROUP_CONCAT(v.Violation_Description) as violation_types,
-            cn.Violation_Date as date_issued,
-            cn.Location as violation_location,
-            0 as fine_amount,
-            'active' as status,
-            o.Badge_Number as issued_by_badge,
-            cn.Violation_Time as violation_time
-        FROM Correction_Notice cn
-        JOIN Driver d ON cn.Driver_ID = d.Driver_ID
-        JOIN Officer o ON cn.Officer_ID = o.Officer_ID
-        LEFT JOIN Notice_Violation nv ON cn.Notice_ID = nv.Notice_ID
-        LEFT JOIN Violation v ON nv.Violation_Code = v.Violation_Code
-        GROUP BY cn.Notice_ID
-        ORDER BY cn.Violation_Date DESC
+    # Resume after the last citation of the previous page
+    keyset = ""
+    params = []
+    if cursor:
+        last_date, last_id = pagination.decode_cursor(cursor, 2)
+        keyset = f"WHERE {CITATION_KEYSET}"
+        params = [last_date, last_date, last_id]
+    
+    # Query to retrieve one page of citations, a range scan on (Violation_Date, Notice_ID)
+    # Fetches one extra row to find out whether there is a next page
+    query = f"""
+        SELECT {CITATION_COLUMNS}
+        FROM Citation_View cv
+        {keyset}
+        ORDER BY cv.Violation_Date DESC, cv.Notice_ID DESC
+        LIMIT %s
     """
     
     try:
-        # Execute the query to get all citations
-        results = database.execute_query(connection, query, fetch="all")
+        # Execute the query to get the page of citations
+        results = await database.execute_query(connection, query, (*params, limit + 1), fetch="all", name="citations.list")
     except HTTPException:
-        # Return empty list if no citations found instead of 404
-        return []
+        # Return empty page if no citations found instead of 404
+        return {"items": [], "next_cursor": None}
     
-    # Transform results to match frontend expectations
-    citations = []
-    for row in results:
-        citations.append({
-            "citation_id": row['citation_id'],
-            "citation_number": f"CIT-{row['citation_number']:06d}",
-            "driver_license": row['driver_license'],
-            "driver_name": f"{row['First_Name']} {row['Last_Name']}",
-            "violation_type": row['violation_types'] or 'Unknown',
-            "violation_code": row['violation_codes'],
-            "date_issued": row['date_issued'].isoformat(),
-            "violation_location": row['violation_location'],
-            "fine_amount": row['fine_amount'],
-            "status": row['status'],
-            "issued_by_badge": row['issued_by_badge']
-        })
-    
-    return citations
+    rows, next_cursor = pagination.paginate(results, limit, citation_sort_key)
+    
+    # Rows are formatted from our own query, so skip re-validating them against the response model
+    return TrustedJSONResponse({"items": [format_citation(row) for row in rows], "next_cursor": next_cursor}, headers={"ETag": etag})
 
 # --- End of GET ALL CITATIONS ---
 # ========================================================
 # --- GET CITATIONS BY DRIVER LICENSE ---
 
-@router.get("/driver/{license_number}", response_model=List[dict])
-def read_driver_citations(
+@router.get("/driver/{license_number}", response_model=models.Page[models.CitationResponse])
+@query_trace.query_budget(1)
+async def read_driver_citations(
     license_number: str,
-    connection=Depends(database.get_db_connection),
-    current_user: str = Depends(auth.verify_token)):
+    limit: int = Query(pagination.DEFAULT_LIMIT, ge=1, le=pagination.MAX_LIMIT),
+    cursor: str | None = None,
+    current_user: str = Depends(auth.verify_token),
+    etag: str = Depends(versions.conditional(*versions.CITATION_TABLES)),
+    connection=Depends(database.get_db_connection)):
     """ 
-    Retrieve all citations for a specific driver by their license number.
+    Retrieve a page of citations for a specific driver by their license number, newest first.
     
     This endpoint allows drivers to view their own citations and officers to 
     look up citations for a specific driver.
     
     Args:
         license_number: Driver's license number (e.g., D1234567)
-        connection: Database connection dependency
+        limit: Maximum number of citations to return
+        cursor: next_cursor from the previous page, omitted for the first page
         current_user: Current authenticated user (badge number or license)
+        etag: ETag of the response, a matching If-None-Match is answered with 304 before this runs
+        connection: Database connection dependency
     
     Returns:
-        List[dict]: List of citations for the specified driver
+        Page[CitationResponse]: Citations for the specified driver and the cursor for the next page
     """
     
-    # Query to retrieve citations filtered by driver license number
-    query = """
-        SELECT 
-            cn.Notice_ID as citation_id,
-            cn.Notice_ID as citation_number,
-            d.License_Number as driver_license,
-            d.First_Name,
-            d.Last_Name,
-            GROUP_CONCAT(nv.Violation_Code) as violation_codes,
-            GROUP_CONCAT(v.Violation_Description) as violation_types,
-            cn.Violation_Date as date_issued,
-            cn.Location as violation_location,
-            0 as fine_amount,
-            'active' as status,
-            o.Badge_Number as issued_by_badge,
-            cn.Violation_Time as violation_time
-        FROM Correction_Notice cn
-        JOIN Driver d ON cn.Driver_ID = d.Driver_ID
-        JOIN Officer o ON cn.Officer_ID = o.Officer_ID
-        LEFT JOIN Notice_Violation nv ON cn.Notice_ID = nv.Notice_ID
-        LEFT JOIN Violation v ON nv.Violation_Code = v.Violation_Code
-        WHERE d.License_Number = %s
-        GROUP BY cn.Notice_ID
-        ORDER BY cn.Violation_Date DESC
+    # Resume after the last citation of the previous page
+    keyset = ""
+    params = [license_number]
+    if cursor:
+        last_date, last_id = pagination.decode_cursor(cursor, 2)
+        keyset = f"AND {CITATION_KEYSET}"
+        params += [last_date, last_date, last_id]
+    
+    # Query to retrieve one page of citations filtered by driver license number,
+    # a range scan on (License_Number, Violation_Date, Notice_ID)
+    query = f"""
+        SELECT {CITATION_COLUMNS}
+        FROM Citation_View cv
+        WHERE cv.License_Number = %s {keyset}
+        ORDER BY cv.Violation_Date DESC, cv.Notice_ID DESC
+        LIMIT %s
     """
     
     try:
         # Execute the query with the provided license number
-        results = database.execute_query(connection, query, (license_number,), fetch="all")
+        results = await database.execute_query(connection, query, (*params, limit + 1), fetch="all", name="citations.by_driver")
     except HTTPException:
-        # Return empty list if no citations found instead of 404
-        return []
+        # Return empty page if no citations found instead of 404
+        return {"items": [], "next_cursor": None}
     
-    # Transform results to match frontend expectations
-    citations = []
-    for row in results:
-        citations.append({
-            "citation_id": row['citation_id'],
-            "citation_number": f"CIT-{row['citation_number']:06d}",
-            "driver_license": row['driver_license'],
-            "driver_name": f"{row['First_Name']} {row['Last_Name']}",
-            "violation_type": row['violation_types'] or 'Unknown',
-            "violation_code": row['violation_codes'],
-            "date_issued": row['date_issued'].isoformat(),
-            "violation_location": row['violation_location'],
-            "fine_amount": row['fine_amount'],
-            "status": row['status'],
-            "issued_by_badge": row['issued_by_badge']
-        })
-    
-    return citations
+    rows, next_cursor = pagination.paginate(results, limit, citation_sort_key)
+    
+    # Rows are formatted from our own query, so skip re-validating them against the response model
+    return TrustedJSONResponse({"items": [format_citation(row) for row in rows], "next_cursor": next_cursor}, headers={"ETag": etag})
 
 # --- End of GET CITATIONS BY DRIVER LICENSE ---
 # ========================================================
+# --- GET CITATION CHANGES ---
+
+@router.get("/changes", response_model=models.CitationChangeFeed)
+@query_trace.query_budget(1)
+async def read_citation_changes(
+    since: int = Query(0, ge=0, le=pagination.MAX_KEY),
+    limit: int = Query(pagination.DEFAULT_LIMIT, ge=1, le=pagination.MAX_LIMIT),
+    license_number: str | None = None,
+    current_user: str = Depends(auth.verify_token),
+    etag: str = Depends(versions.conditional(*versions.CITATION_TABLES)),
+    connection=Depends(database.get_db_connection)):
+    """ 
+    Retrieve the citations changed after a client's cursor, oldest change first.
+    
+    Clients keep next_since from the previous response and send it back as since, so a sync
+    reads only the Change_Log rows written since then (see database/change_feed.py) instead of
+    the whole citation list. since=0 returns every citation. A citation that was deleted, or
+    that moved to another driver when license_number is given, comes back as a tombstone.
+    
+    Args:
+        since: next_since from the previous response, 0 for a full sync
+        limit: Maximum number of Change_Log rows to read
+        license_number: Only return the changes of this driver's citations, e.g. for the driver app
+        current_user: Current authenticated user (badge number or license)
+        etag: ETag of the response, a matching If-None-Match is answered with 304 before this runs
+        connection: Database connection dependency
+    
+    Returns:
+        CitationChangeFeed: The latest change of each changed citation, the cursor for the next
+        request and whether more changes are waiting
+    """
+    
+    # A driver's feed is a range scan on (License_Number, Change_ID), and only counts the
+    # Citation_View row while the citation still belongs to that driver
+    license_join = ""
+    license_filter = ""
+    params = [since]
+    if license_number is not None:
+        license_join = "AND cv.License_Number = %s"
+        license_filter = "AND cl.License_Number = %s"
+        params = [license_number, since, license_number]
+    
+    # Fetches one extra row to find out whether more changes are waiting
+    query = f"""
+        SELECT cl.Change_ID, cl.Notice_ID, cl.Changed_At, {CITATION_COLUMNS}
+        FROM Change_Log cl
+        LEFT JOIN Citation_View cv ON cv.Notice_ID = cl.Notice_ID {license_join}
+        WHERE cl.Change_ID > %s {license_filter}
+        ORDER BY cl.Change_ID
+        LIMIT %s
+    """
+    
+    results = await database.execute_query(connection, query, (*params, limit + 1), fetch="all", name="citations.changes")
+    has_more = len(results) > limit
+    results = results[:limit]
+    
+    # A citation changed several times within the page is returned once, at its latest change
+    latest = {}
+    for row in results:
+        latest.pop(row['Notice_ID'], None)
+        latest[row['Notice_ID']] = row
+    
+    changes = [
+        {
+            "change_id": row['Change_ID'],
+            "citation_id": row['Notice_ID'],
+            "changed_at": row['Changed_At'].isoformat(),
+            "deleted": row['citation_id'] is None,
+            "citation": None if row['citation_id'] is None else format_citation(row)
+        }
+        for row in latest.values()
+    ]
+    next_since = results[-1]['Change_ID'] if results else since
+    
+    # Rows are formatted from our own query, so skip re-validating them against the response model
+    return TrustedJSONResponse({"changes": changes, "next_since": next_since, "has_more": has_more}, headers={"ETag": etag})
+
+# --- End of GET CITATION CHANGES ---
+# ========================================================
+# --- GET SEARCH CITATIONS ---
+
+def search_match(q):
+    """ 
+    Turn a search query into a full-text match expression where every word is required and
+    may be a prefix, e.g. 'atlan ave' matches 'Atlantic Ave'. Operators typed by the user are
+    dropped, only words are kept. Raises 400 if the query has no words.
+    """
+    words = re.findall(r"\w+", q.lower())[:SEARCH_MAX_TERMS]
+    if not words:
+        raise HTTPException(status_code=400, detail="Search query must contain at least one word")
+    
+    if database.DATABASE_BACKEND == "sqlite":
+        return " ".join(f'"{word}"*' for word in words)
+    return " ".join(f"+{word}*" for word in words)
+
+def search_query(q, filters):
+    """ 
+    Return the search statement for the configured backend, ranked by relevance, then newest first,
+    and its match parameters. The filter values, LIMIT and OFFSET follow the match parameters.
+    """
+    match = search_match(q)
+    
+    # FTS5 table kept current by triggers on Citation_View, bm25 is lower for better matches
+    if database.DATABASE_BACKEND == "sqlite":
+        return f"""
+            SELECT {CITATION_COLUMNS}, -bm25(idx_citation_view_search) AS score
+            FROM idx_citation_view_search
+            JOIN Citation_View cv ON cv.rowid = idx_citation_view_search.rowid
+            WHERE idx_citation_view_search MATCH %s {filters}
+            ORDER BY score DESC, cv.Violation_Date DESC, cv.Notice_ID DESC
+            LIMIT %s OFFSET %s
+        """, [match]
+    
+    # MySQL evaluates the identical MATCH once for both uses
+    return f"""
+        SELECT {CITATION_COLUMNS}, {SEARCH_RELEVANCE} AS score
+        FROM Citation_View cv
+        WHERE {SEARCH_RELEVANCE} {filters}
+        ORDER BY score DESC, cv.Violation_Date DESC, cv.Notice_ID DESC
+        LIMIT %s OFFSET %s
+    """, [match, match]
+
+@router.get("/search", response_model=models.Page[models.CitationSearchResult])
+@query_trace.query_budget(1)
+async def search_citations(
+    q: str = Query(..., min_length=1, max_length=200),
+    license_number: str | None = None,
+    badge_number: str | None = None,
+    violation_code: str | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    limit: int = Query(pagination.DEFAULT_LIMIT, ge=1, le=pagination.MAX_LIMIT),
+    cursor: str | None = None,
+    current_user: str = Depends(auth.verify_token),
+    etag: str = Depends(versions.conditional(*versions.CITATION_TABLES)),
+    connection=Depends(database.get_db_connection)):
+    """ 
+    Search citations by location, driver name or violation description, best matches first.
+    
+    The words of q are looked up in the full-text index over Citation_View (MySQL FULLTEXT,
+    FTS5 on SQLite, see migration 0005), which the write routes keep current through the read
+    model. Every word must match, as a whole word or a prefix.
+    
+    Args:
+        q: Search words, e.g. 'atlantic speeding' or 'doe'
+        license_number: Only citations of this driver
+        badge_number: Only citations issued by this officer
+        violation_code: Only citations with this violation code
+        date_from: Only citations issued on or after this date
+        date_to: Only citations issued on or before this date
+        limit: Maximum number of citations to return
+        cursor: next_cursor from the previous page, omitted for the first page
+        current_user: Current authenticated user (badge number)
+        etag: ETag of the response, a matching If-None-Match is answered with 304 before this runs
+        connection: Database connection dependency
+    
+    Returns:
+        Page[CitationSearchResult]: Matching citations with their relevance score and the cursor for the next page
+    """
+    
+    # Relevance order has no stable key to resume after, so the cursor holds the offset
+    offset = 0
+    if cursor:
+        offset, = pagination.decode_cursor(cursor, 1)
+        # Only offsets this endpoint hands out are accepted, bool is an int subclass
+        if not isinstance(offset, int) or isinstance(offset, bool) or not 0 <= offset < SEARCH_MAX_RESULTS:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    conditions = []
+    params = []
+    for condition, value in (
+        ("cv.License_Number = %s", license_number),
+        ("cv.Badge_Number = %s", badge_number),
+        ("FIND_IN_SET(%s, cv.Violation_Codes) > 0", violation_code),
+        ("cv.Violation_Date >= %s", date_from),
+        ("cv.Violation_Date <= %s", date_to),
+    ):
+        if value is not None:
+            conditions.append(f"AND {condition}")
+            params.append(value)
+    
+    # Fetches one extra row to find out whether there is a next page
+    query, match_params = search_query(q, " ".join(conditions))
+    results = await database.execute_query(
+        connection, query, (*match_params, *params, limit + 1, offset), fetch="all", name="citations.search"
+    )
+    
+    next_cursor = None
+    if len(results) > limit and offset + limit < SEARCH_MAX_RESULTS:
+        next_cursor = pagination.encode_cursor([offset + limit])
+    
+    items = [{**format_citation(row), "score": round(float(row['score']), 4)} for row in results[:limit]]
+    
+    # Rows are formatted from our own query, so skip re-validating them against the response model
+    return TrustedJSONResponse({"items": items, "next_cursor": next_cursor}, headers={"ETag": etag})
+
+# --- End of GET SEARCH CITATIONS ---
+# ========================================================
+# --- GET EXPORT CITATIONS ---
+
+async def stream_citations(export_format):
+    """ 
+    Stream every citation, newest first, as NDJSON lines or CSV rows.
+    
+    Rows are read from an unbuffered server-side cursor in batches, shaped with
+    format_citation and written out one batch at a time, so memory stays constant
+    no matter how many citations there are.
+    
+    Args:
+        export_format: 'ndjson' or 'csv'
+    
+    Yields:
+        str: Encoded chunk of citations
+    """
+    
+    query = f"""
+        SELECT {CITATION_COLUMNS}
+        FROM Citation_View cv
+        ORDER BY cv.Violation_Date DESC, cv.Notice_ID DESC
+    """
+    
+    async with database.connection() as connection:
+        
+        # Allow slow consumers to hold the result open without the server aborting the stream
+        session = await connection.cursor()
+        results = None
+        try:
+            await session.execute("SET SESSION net_write_timeout = 3600")
+            
+            results = await database.execute_query(connection, query, fetch="iter", batch_size=EXPORT_BATCH_SIZE, name="citations.export")
+            
+            # The CSV header goes out immediately, before the first batch is read
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+            if export_format == "csv":
+                writer.writeheader()
+                yield buffer.getvalue()
+            
+            # Write citations out one batch at a time
+            pending = 0
+            buffer.seek(0)
+            buffer.truncate()
+            async for row in results:
+                if export_format == "csv":
+                    writer.writerow(format_citation(row))
+                else:
+                    buffer.write(json.dumps(format_citation(row)) + "\n")
+                
+                pending += 1
+                if pending == EXPORT_BATCH_SIZE:
+                    yield buffer.getvalue()
+                    pending = 0
+                    buffer.seek(0)
+                    buffer.truncate()
+            
+            if pending:
+                yield buffer.getvalue()
+        
+        # Undo the session timeout on every path, so the pooled connection does not keep it.
+        # Closing a stream abandoned part way closes its connection, which the pool then drops.
+        finally:
+            if results is not None:
+                await results.aclose()
+            if not connection.closed:
+                try:
+                    await session.execute("SET SESSION net_write_timeout = DEFAULT")
+                    await session.close()
+                except Exception:
+                    connection.close()
+
+@router.get("/export")
+async def export_citations(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    current_user: str = Depends(auth.verify_token)):
+    """ 
+    Export the full citation history as a streamed NDJSON or CSV download.
+    
+    The first bytes are sent as soon as MySQL returns the first rows, and the
+    response is never held in memory as a whole.
+    
+    Args:
+        format: Output format, 'ndjson' (default) or 'csv'
+        current_user: Current authenticated user (badge number)
+    
+    Returns:
+        StreamingResponse: Citations in the requested format
+    """
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    
+    return StreamingResponse(
+        stream_citations(format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=citations.{format}"}
+    )
+
+# --- End of GET EXPORT CITATIONS ---
+# ========================================================
 # --- POST CREATE CITATION ---
 
 @router.post("", status_code=201)
-def create_citation(
+@query_trace.query_budget(9)
+async def create_citation(
     citation_data: dict,
     connection=Depends(database.get_db_connection),
-    current_user: str = Depends(auth.verify_token)):
+    principal: models.Principal = Depends(auth.get_current_principal)):
     """ 
     Create a new citation (correction notice) in the system.
     
-    This endpoint creates a new citation by:
-    1. Verifying or creating the driver record
-    2. Looking up the officer from the current user
-    3. Creating a correction notice
-    4. Linking violations to the notice
+    This endpoint creates a new citation in a single transaction with six steps:
+    1. Upserting the driver record and getting its Driver_ID back
+    2. Creating the correction notice for the officer (taken from the token claims),
+       resolving the vehicle in the same statement
+    3. Linking the violation to the notice, resolving the violation code from the in-memory catalog
+    4. Writing the citation's Citation_View read model row
+    5. Counting the citation in the Citation_Rollup dashboard counters
+    6. Recording the citation in the Change_Log change feed
     
     Args:
         citation_data: Dictionary containing citation details
@@ -187,7 +551,7 @@ def create_citation(
             - violation_type: Type of violation
             - fine_amount: Fine amount for the citation
         connection: Database connection dependency
-        current_user: Current authenticated user (badge number)
+        principal: Current authenticated user
     
     Returns:
         dict: Newly created citation information
@@ -196,105 +560,70 @@ def create_citation(
         HTTPException: If officer not found or database error occurs
     """
     
-    cursor = connection.cursor(dictionary=True)
+    await catalog.ensure_loaded(connection)
+    officer_id = await resolve_officer_id(connection, principal)
+    
+    cursor = await connection.cursor()
     
     try:
-        # Step 1: Look up or create the driver record
-        driver_query = "SELECT Driver_ID FROM Driver WHERE License_Number = %s"
+        # Step 1: Create the driver, or reuse the existing one with the same license number.
+        # LAST_INSERT_ID(Driver_ID) makes lastrowid return the existing id on a duplicate.
+        first_name, last_name = split_driver_name(citation_data.get('driver_name', 'Unknown'))
         
-        try:
-            driver_result = database.execute_query(
-                connection, 
-                driver_query, 
-                (citation_data.get('driver_license'),),
-                fetch="one"
-            )
-            driver_id = driver_result['Driver_ID']
-        except HTTPException:
-            # Driver does not exist, so create a new driver record
-            driver_name = citation_data.get('driver_name', 'Unknown')
-            name_parts = driver_name.split()
-            first_name = name_parts[0] if len(name_parts) > 0 else 'Unknown'
-            last_name = ' '.join(name_parts[1:]) if len(name_parts) > 1 else 'Unknown'
-            
-            insert_driver_query = """
-                INSERT INTO Driver (First_Name, Last_Name, Address, Birth_Date, License_Number, License_State)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """
-            
-            driver_id = database.execute_insert(
-                connection,
-                insert_driver_query,
-                (first_name, last_name, 'Unknown', '2000-01-01', citation_data.get('driver_license'), 'NY')
-            )
-        
-        # Step 2: Look up the officer from the current user (badge number)
-        officer_query = "SELECT Officer_ID FROM Officer WHERE Badge_Number = %s"
-        
-        try:
-            officer_result = database.execute_query(
-                connection,
-                officer_query,
-                (current_user,),
-                fetch="one"
-            )
-            officer_id = officer_result['Officer_ID']
-        except HTTPException:
-            raise HTTPException(status_code=400, detail="Officer not found in system")
-        
-        # Step 3: Get a vehicle VIN (use first available or placeholder)
-        vehicle_query = "SELECT VIN FROM Vehicle LIMIT 1"
+        upsert_driver_query = """
+            INSERT INTO Driver (First_Name, Last_Name, Address, Birth_Date, License_Number, License_State)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE Driver_ID = LAST_INSERT_ID(Driver_ID)
+        """
         
-        try:
-            vehicle_result = database.execute_query(connection, vehicle_query, fetch="one")
-            vin = vehicle_result['VIN']
-        except HTTPException:
-            # No vehicles in database, use placeholder
-            vin = "UNKNOWN00000000000"
+        await cursor.execute(
+            upsert_driver_query,
+            (first_name, last_name, 'Unknown', '2000-01-01', citation_data.get('driver_license'), 'NY')
+        )
+        driver_id = cursor.lastrowid
         
-        # Step 4: Create the correction notice
+        # Step 2: Create the correction notice for the officer of the current user (badge number),
+        # using the first available vehicle or a placeholder VIN
         insert_notice_query = """
             INSERT INTO Correction_Notice (Violation_Date, Violation_Time, Location, Driver_ID, Officer_ID, VIN)
-            VALUES (%s, %s, %s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, %s, COALESCE((SELECT VIN FROM Vehicle LIMIT 1), 'UNKNOWN00000000000'))
         """
         
         violation_date = datetime.now().date()
         violation_time = datetime.now().strftime("%H:%M:%S")
         
-        notice_id = database.execute_insert(
-            connection,
+        await cursor.execute(
             insert_notice_query,
             (
                 violation_date,
                 violation_time,
                 citation_data.get('violation_location', 'Unknown'),
                 driver_id,
-                officer_id,
-                vin
+                officer_id
             )
         )
+        notice_id = cursor.lastrowid
         
-        # Step 5: Link violation to the notice using the bridge table
+        # Step 3: Link the violation to the notice using the bridge table, resolving the
+        # violation type with the in-memory catalog and falling back to the generic code
         violation_type = citation_data.get('violation_type', 'Other')
+        violation_code = catalog.match(violation_type) or 'OTHER'
         
-        # Look up the violation code for the given violation type
-        violation_query = "SELECT Violation_Code FROM Violation WHERE Violation_Description LIKE %s LIMIT 1"
+        insert_bridge_query = "INSERT INTO Notice_Violation (Notice_ID, Violation_Code) VALUES (%s, %s)"
+        await cursor.execute(insert_bridge_query, (notice_id, violation_code))
         
-        try:
-            violation_result = database.execute_query(
-                connection,
-                violation_query,
-                (f"%{violation_type}%",),
-                fetch="one"
-            )
-            violation_code = violation_result['Violation_Code']
-        except HTTPException:
-            # Violation type not found, use generic code
-            violation_code = 'OTHER'
+        # Step 4: Build the citation's read model row from the rows just written
+        await read_model.refresh_notices(cursor, [notice_id])
         
-        # Insert into the bridge table (Notice_Violation)
-        insert_bridge_query = "INSERT INTO Notice_Violation (Notice_ID, Violation_Code) VALUES (%s, %s)"
-        database.execute_insert(connection, insert_bridge_query, (notice_id, violation_code))
+        # Step 5: Count the new citation in the dashboard counters
+        await rollups.add_notices(cursor, [notice_id])
+        
+        # Step 6: Record the new citation in the change feed
+        await change_feed.record(cursor, [notice_id])
+        
+        # COMMIT all six steps together
+        await connection.commit()
+        versions.bump("Driver", "Correction_Notice", "Notice_Violation")
         
         # Return the newly created citation
         return {
@@ -308,25 +637,193 @@ def create_citation(
             "violation_location": citation_data.get('violation_location'),
             "fine_amount": citation_data.get('fine_amount', 0),
             "status": "active",
-            "issued_by_badge": current_user,
+            "issued_by_badge": principal.username,
             "message": "Citation issued successfully"
         }
     
     except HTTPException:
-        # Re-raise HTTP exceptions
+        # Undo the driver upsert and re-raise HTTP exceptions
+        await connection.rollback()
         raise
     except Exception as err:
-        # Handle unexpected database errors
-        connection.rollback()
+        # If anything fails, undo everything so no orphaned drivers or notices are left behind
+        await connection.rollback()
         print(f"Error creating citation: {err}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail=f"Error creating citation: {str(err)}"
         )
     finally:
-        cursor.close()
+        await cursor.close()
 
 # --- End of POST CREATE CITATION ---
 # ========================================================
 
+# --- POST BATCH CREATE CITATIONS ---
+
+@router.post("/batch", status_code=201)
+@query_trace.query_budget(15)
+async def create_citations_batch(
+    citations: List[dict],
+    connection=Depends(database.get_db_connection),
+    principal: models.Principal = Depends(auth.get_current_principal)):
+    """ 
+    Create many citations at once, e.g. when a handheld device syncs after losing signal.
+    
+    The whole batch is written in one transaction with a fixed number of round trips:
+    1. Resolving the officer and a vehicle once, and violation codes from the in-memory catalog
+    2. Resolving every driver with one IN query, inserting the missing ones in one multi-row INSERT
+    3. Inserting all correction notices in one multi-row INSERT
+    4. Inserting all Notice_Violation bridge rows in one multi-row INSERT
+    5. Writing the Citation_View read model rows of the whole batch in one statement
+    6. Counting the batch in the Citation_Rollup dashboard counters in one statement
+    7. Recording the batch in the Change_Log change feed in one statement
+    
+    Args:
+        citations: List of citation details, each shaped like the POST /citations body
+        connection: Database connection dependency
+        principal: Current authenticated user
+    
+    Returns:
+        dict: Number of citations created and a result for every item, in request order
+    
+    Raises:
+        HTTPException: If the batch is too large, the officer is not found or a database error occurs
+    """
+    
+    if len(citations) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {BATCH_MAX_SIZE} citations")
+    
+    # Validate every item up front, invalid items are reported and skipped
+    results = [None] * len(citations)
+    accepted = []
+    for index, citation_data in enumerate(citations):
+        if not citation_data.get('driver_license'):
+            results[index] = {"index": index, "status": "error", "detail": "driver_license is required"}
+        else:
+            accepted.append(index)
+    
+    if not accepted:
+        return {"created": 0, "results": results}
+    
+    cursor = await connection.cursor(database.DictCursor)
+    
+    try:
+        # Step 1: Resolve the officer and a vehicle once for the whole batch, violations come from the catalog
+        officer_id = await resolve_officer_id(connection, principal)
+        
+        await cursor.execute("SELECT VIN FROM Vehicle LIMIT 1")
+        vehicle = await cursor.fetchone()
+        vin = vehicle['VIN'] if vehicle else "UNKNOWN00000000000"
+        
+        await catalog.ensure_loaded(connection)
+        
+        # Step 2: Resolve all drivers with one query and create the missing ones in one multi-row INSERT
+        licenses = list(dict.fromkeys(citations[index]['driver_license'] for index in accepted))
+        driver_ids = await find_driver_ids(cursor, licenses)
+        
+        missing = [license for license in licenses if license not in driver_ids]
+        if missing:
+            names = {citations[index]['driver_license']: citations[index].get('driver_name', 'Unknown') for index in accepted}
+            await cursor.executemany(
+                """
+                INSERT INTO Driver (First_Name, Last_Name, Address, Birth_Date, License_Number, License_State)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE Driver_ID = Driver_ID
+                """,
+                [(*split_driver_name(names[license]), 'Unknown', '2000-01-01', license, 'NY') for license in missing]
+            )
+            driver_ids.update(await find_driver_ids(cursor, missing))
+        
+        # Step 3: Insert every correction notice with one multi-row INSERT
+        violation_date = datetime.now().date()
+        violation_time = datetime.now().strftime("%H:%M:%S")
+        notices = [
+            (
+                violation_date,
+                violation_time,
+                citations[index].get('violation_location', 'Unknown'),
+                driver_ids[citations[index]['driver_license']],
+                officer_id,
+                vin
+            )
+            for index in accepted
+        ]
+        
+        await cursor.executemany(
+            """
+            INSERT INTO Correction_Notice (Violation_Date, Violation_Time, Location, Driver_ID, Officer_ID, VIN)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            notices
+        )
+        
+        # A multi-row INSERT is allocated consecutive ids starting at LAST_INSERT_ID(),
+        # read the range back to make sure no concurrent statement interleaved with it
+        first_id = cursor.lastrowid
+        notice_ids = list(range(first_id, first_id + len(notices)))
+        await cursor.execute(
+            "SELECT Notice_ID, Driver_ID, Location FROM Correction_Notice WHERE Notice_ID BETWEEN %s AND %s AND Officer_ID = %s ORDER BY Notice_ID",
+            (notice_ids[0], notice_ids[-1], officer_id)
+        )
+        inserted = await cursor.fetchall()
+        expected = [(notice_id, notice[3], notice[2]) for notice_id, notice in zip(notice_ids, notices)]
+        if [(row['Notice_ID'], row['Driver_ID'], row['Location']) for row in inserted] != expected:
+            raise HTTPException(status_code=409, detail="Concurrent insert detected, please retry the batch")
+        
+        # Step 4: Link every notice to its violation with one multi-row INSERT into the bridge table
+        violation_types = [citations[index].get('violation_type', 'Other') for index in accepted]
+        await cursor.executemany(
+            "INSERT INTO Notice_Violation (Notice_ID, Violation_Code) VALUES (%s, %s)",
+            [(notice_id, catalog.match(violation_type) or 'OTHER') for notice_id, violation_type in zip(notice_ids, violation_types)]
+        )
+        
+        # Step 5: Build the read model rows of every new notice
+        await read_model.refresh_notices(cursor, notice_ids)
+        
+        # Step 6: Count every new citation in the dashboard counters
+        await rollups.add_notices(cursor, notice_ids)
+        
+        # Step 7: Record every new citation in the change feed
+        await change_feed.record(cursor, notice_ids)
+        
+        # COMMIT the whole batch together
+        await connection.commit()
+        versions.bump("Driver", "Correction_Notice", "Notice_Violation")
+    
+    except HTTPException:
+        await connection.rollback()
+        raise
+    except Exception as err:
+        # If anything fails, undo the whole batch
+        await connection.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
+            detail=f"Error creating citations: {str(err)}"
+        )
+    finally:
+        await cursor.close()
+    
+    for index, notice_id in zip(accepted, notice_ids):
+        results[index] = {
+            "index": index,
+            "status": "created",
+            "citation_id": notice_id,
+            "citation_number": f"CIT-{notice_id:06d}"
+        }
+    
+    return {"created": len(accepted), "results": results}
+
+async def find_driver_ids(cursor, licenses):
+    """ Map license numbers to Driver_IDs with a single IN query. """
+    placeholders = ", ".join(["%s"] * len(licenses))
+    await cursor.execute(
+        f"SELECT Driver_ID, License_Number FROM Driver WHERE License_Number IN ({placeholders})",
+        licenses
+    )
+    return {row['License_Number']: row['Driver_ID'] for row in await cursor.fetchall()}
+
+# --- End of POST BATCH CREATE CITATIONS ---
+# ========================================================
+
 # end of citations.py
\ No newline at end of file
@@ -3,64 +3,69 @@
 # =========================================================
 
 
-from fastapi import APIRouter, Depends, HTTPException
-import database.database as database, models as models
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+import database.async_database as database, models as models
 import auth
+import cache
+import pagination
+import query_trace
+import versions
+from json_responses import TrustedJSONResponse
 
 router = APIRouter(prefix="/drivers", tags=["Drivers"])
 
 @router.post("/register", response_model=models.DriverResponse, status_code=201)
-def register_driver(
+@query_trace.query_budget(3)
+async def register_driver(
     driver: models.DriverCreate, 
     connection=Depends(database.get_db_connection)):
     """ Register a new driver without authentication. """
     
-    try:
-        # Check if driver with this license number already exists
-        existing = database.execute_query(
-            connection, 
-            "SELECT * FROM Driver WHERE License_Number = %s", 
-            (driver.License_Number,), 
-            fetch="one"
+    # Check if driver with this license number already exists
+    if await cache.get_driver(connection, driver.License_Number):
+        raise HTTPException(
+            status_code=400, 
+            detail="A driver with this license number already exists"
         )
-        if existing:
-            raise HTTPException(
-                status_code=400, 
-                detail="A driver with this license number already exists"
-            )
-    except HTTPException as e:
-        if e.status_code == 400:
-            raise e
-        # If 404 (not found), that's good - continue
-        pass
     
     try:
         # Create the new driver
-        driver_id = database.execute_insert(
+        driver_id = await database.execute_insert(
             connection,
             "INSERT INTO Driver (First_Name, Last_Name, Address, Birth_Date, License_Number, License_State) VALUES (%s, %s, %s, %s, %s, %s)",
             (driver.First_Name, driver.Last_Name, driver.Address, driver.Birth_Date, driver.License_Number, driver.License_State)
         )
+        cache.invalidate_driver(license_number=driver.License_Number)
+        versions.bump("Driver")
         
         # Retrieve and return the newly created driver
-        return database.execute_query(connection, "SELECT * FROM Driver WHERE Driver_ID = %s", (driver_id,), fetch="one")
+        return await database.execute_query(connection, "SELECT * FROM Driver WHERE Driver_ID = %s", (driver_id,), fetch="one")
     
     except Exception as err:
         raise HTTPException(status_code=500, detail=f"Database error: {err}")
 
-@router.get("/", response_model=List[models.DriverResponse])
-def read_all_drivers(
-    connection=Depends(database.get_db_connection), 
-    current_user: str=Depends(auth.verify_token)):
-    """ Retrieve a list of all drivers. """ 
+@router.get("/", response_model=models.Page[models.DriverResponse])
+async def read_all_drivers(
+    limit: int = Query(pagination.DEFAULT_LIMIT, ge=1, le=pagination.MAX_LIMIT),
+    cursor: str | None = None,
+    current_user: str=Depends(auth.verify_token),
+    etag: str=Depends(versions.conditional("Driver")),
+    connection=Depends(database.get_db_connection)):
+    """ Retrieve a page of drivers ordered by Driver_ID, answering If-None-Match with 304 when no driver changed. """ 
     
-    query = "SELECT * FROM Driver"
+    # Resume after the last Driver_ID of the previous page
+    last_id = pagination.decode_cursor(cursor, 1)[0] if cursor else 0
     
-    return database.execute_query(connection, query)
+    query = "SELECT * FROM Driver WHERE Driver_ID > %s ORDER BY Driver_ID LIMIT %s"
+    
+    results = await database.execute_query(connection, query, (last_id, limit + 1))
+    rows, next_cursor = pagination.paginate(results, limit, lambda row: (row['Driver_ID'],))
+    
+    # Rows come straight from the table, so skip re-validating them against the response model
+    return TrustedJSONResponse({"items": rows, "next_cursor": next_cursor}, headers={"ETag": etag})
 
 @router.get("/{driver_id}", response_model=models.DriverResponse)
-def read_driver(
+async def read_driver(
     driver_id: int, 
     connection=Depends(database.get_db_connection),
     current_user: str=Depends(auth.verify_token)):
@@ -68,21 +73,23 @@ def read_driver(
     
     query = "SELECT * FROM Driver WHERE Driver_ID = %s"
     
-    return database.execute_query(connection, query, (driver_id,), fetch="one")
+    return await database.execute_query(connection, query, (driver_id,), fetch="one")
 
 @router.get("/license/{license_number}", response_model=models.DriverResponse)
-def read_driver_by_license(
+async def read_driver_by_license(
     license_number: str, 
     connection=Depends(database.get_db_connection),
     current_user: str=Depends(auth.verify_token)):
     """ Retrieve a driver by their license number. """
     
-    query = "SELECT * FROM Driver WHERE License_Number = %s"
+    driver = await cache.get_driver(connection, license_number)
+    if driver is None:
+        raise HTTPException(status_code=404, detail="Record not found")
     
-    return database.execute_query(connection, query, (license_number,), fetch="one")
+    return driver
 
 @router.post("/", response_model=models.DriverResponse, status_code=201)
-def create_driver(
+async def create_driver(
     driver: models.DriverCreate, 
     connection=Depends(database.get_db_connection),
     current_user: str=Depends(auth.verify_token)):
@@ -90,47 +97,52 @@ def create_driver(
     
     try:
         # Use the helper function to execute the insert
-        driver_id = database.execute_insert(
+        driver_id = await database.execute_insert(
             connection,
             "INSERT INTO Driver (First_Name, Last_Name, Address, Birth_Date, License_Number, License_State) VALUES (%s, %s, %s, %s, %s, %s)",
             (driver.First_Name, driver.Last_Name, driver.Address, driver.Birth_Date, driver.License_Number, driver.License_State)
         )
+        cache.invalidate_driver(license_number=driver.License_Number)
+        versions.bump("Driver")
         
         # Retrieve and return the newly created driver
-        return database.execute_query(connection, "SELECT * FROM Driver WHERE Driver_ID = %s", (driver_id,), fetch="one")
+        return await database.execute_query(connection, "SELECT * FROM Driver WHERE Driver_ID = %s", (driver_id,), fetch="one")
     
     except Exception as err:
         raise HTTPException(status_code=500, detail=f"Database error: {err}")
 
 @router.put("/{driver_id}/address", status_code=204)
-def update_driver_address(
+async def update_driver_address(
     driver_id: int, new_address: str, 
     connection=Depends(database.get_db_connection),
     current_user: str=Depends(auth.verify_token)):
     """ Update the address of a driver. """
     
     try:
-        # Update the driver's address
-        database.execute_query(connection, "UPDATE Driver SET Address = %s WHERE Driver_ID = %s", (new_address, driver_id), fetch=None)
-
+        # Update the driver's address and commit it
+        await database.execute_insert(connection, "UPDATE Driver SET Address = %s WHERE Driver_ID = %s", (new_address, driver_id))
+        cache.invalidate_driver(driver_id=driver_id)
+        versions.bump("Driver")
     
     except Exception as err:
         raise HTTPException(status_code=500, detail=f"Database error: {err}")
 
 @router.delete("/{driver_id}", status_code=204)
-def delete_driver(
+async def delete_driver(
     driver_id: int, 
     connection=Depends(database.get_db_connection),
     current_user: str=Depends(auth.verify_token)):
     """ Delete a driver record by ID. """
     
     # Check if the driver exists before attempting to delete
-    database.execute_query(connection, "SELECT * FROM Driver WHERE Driver_ID = %s", (driver_id,), fetch="one")
+    await database.execute_query(connection, "SELECT * FROM Driver WHERE Driver_ID = %s", (driver_id,), fetch="one")
     
     # Attempt to delete the driver and handle any database errors
     try:
         # Use the helper function to execute the delete
-        database.execute_insert(connection, "DELETE FROM Driver WHERE Driver_ID = %s", (driver_id,))
+        await database.execute_insert(connection, "DELETE FROM Driver WHERE Driver_ID = %s", (driver_id,))
+        cache.invalidate_driver(driver_id=driver_id)
+        versions.bump("Driver")
     
     # Handle any database errors
     except Exception as err:
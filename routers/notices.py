@@ -4,14 +4,28 @@
 
 from fastapi import APIRouter, Depends, HTTPException
 import auth
-import database.database as database, models as models
+import database.async_database as database, models as models
+from database import change_feed, read_model, rollups
+from json_responses import TrustedJSONResponse
+import query_trace
+import versions
 from typing import List
+from violation_catalog import catalog
 
 router = APIRouter(prefix="/notices", tags=["Correction Notices"])
 
+async def validate_violations(violations, connection):
+    """ Raise 400 if any violation code is not in the violation catalog. """
+    await catalog.ensure_loaded(connection)
+    
+    unknown = [code for code in violations if catalog.get(code) is None]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown violation code(s): {', '.join(unknown)}")
+
 @router.get("/officer/{badge_number}", response_model=List[models.CorrectionNoticeResponse])
-def read_notices_by_officer(
-    badge_number: int, 
+@query_trace.query_budget(1)
+async def read_notices_by_officer(
+    badge_number: str, 
     connection=Depends(database.get_db_connection),
     current_user: str=Depends(auth.verify_token)):
     """ Retrieve all correction notices with their violations for an officer. """ 
@@ -26,7 +40,7 @@ def read_notices_by_officer(
         GROUP BY cn.Notice_ID
     """
     
-    results = database.execute_query(connection, query, (badge_number,))
+    results = await database.execute_query(connection, query, (badge_number,), name="notices.by_officer")
     
     # Transform the 'Violations' string back into a real Python List
     for row in results:
@@ -34,17 +48,21 @@ def read_notices_by_officer(
             row['Violations'] = row['Violations'].split(',')
         else:
             row['Violations'] = [] # Handle cases with no violations
-            
-    return results
+    
+    # Rows come straight from our own query, so skip re-validating them against the response model
+    return TrustedJSONResponse(results)
 
 @router.post("/", response_model=models.CorrectionNoticeResponse, status_code=201)
-def create_correction_notice(
+async def create_correction_notice(
     notice: models.CorrectionNoticeCreate, 
     connection=Depends(database.get_db_connection),
     current_user: str=Depends(auth.verify_token)):
     """ Create a new correction notice using database helpers and transactions. """
     
-    cursor = connection.cursor(dictionary=True)
+    # Reject unknown violation codes before touching the database
+    await validate_violations(notice.Violations, connection)
+    
+    cursor = await connection.cursor(database.DictCursor)
     
     try:
         # Insert the main notice
@@ -52,7 +70,7 @@ def create_correction_notice(
             INSERT INTO Correction_Notice (Violation_Date, Violation_Time, Location, Driver_ID, Officer_ID, VIN)
             VALUES (%s, %s, %s, %s, %s, %s)
         """
-        cursor.execute(insert_notice_query, (
+        await cursor.execute(insert_notice_query, (
             notice.Violation_Date, notice.Violation_Time, notice.Location, 
             notice.Driver_ID, notice.Officer_ID, notice.VIN
         ))
@@ -61,10 +79,16 @@ def create_correction_notice(
         # Insert into the Bridge Table for each violation
         insert_bridge_query = "INSERT INTO Notice_Violation (Notice_ID, Violation_Code) VALUES (%s, %s)"
         for violation in notice.Violations:
-            cursor.execute(insert_bridge_query, (notice_id, violation))
+            await cursor.execute(insert_bridge_query, (notice_id, violation))
+        
+        # Keep the citation read model, the dashboard counters and the change feed in step with the notice
+        await read_model.refresh_notices(cursor, [notice_id])
+        await rollups.add_notices(cursor, [notice_id])
+        await change_feed.record(cursor, [notice_id])
             
-        # COMMIT both actions together
-        connection.commit()
+        # COMMIT all actions together
+        await connection.commit()
+        versions.bump("Correction_Notice", "Notice_Violation")
         
         # Use your execute_query HELPER to fetch the final result
         fetch_query = """
@@ -74,7 +98,7 @@ def create_correction_notice(
             WHERE cn.Notice_ID = %s
             GROUP BY cn.Notice_ID
         """ 
-        result = database.execute_query(connection, fetch_query, (notice_id,), fetch="one")
+        result = await database.execute_query(connection, fetch_query, (notice_id,), fetch="one", name="notices.fetch")
         
         # Convert the comma-separated string from GROUP_CONCAT into a Python List
         if result['Violations']:
@@ -86,25 +110,37 @@ def create_correction_notice(
     
     except Exception as err:
         # If anything fails (like a bad Driver_ID), undo everything
-        connection.rollback()
+        await connection.rollback()
         if "1452" in str(err):
             raise HTTPException(status_code=400, detail="Invalid Driver_ID, Officer_ID, or VIN.")
         raise HTTPException(status_code=500, detail=f"Database error: {err}")
     finally:
-        cursor.close() 
+        await cursor.close() 
 
 @router.put("/{notice_id}", status_code=204)
-def update_correction_notice(
+async def update_correction_notice(
     notice_id: int,
     notice: models.CorrectionNoticeCreate,
     connection=Depends(database.get_db_connection),
     current_user: str=Depends(auth.verify_token)):
     """ Update an existing correction notice. """
     
-    database.execute_query(connection, "SELECT * FROM Correction_Notice WHERE Notice_ID = %s", (notice_id,), fetch="one")
+    # Reject unknown violation codes before touching the database
+    await validate_violations(notice.Violations, connection)
     
-    cursor = connection.cursor()
+    # The current driver's License_Number is kept for the change feed row of a moved notice
+    existing = await database.execute_query(connection, """
+        SELECT cn.Driver_ID, cv.License_Number
+        FROM Correction_Notice cn
+        LEFT JOIN Citation_View cv ON cv.Notice_ID = cn.Notice_ID
+        WHERE cn.Notice_ID = %s
+    """, (notice_id,), fetch="one")
+    
+    cursor = await connection.cursor()
     try: 
+        # Take the notice's current counts away, they are added back once it is rewritten
+        await rollups.remove_notices(cursor, [notice_id])
+        
         # Update main record
         update_notice_query = """
             UPDATE Correction_Notice
@@ -112,7 +148,7 @@ def update_correction_notice(
             WHERE Notice_ID = %s
         """
         
-        cursor.execute(
+        await cursor.execute(
             update_notice_query, 
             (notice.Violation_Date, notice.Violation_Time, notice.Location, 
              notice.Driver_ID, notice.Officer_ID, notice.VIN, notice_id
@@ -120,15 +156,27 @@ def update_correction_notice(
             )    
         
         # Sync the violations
-        cursor.execute("DELETE FROM Notice_Violation WHERE Notice_ID = %s", (notice_id,))
+        await cursor.execute("DELETE FROM Notice_Violation WHERE Notice_ID = %s", (notice_id,))
         
         insert_bridge = "INSERT INTO Notice_Violation (Notice_ID, Violation_Code) VALUES (%s, %s)"
         for violation in notice.Violations:
-            cursor.execute(insert_bridge, (notice_id, violation))
+            await cursor.execute(insert_bridge, (notice_id, violation))
+        
+        # Keep the citation read model, the dashboard counters and the change feed in step with the notice
+        await read_model.refresh_notices(cursor, [notice_id])
+        await rollups.add_notices(cursor, [notice_id])
+        
+        # A notice moving to another driver leaves a change feed row for the previous driver,
+        # which their feed returns as a tombstone. Recorded after the counters, like every
+        # writer, so Change_Log_Lock is always taken last.
+        if existing['Driver_ID'] != notice.Driver_ID:
+            await change_feed.record_moved(cursor, notice_id, existing['License_Number'])
+        await change_feed.record(cursor, [notice_id])
             
-        connection.commit()
+        await connection.commit()
+        versions.bump("Correction_Notice", "Notice_Violation")
     except Exception as err:
-        connection.rollback()
+        await connection.rollback()
         # Catch Foreign Key failures (e.g., Driver_ID 0)
         if "1452" in str(err):
             raise HTTPException(
@@ -137,7 +185,37 @@ def update_correction_notice(
             )
         raise HTTPException(status_code=500, detail=f"Database error: {err}")
     finally:
-        cursor.close()
+        await cursor.close()
+
+@router.delete("/{notice_id}", status_code=204)
+async def delete_correction_notice(
+    notice_id: int,
+    connection=Depends(database.get_db_connection),
+    principal: models.Principal=Depends(auth.get_current_principal)):
+    """ Delete a correction notice, its violations and its read model row. Officers only. """
+    
+    if principal.user_type != 'officer':
+        raise HTTPException(status_code=403, detail="Only officers can delete correction notices")
+    
+    await database.execute_query(connection, "SELECT Notice_ID FROM Correction_Notice WHERE Notice_ID = %s", (notice_id,), fetch="one")
+    
+    cursor = await connection.cursor()
+    try:
+        # Take the notice out of the dashboard counters and record the change before the read
+        # model row is gone, the feed returns it as a tombstone
+        await rollups.remove_notices(cursor, [notice_id])
+        await change_feed.record(cursor, [notice_id])
+        
+        # Notice_Violation and Citation_View rows are removed by ON DELETE CASCADE
+        await cursor.execute("DELETE FROM Correction_Notice WHERE Notice_ID = %s", (notice_id,))
+        
+        await connection.commit()
+        versions.bump("Correction_Notice", "Notice_Violation")
+    except Exception as err:
+        await connection.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {err}")
+    finally:
+        await cursor.close()
     
     
     
@@ -0,0 +1,145 @@
+# stats.py
+# FastAPI application for New York Police Department Citation system - Dashboard statistics endpoints.
+# Counts are read from the Citation_Rollup counters (see database/rollups.py), which the notice
+# and citation write routes keep in step, so a dashboard reads one row per day or per bucket and
+# month no matter how many notices there are.
+# =========================================================
+
+from fastapi import APIRouter, Depends, Query
+from datetime import date
+import auth
+import database.async_database as database, models as models
+from json_responses import TrustedJSONResponse
+import pagination
+import query_trace
+import versions
+from typing import List
+from violation_catalog import catalog
+
+router = APIRouter(prefix="/stats", tags=["Statistics"])
+
+# Citation_Rollup is derived from these tables
+STATS_TABLES = ("Correction_Notice", "Notice_Violation")
+
+# Default number of buckets returned by the top-N endpoints
+DEFAULT_TOP = 20
+
+# Counters of one dimension summed over a range of months, largest first
+TOP_BUCKETS = """
+    SELECT r.Bucket, SUM(r.Notices) AS Total
+    FROM Citation_Rollup r
+    WHERE r.Dimension = %s AND r.Period BETWEEN %s AND %s
+    GROUP BY r.Bucket
+    HAVING SUM(r.Notices) > 0
+    ORDER BY Total DESC, r.Bucket
+    LIMIT %s
+"""
+
+def period_range(date_from, date_to, length):
+    """
+    Return the first and last Period to read for a date range, 'YYYY-MM-DD' periods for
+    length 10 and 'YYYY-MM' for length 7. Monthly counters cover whole months, so a range
+    starting or ending mid-month includes that whole month.
+    """
+    first = date_from.isoformat()[:length] if date_from else "0000"
+    last = date_to.isoformat()[:length] if date_to else "9999"
+    return first, last
+
+# ========================================================
+# --- GET DAILY STATS ---
+
+@router.get("/daily", response_model=List[models.DailyStat])
+@query_trace.query_budget(1)
+async def read_daily_stats(
+    date_from: date | None = None,
+    date_to: date | None = None,
+    current_user: str = Depends(auth.verify_token),
+    etag: str = Depends(versions.conditional(*STATS_TABLES)),
+    connection=Depends(database.get_db_connection)):
+    """ Retrieve the number of notices issued per day, oldest first, for days with notices. """
+
+    query = """
+        SELECT r.Period, r.Notices
+        FROM Citation_Rollup r
+        WHERE r.Dimension = 'day' AND r.Period BETWEEN %s AND %s AND r.Notices > 0
+        ORDER BY r.Period
+    """
+    results = await database.execute_query(connection, query, period_range(date_from, date_to, 10), name="stats.daily")
+
+    # Periods of the 'day' dimension are already ISO dates
+    return TrustedJSONResponse([{"day": row['Period'], "notices": row['Notices']} for row in results], headers={"ETag": etag})
+
+# --- End of GET DAILY STATS ---
+# ========================================================
+# --- GET TOP OFFICERS, VIOLATIONS AND LOCATIONS ---
+
+@router.get("/officers", response_model=List[models.OfficerStat])
+@query_trace.query_budget(1)
+async def read_officer_stats(
+    date_from: date | None = None,
+    date_to: date | None = None,
+    limit: int = Query(DEFAULT_TOP, ge=1, le=pagination.MAX_LIMIT),
+    current_user: str = Depends(auth.verify_token),
+    etag: str = Depends(versions.conditional(*STATS_TABLES, "Officer")),
+    connection=Depends(database.get_db_connection)):
+    """ Retrieve the officers who issued the most notices, counted by whole months. """
+
+    # The counters are keyed by Officer_ID, badge numbers are joined to the top buckets only
+    query = f"""
+        SELECT o.Officer_ID, o.Badge_Number, t.Total
+        FROM ({TOP_BUCKETS}) t
+        JOIN Officer o ON o.Officer_ID = CAST(t.Bucket AS SIGNED)
+        ORDER BY t.Total DESC, o.Officer_ID
+    """
+    params = ("officer", *period_range(date_from, date_to, 7), limit)
+    results = await database.execute_query(connection, query, params, name="stats.officers")
+
+    return TrustedJSONResponse([
+        {"officer_id": row['Officer_ID'], "badge_number": row['Badge_Number'], "notices": int(row['Total'])}
+        for row in results
+    ], headers={"ETag": etag})
+
+@router.get("/violations", response_model=List[models.ViolationStat])
+@query_trace.query_budget(2)
+async def read_violation_stats(
+    date_from: date | None = None,
+    date_to: date | None = None,
+    limit: int = Query(DEFAULT_TOP, ge=1, le=pagination.MAX_LIMIT),
+    current_user: str = Depends(auth.verify_token),
+    etag: str = Depends(versions.conditional(*STATS_TABLES, "Violation")),
+    connection=Depends(database.get_db_connection)):
+    """ Retrieve the most cited violation codes, counted by whole months. """
+
+    # Descriptions come from the in-memory catalog, read directly so they don't count as
+    # lookups in the catalog hit/miss stats
+    await catalog.ensure_loaded(connection)
+    descriptions = {row['Violation_Code']: row['Violation_Description'] for row in catalog.all()}
+
+    params = ("violation", *period_range(date_from, date_to, 7), limit)
+    results = await database.execute_query(connection, TOP_BUCKETS, params, name="stats.violations")
+
+    return TrustedJSONResponse([
+        {"violation_code": row['Bucket'], "violation_description": descriptions.get(row['Bucket']), "notices": int(row['Total'])}
+        for row in results
+    ], headers={"ETag": etag})
+
+@router.get("/locations", response_model=List[models.LocationStat])
+@query_trace.query_budget(1)
+async def read_location_stats(
+    date_from: date | None = None,
+    date_to: date | None = None,
+    limit: int = Query(DEFAULT_TOP, ge=1, le=pagination.MAX_LIMIT),
+    current_user: str = Depends(auth.verify_token),
+    etag: str = Depends(versions.conditional(*STATS_TABLES)),
+    connection=Depends(database.get_db_connection)):
+    """ Retrieve the locations with the most notices, counted by whole months. """
+
+    params = ("location", *period_range(date_from, date_to, 7), limit)
+    results = await database.execute_query(connection, TOP_BUCKETS, params, name="stats.locations")
+
+    return TrustedJSONResponse([{"location": row['Bucket'], "notices": int(row['Total'])} for row in results], headers={"ETag": etag})
+
+# --- End of GET TOP OFFICERS, VIOLATIONS AND LOCATIONS ---
+# ========================================================
+
+# end of stats.py
@@ -4,12 +4,61 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-import auth, database.database as database, models
+import auth, cache, database.async_database as database, models, query_trace
 
 router = APIRouter(prefix="/token", tags=["Authentication Tokens"])
 
+# Officers and drivers matching a username in one round trip, officers first ('officer' sorts after 'driver')
+LOGIN_QUERY = """
+    SELECT 'officer' AS User_Type, Officer_ID AS User_ID, Badge_Number AS Username, Secret_Hash
+    FROM Officer WHERE Badge_Number = %s
+    UNION ALL
+    SELECT 'driver' AS User_Type, Driver_ID AS User_ID, License_Number AS Username, NULL AS Secret_Hash
+    FROM Driver WHERE License_Number = %s
+    ORDER BY User_Type DESC
+"""
+
+async def find_login_candidates(connection, username):
+    """ 
+    Yield the officer and driver accounts matching a username, officer first.
+    
+    A cached officer is used without querying, the driver is then only looked up if the
+    caller asks for the next candidate (i.e. the officer password was wrong).
+    """
+    officer = cache.officers_by_badge.get(username)
+    if officer is not None:
+        yield {"User_Type": "officer", "User_ID": officer['Officer_ID'],
+               "Username": officer['Badge_Number'], "Secret_Hash": officer.get('Secret_Hash')}
+        
+        driver = await cache.get_driver(connection, username)
+        if driver:
+            yield {"User_Type": "driver", "User_ID": driver['Driver_ID'],
+                   "Username": driver['License_Number'], "Secret_Hash": None}
+        return
+    
+    try:
+        rows = await database.execute_query(connection, LOGIN_QUERY, (username, username), name="tokens.login")
+    except HTTPException as e:
+        if e.status_code == 404:
+            return
+        raise
+    
+    for row in rows:
+        yield row
+
+async def rehash_officer_password(connection, candidate, new_hash):
+    """ Store an upgraded password hash for an officer, a failure only delays the upgrade. """
+    try:
+        await database.execute_insert(
+            connection, "UPDATE Officer SET Secret_Hash = %s WHERE Officer_ID = %s", (new_hash, candidate['User_ID'])
+        )
+        cache.officers_by_badge.invalidate(str(candidate['Username']))
+    except HTTPException as e:
+        print(f"Could not rehash password for officer {candidate['User_ID']}: {e.detail}")
+
 @router.post("", response_model=models.Token, status_code=201)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), 
+@query_trace.query_budget(3)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), 
           connection=Depends(database.get_db_connection)):
     """ 
     Login endpoint for the NYPD Citation system.
@@ -18,6 +67,9 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(),
     - Drivers: Authenticate with license number only (no password required)
     - Officers: Authenticate with badge number and password
     
+    Officer passwords are verified in the password hashing process pool, and hashes with
+    an outdated cost are upgraded on a successful login.
+    
     Args:
         form_data: OAuth2PasswordRequestForm with username and password
         connection: Database connection dependency
@@ -26,82 +78,68 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(),
         dict: Access token and token type
     
     Raises:
-        HTTPException: If credentials are invalid (401)
+        HTTPException: If credentials are invalid (401) or too many logins are in progress (503)
     """
     
     user = None
-    user_type = None
-    
-    # Step 1: Try to authenticate as an Officer (Badge Number)
-    # Officers require badge number AND password
-    officer_query = "SELECT * FROM Officer WHERE Badge_Number = %s"
     
-    try:
-        user = database.execute_query(connection, officer_query, (form_data.username,), fetch="one")
+    # Step 1: Find the officer and driver accounts for the username with a single query
+    async for candidate in find_login_candidates(connection, form_data.username):
         
-        # Verify officer password
-        if user and auth.verify_password(form_data.password, user.get('Secret_Hash', '')):
-            user_type = "officer"
-        else:
-            user = None
-    except HTTPException:
-        # Officer not found, try driver
-        user = None
-    
-    # Step 2: If not an officer, try to authenticate as a Driver (License Number)
-    # Drivers only need license number (password is ignored)
-    if user is None:
-        driver_query = "SELECT * FROM Driver WHERE License_Number = %s"
+        # Step 2: Officers require badge number AND password, verified off the event loop
+        if candidate['User_Type'] == 'officer':
+            valid, new_hash = await auth.verify_password_async(form_data.password, candidate['Secret_Hash'])
+            if not valid:
+                continue
+            if new_hash:
+                await rehash_officer_password(connection, candidate, new_hash)
         
-        try:
-            user = database.execute_query(connection, driver_query, (form_data.username,), fetch="one")
-            # Driver authentication succeeds if license number exists
-            if user:
-                user_type = "driver"
-        except HTTPException:
-            # Driver not found either
-            user = None
-    
-    # Step 3: If no user found, return 401
-    if user is None or user_type is None:
+        # Step 3: Drivers only need license number (password is ignored)
+        user = candidate
+        break
+    
+    # Step 4: If no user found, return 401
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"}
         )
     
-    # Step 4: Create access token with user type and ID
-    user_id = user.get('Badge_Number') if user_type == 'officer' else user.get('License_Number')
-    
+    # Step 5: Create access token with user type and ID, plus the row ID so routers
+    # do not have to look the user up again on every request
+    user_type = user['User_Type']
+    id_claim = "Officer_ID" if user_type == 'officer' else "Driver_ID"
     access_token = auth.create_access_token(
         data={
-            "sub": str(user_id),
-            "user_type": user_type
+            "sub": str(user['Username']),
+            "user_type": user_type,
+            id_claim: user['User_ID']
         }
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.put("", response_model=models.Token)
-def refresh_token(current_user: str = Depends(auth.verify_token)):
+async def refresh_token(principal: models.Principal = Depends(auth.get_current_principal)):
     """ 
     Refresh access token endpoint for the NYPD Citation system.
     
-    Allows authenticated users to get a fresh access token.
+    Allows authenticated users to get a fresh access token with the same claims.
     
     Args:
-        current_user: Current authenticated user
+        principal: Current authenticated user
     
     Returns:
         dict: New access token and token type
     """
     
-    # Issue a new access token for the current user
-    access_token = auth.create_access_token(data={"sub": current_user})
+    # Issue a new access token for the current user, keeping its user type and ID
+    access_token = auth.create_access_token(data=auth.principal_claims(principal))
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.delete("", status_code=status.HTTP_204_NO_CONTENT)
-def logout(current_user: str = Depends(auth.verify_token)):
+async def logout(current_user: str = Depends(auth.verify_token)):
     """ 
     Logout endpoint for the NYPD Citation system.
     
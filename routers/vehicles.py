@@ -2,115 +2,110 @@
 # FastAPI application for New York Police Department Citation system - Vehicle endpoints.
 # =========================================================
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 import auth
-import database.database as database, models as models
-from typing import List
+import cache
+import database.async_database as database, models as models
+import pagination
+import versions
+from json_responses import TrustedJSONResponse
 
 router = APIRouter(prefix="/vehicles", tags=["Vehicles"])
 
-@router.get("/", response_model=List[models.VehicleResponse])
-def read_all_vehicles(
-    connection=Depends(database.get_db_connection),
-    current_user: str=Depends(auth.verify_token)):
-    """ Retrieve a list of all vehicles. """
+@router.get("/", response_model=models.Page[models.VehicleResponse])
+async def read_all_vehicles(
+    limit: int = Query(pagination.DEFAULT_LIMIT, ge=1, le=pagination.MAX_LIMIT),
+    cursor: str | None = None,
+    current_user: str=Depends(auth.verify_token),
+    etag: str=Depends(versions.conditional("Vehicle")),
+    connection=Depends(database.get_db_connection)):
+    """ Retrieve a page of vehicles ordered by VIN, answering If-None-Match with 304 when no vehicle changed. """
+    
+    # Resume after the last VIN of the previous page
+    last_vin = pagination.decode_cursor(cursor, 1)[0] if cursor else ""
     
-    query = "SELECT * FROM Vehicle"
+    query = "SELECT * FROM Vehicle WHERE VIN > %s ORDER BY VIN LIMIT %s"
     
-    return database.execute_query(connection, query)
+    results = await database.execute_query(connection, query, (last_vin, limit + 1))
+    rows, next_cursor = pagination.paginate(results, limit, lambda row: (row['VIN'],))
+    
+    # Rows come straight from the table, so skip re-validating them against the response model
+    return TrustedJSONResponse({"items": rows, "next_cursor": next_cursor}, headers={"ETag": etag})
 
 @router.get("/{vin}", response_model=models.VehicleResponse)
-def read_vehicle(
+async def read_vehicle(
     vin: str, 
     connection=Depends(database.get_db_connection),
     current_user: str=Depends(auth.verify_token)):
     """ Retrieve a vehicle by its VIN. """
     
-    query = "SELECT * FROM Vehicle WHERE VIN = %s"
+    vehicle = await cache.get_vehicle(connection, vin)
+    if vehicle is None:
+        raise HTTPException(status_code=404, detail="Record not found")
     
-    return database.execute_query(connection, query, (vin,), fetch="one")
+    return vehicle
 
 @router.post("/", response_model=models.VehicleResponse, status_code=201)
-def create_vehicle(
+async def create_vehicle(
     vehicle: models.VehicleCreate, 
     connection=Depends(database.get_db_connection),
     current_user: str=Depends(auth.verify_token)):
     """ Create a new vehicle record. """
     
-    try:
-        # Check if vehicle with this VIN already exists
-        existing = database.execute_query(
-            connection, 
-            "SELECT * FROM Vehicle WHERE VIN = %s", 
-            (vehicle.VIN,), 
-            fetch="one"
+    # Check if vehicle with this VIN already exists
+    if await cache.get_vehicle(connection, vehicle.VIN):
+        raise HTTPException(
+            status_code=400, 
+            detail="A vehicle with this VIN already exists"
         )
-        if existing:
-            raise HTTPException(
-                status_code=400, 
-                detail="A vehicle with this VIN already exists"
-            )
-    except HTTPException as e:
-        if e.status_code == 400:
-            raise e
-        # If 404 (not found), that's good - continue
-        pass
     
     try:
         # Create the new vehicle
-        database.execute_insert(
+        await database.execute_insert(
             connection,
             "INSERT INTO Vehicle (VIN, Make, Model, Color, License_Plate, License_State) VALUES (%s, %s, %s, %s, %s, %s)",
             (vehicle.VIN, vehicle.Make, vehicle.Model, vehicle.Color, vehicle.License_Plate, vehicle.License_State)
         )
+        cache.invalidate_vehicle(vehicle.VIN)
+        versions.bump("Vehicle")
         
         # Retrieve and return the newly created vehicle
-        return database.execute_query(connection, "SELECT * FROM Vehicle WHERE VIN = %s", (vehicle.VIN,), fetch="one")
+        return await database.execute_query(connection, "SELECT * FROM Vehicle WHERE VIN = %s", (vehicle.VIN,), fetch="one")
     
     except Exception as err:
         raise HTTPException(status_code=500, detail=f"Database error: {err}")
 
 @router.post("/register", response_model=models.VehicleResponse, status_code=201)
-def register_vehicle(
+async def register_vehicle(
     vehicle: models.VehicleCreate, 
     connection=Depends(database.get_db_connection)):
     """ Register a new vehicle without authentication. """
     
-    try:
-        # Check if vehicle with this VIN already exists
-        existing = database.execute_query(
-            connection, 
-            "SELECT * FROM Vehicle WHERE VIN = %s", 
-            (vehicle.VIN,), 
-            fetch="one"
+    # Check if vehicle with this VIN already exists
+    if await cache.get_vehicle(connection, vehicle.VIN):
+        raise HTTPException(
+            status_code=400, 
+            detail="A vehicle with this VIN already exists"
         )
-        if existing:
-            raise HTTPException(
-                status_code=400, 
-                detail="A vehicle with this VIN already exists"
-            )
-    except HTTPException as e:
-        if e.status_code == 400:
-            raise e
-        # If 404 (not found), that's good - continue
-        pass
     
     try:
         # Create the new vehicle
-        database.execute_insert(
+        await database.execute_insert(
             connection,
             "INSERT INTO Vehicle (VIN, Make, Model, Color, License_Plate, License_State) VALUES (%s, %s, %s, %s, %s, %s)",
             (vehicle.VIN, vehicle.Make, vehicle.Model, vehicle.Color, vehicle.License_Plate, vehicle.License_State)
         )
+        cache.invalidate_vehicle(vehicle.VIN)
+        versions.bump("Vehicle")
         
         # Retrieve and return the newly created vehicle
-        return database.execute_query(connection, "SELECT * FROM Vehicle WHERE VIN = %s", (vehicle.VIN,), fetch="one")
+        return await database.execute_query(connection, "SELECT * FROM Vehicle WHERE VIN = %s", (vehicle.VIN,), fetch="one")
     
     except Exception as err:
         raise HTTPException(status_code=500, detail=f"Database error: {err}")
 
 @router.put("/{vin}", status_code=204)
-def update_vehicle(
+async def update_vehicle(
     vin: str,
     vehicle: models.VehicleCreate,
     connection=Depends(database.get_db_connection),
@@ -118,29 +113,34 @@ def update_vehicle(
     """ Update a vehicle record. """
     
     # Check if the vehicle exists
-    database.execute_query(connection, "SELECT * FROM Vehicle WHERE VIN = %s", (vin,), fetch="one")
+    if await cache.get_vehicle(connection, vin) is None:
+        raise HTTPException(status_code=404, detail="Record not found")
     
     try:
         # Update the vehicle
-        database.execute_insert(
+        await database.execute_insert(
             connection,
             "UPDATE Vehicle SET Make = %s, Model = %s, Color = %s, License_Plate = %s, License_State = %s WHERE VIN = %s",
             (vehicle.Make, vehicle.Model, vehicle.Color, vehicle.License_Plate, vehicle.License_State, vin)
         )
+        cache.invalidate_vehicle(vin)
+        versions.bump("Vehicle")
     except Exception as err:
         raise HTTPException(status_code=500, detail=f"Database error: {err}")
 
 @router.delete("/{vin}", status_code=204)
-def delete_vehicle(
+async def delete_vehicle(
     vin: str, 
     connection=Depends(database.get_db_connection),
     current_user: str=Depends(auth.verify_token)):
-    cursor = connection.cursor()
+    cursor = await connection.cursor()
     try:
-        cursor.execute("DELETE FROM Vehicle WHERE VIN = %s", (vin,))
-        connection.commit()
+        await cursor.execute("DELETE FROM Vehicle WHERE VIN = %s", (vin,))
+        await connection.commit()
+        cache.invalidate_vehicle(vin)
+        versions.bump("Vehicle")
     except Exception as err:
-        connection.rollback()
+        await connection.rollback()
         # Check for the specific Foreign Key restrict error
         if "1451" in str(err):
             raise HTTPException(
@@ -149,6 +149,6 @@ def delete_vehicle(
             )
         raise HTTPException(status_code=500, detail=f"Database error: {err}")
     finally:
-        cursor.close()
+        await cursor.close()
 
 # end of vehicles.py
\ No newline at end of file
@@ -0,0 +1,46 @@
+# violations.py
+# FastAPI application for New York Police Department Citation system - Violation catalog endpoints.
+# Violations are served from the in-memory catalog rather than the Violation table.
+# =========================================================
+
+from fastapi import APIRouter, Depends, HTTPException
+import auth
+import database.async_database as database, models as models
+from json_responses import TrustedJSONResponse
+from typing import List
+import versions
+from violation_catalog import catalog
+
+router = APIRouter(prefix="/violations", tags=["Violations"])
+
+@router.get("/", response_model=List[models.ViolationResponse])
+async def read_all_violations(
+    connection=Depends(database.get_db_connection),
+    current_user: str=Depends(auth.verify_token)):
+    """ Retrieve every violation code and description from the catalog. """
+    
+    await catalog.ensure_loaded(connection)
+    
+    # The catalog is loaded from the Violation table, so skip re-validating it against the response model
+    return TrustedJSONResponse(catalog.all())
+
+@router.get("/stats")
+async def read_catalog_stats(current_user: str=Depends(auth.verify_token)):
+    """ Retrieve the size and hit/miss counters of the violation catalog. """
+    
+    return catalog.stats()
+
+@router.post("/reload", status_code=204)
+async def reload_violations(
+    connection=Depends(database.get_db_connection),
+    principal: models.Principal=Depends(auth.get_current_principal)):
+    """ Reload the violation catalog after the Violation table has changed. Officers only. """
+    
+    # A reload bumps the Violation version, which invalidates every citation ETag
+    if principal.user_type != 'officer':
+        raise HTTPException(status_code=403, detail="Only officers can reload the violation catalog")
+    
+    await catalog.reload(connection)
+    versions.bump("Violation")
+
+# end of violations.py
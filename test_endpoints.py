@@ -49,7 +49,7 @@ if token:
     response = requests.get(f"{API_BASE}/drivers/", headers=headers)
     print(f"Status: {response.status_code}")
     if response.status_code == 200:
-        drivers = response.json()
+        drivers = response.json()['items']
         print(f"✅ Got {len(drivers)} drivers")
         for driver in drivers:
             print(f"  - ID: {driver['Driver_ID']}, "
@@ -0,0 +1,433 @@
+# test_query_plans.py
+# Query plan regression checks for the SQL issued by the routers.
+# Every SQL statement in the routers (and the caches they use) is pulled from the source,
+# run through EXPLAIN FORMAT=JSON against a seeded local MySQL and checked for full table
+# scans, filesorts and temporary tables touching more rows than the agreed threshold.
+# Plans are also compared with the snapshots in database/query_plans.json, so plan changes
+# show up in review next to the code that caused them. The snapshot file must be committed:
+# without it (and without --update) the check fails instead of comparing against nothing.
+#
+#   python test_query_plans.py            check plans (skipped when MySQL is not reachable)
+#   python test_query_plans.py --update   rewrite the snapshots after reviewing a plan change
+#
+# Exits 0 when every plan passed, 1 on problems and 77 when the plans could not be checked
+# (not on MySQL, MySQL not reachable or not seeded), so CI can tell a skip from a pass.
+#
+# Seed the database first (e.g. python -m database.migrate --seed examples, or a larger
+# synthetic data set) so the optimizer sees realistic table sizes.
+# =========================================================
+
+import argparse
+import ast
+import importlib
+import json
+import os
+import re
+import sys
+
+import mysql.connector
+from fastapi import HTTPException
+
+import database.database as database
+from database import change_feed, read_model, rollups
+from routers import citations
+
+# Files whose SQL is checked, as module names
+SOURCES = [
+    "routers.citations", "routers.drivers", "routers.notices", "routers.tokens",
+    "routers.vehicles", "routers.violations", "routers.stats", "cache", "violation_catalog",
+]
+
+SNAPSHOT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database", "query_plans.json")
+
+# Exit statuses, 77 is the conventional "skipped" status of test harnesses
+EXIT_PASSED = 0
+EXIT_FAILED = 1
+EXIT_SKIPPED = 77
+
+# Scans, filesorts and temporary tables are only reported past this many estimated rows
+ROW_THRESHOLD = int(os.getenv("PLAN_ROW_THRESHOLD", "1000"))
+
+SQL_START = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE)\s")
+
+# How to EXPLAIN each statement: a list of variants, each with values for the f-string
+# placeholders that are local variables, the sample parameter names, and the checks the
+# statement is allowed to fail (e.g. an export is a deliberate full scan).
+# A statement is listed under one of the ids it is found at ("module.function#n" or "module.CONSTANT").
+KEYSET_WHERE = f"WHERE {citations.CITATION_KEYSET}"
+KEYSET_AND = f"AND {citations.CITATION_KEYSET}"
+CHANGES_BY_LICENSE = {"license_join": "AND cv.License_Number = %s", "license_filter": "AND cl.License_Number = %s"}
+
+PLAN_SPECS = {
+    "routers.citations.read_all_citations#0": [
+        ({"keyset": ""}, ["page_size"], set()),
+        ({"keyset": KEYSET_WHERE}, ["last_date", "last_date", "notice_id", "page_size"], set()),
+    ],
+    "routers.citations.read_driver_citations#0": [
+        ({"keyset": ""}, ["license", "page_size"], set()),
+        ({"keyset": KEYSET_AND}, ["license", "last_date", "last_date", "notice_id", "page_size"], set()),
+    ],
+    "routers.citations.read_citation_changes#0": [
+        ({"license_join": "", "license_filter": ""}, ["zero", "page_size"], set()),
+        (CHANGES_BY_LICENSE, ["license", "zero", "license", "page_size"], set()),
+    ],
+    # The FTS5 statement only runs on SQLite, MySQL orders the full-text matches by relevance
+    "routers.citations.search_query#0": [],
+    "routers.citations.search_query#1": [
+        ({"filters": ""}, ["search", "search", "page_size", "zero"], {"filesort"}),
+        ({"filters": "AND cv.Badge_Number = %s"}, ["search", "search", "badge", "page_size", "zero"], {"filesort"}),
+    ],
+    "routers.citations.stream_citations#0": [({}, [], {"full_scan"})],
+    "routers.citations.create_citation#0": [({}, ["text", "text", "text", "date", "license", "state"], set())],
+    "routers.citations.create_citation#1": [({}, ["date", "time", "text", "driver_id", "officer_id"], {"full_scan"})],
+    "routers.citations.create_citation#2": [({}, ["notice_id", "code"], set())],
+    "routers.citations.create_citations_batch#0": [({}, [], {"full_scan"})],
+    "routers.citations.create_citations_batch#1": [({}, ["text", "text", "text", "date", "license", "state"], set())],
+    "routers.citations.create_citations_batch#2": [({}, ["date", "time", "text", "driver_id", "officer_id", "vin"], set())],
+    "routers.citations.create_citations_batch#3": [({}, ["notice_id", "notice_id", "officer_id"], set())],
+    "routers.citations.create_citations_batch#4": [({}, ["notice_id", "code"], set())],
+    "routers.citations.find_driver_ids#0": [({"placeholders": "%s, %s"}, ["license", "license"], set())],
+    "routers.drivers.register_driver#0": [({}, ["text", "text", "text", "date", "license", "state"], set())],
+    "routers.drivers.register_driver#1": [({}, ["driver_id"], set())],
+    "routers.drivers.read_all_drivers#0": [({}, ["zero", "page_size"], set())],
+    "routers.drivers.update_driver_address#0": [({}, ["text", "driver_id"], set())],
+    "routers.drivers.delete_driver#1": [({}, ["driver_id"], set())],
+    "routers.notices.read_notices_by_officer#0": [({}, ["badge"], set())],
+    "routers.notices.create_correction_notice#0": [({}, ["date", "time", "text", "driver_id", "officer_id", "vin"], set())],
+    "routers.notices.create_correction_notice#2": [({}, ["notice_id"], set())],
+    "routers.notices.update_correction_notice#0": [({}, ["notice_id"], set())],
+    "routers.notices.update_correction_notice#1": [({}, ["date", "time", "text", "driver_id", "officer_id", "vin", "notice_id"], set())],
+    "routers.notices.update_correction_notice#2": [({}, ["notice_id"], set())],
+    "routers.notices.delete_correction_notice#0": [({}, ["notice_id"], set())],
+    "routers.notices.delete_correction_notice#1": [({}, ["notice_id"], set())],
+    "routers.tokens.LOGIN_QUERY": [({}, ["badge", "badge"], set())],
+    "routers.tokens.rehash_officer_password#0": [({}, ["text", "officer_id"], set())],
+    "routers.vehicles.read_all_vehicles#0": [({}, ["empty", "page_size"], set())],
+    "routers.vehicles.create_vehicle#0": [({}, ["vin", "text", "text", "text", "text", "state"], set())],
+    "routers.vehicles.create_vehicle#1": [({}, ["vin"], set())],
+    "routers.vehicles.update_vehicle#0": [({}, ["text", "text", "text", "text", "state", "vin"], set())],
+    "routers.vehicles.delete_vehicle#0": [({}, ["vin"], set())],
+    "routers.stats.TOP_BUCKETS": [({}, ["dimension", "first_period", "last_period", "page_size"], {"filesort", "temporary"})],
+    "routers.stats.read_daily_stats#0": [({}, ["first_period", "last_period"], set())],
+    "routers.stats.read_officer_stats#0": [
+        ({}, ["dimension", "first_period", "last_period", "page_size"], {"filesort", "temporary"}),
+    ],
+    "cache.get_officer#0": [({}, ["badge"], set())],
+    "cache.get_driver#0": [({}, ["license"], set())],
+    "read_model.refresh_notices": [({}, ["notice_id", "notice_id"], set())],
+    "change_feed.LOCK_QUERY": [({}, [], set())],
+    "change_feed.record": [({}, ["notice_id", "notice_id"], set())],
+    # The counters of one notice, grouped per dimension before they are added
+    "rollups.add_notices": [({}, ["one"] + ["notice_id", "notice_id"] * 4, {"temporary"})],
+    # The whole Violation table is the catalog
+    "violation_catalog.CATALOG_QUERY": [({}, [], {"full_scan", "filesort"})],
+}
+
+# SQL issued through helpers rather than written in the router files
+EXTRA_STATEMENTS = {
+    "read_model.refresh_notices": read_model.REFRESH_QUERY.format(where="WHERE cn.Notice_ID IN ({placeholders})").replace(
+        "{placeholders}", "%s, %s"
+    ),
+    "change_feed.LOCK_QUERY": change_feed.LOCK_QUERY,
+    "change_feed.record": change_feed.RECORD_QUERY.format(where="WHERE cv.Notice_ID IN (%s, %s)"),
+    "rollups.add_notices": rollups.APPLY_QUERY.format(where="WHERE cn.Notice_ID IN (%s, %s)"),
+}
+
+# ========================================================
+# --- Statement extraction ---
+
+def is_sql(text):
+    return bool(SQL_START.match(text))
+
+def render(node, namespace, local_values):
+    """ Return the text of a string or f-string node, resolving placeholders from locals or the module. """
+    if isinstance(node, ast.Constant):
+        return node.value
+
+    parts = []
+    for value in node.values:
+        if isinstance(value, ast.Constant):
+            parts.append(value.value)
+            continue
+        name = ast.unparse(value.value)
+        if name in local_values:
+            parts.append(local_values[name])
+        elif name in namespace and isinstance(namespace[name], str):
+            parts.append(namespace[name])
+        else:
+            raise KeyError(name)
+    return "".join(parts)
+
+def extract(module_name):
+    """ Yield (statement id, node, module namespace) for every SQL string in a module. """
+    module = importlib.import_module(module_name)
+    with open(module.__file__, encoding="utf-8") as source_file:
+        tree = ast.parse(source_file.read())
+    namespace = vars(module)
+
+    for node in tree.body:
+        # Module level SQL constants
+        if isinstance(node, ast.Assign) and isinstance(node.value, (ast.Constant, ast.JoinedStr)):
+            text = node.value.value if isinstance(node.value, ast.Constant) else ast.unparse(node.value)
+            if isinstance(text, str) and is_sql(text.lstrip("f\"'")):
+                yield f"{module_name}.{node.targets[0].id}", node.value, namespace
+
+        # SQL strings inside functions, numbered in source order
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            fstring_parts = {
+                id(part) for joined in ast.walk(node) if isinstance(joined, ast.JoinedStr) for part in joined.values
+            }
+            found = [
+                child for child in ast.walk(node)
+                if id(child) not in fstring_parts and (
+                    (isinstance(child, ast.Constant) and isinstance(child.value, str) and is_sql(child.value))
+                    or (isinstance(child, ast.JoinedStr) and child.values and isinstance(child.values[0], ast.Constant)
+                        and is_sql(child.values[0].value))
+                )
+            ]
+            found.sort(key=lambda child: (child.lineno, child.col_offset))
+            for number, child in enumerate(found):
+                yield f"{module_name}.{node.name}#{number}", child, namespace
+
+def collect_statements():
+    """ Return {normalized SQL: {"ids": [...], "node": ..., "namespace": ...}} for every statement. """
+    statements = {}
+    for module_name in SOURCES:
+        for statement_id, node, namespace in extract(module_name):
+            if isinstance(node, ast.Constant):
+                key = " ".join(node.value.split())
+            else:
+                key = " ".join(ast.unparse(node).split())
+            entry = statements.setdefault(key, {"ids": [], "node": node, "namespace": namespace})
+            entry["ids"].append(statement_id)
+
+    for statement_id, sql in EXTRA_STATEMENTS.items():
+        statements[" ".join(sql.split())] = {"ids": [statement_id], "node": ast.Constant(sql), "namespace": {}}
+    return statements
+
+def spec_for(entry):
+    """ Return the PLAN_SPECS id and variants of a statement, or (None, None) if it has none. """
+    for statement_id in entry["ids"]:
+        if statement_id in PLAN_SPECS:
+            return statement_id, PLAN_SPECS[statement_id]
+    return None, None
+
+# --- End of Statement extraction ---
+# ========================================================
+# --- Plan inspection ---
+
+def sample_values(connection):
+    """ Pick parameter values that exist in the seeded database, favouring the busiest officer and driver. """
+    officer = database.execute_query(connection, """
+        SELECT o.Officer_ID, o.Badge_Number FROM Correction_Notice cn
+        JOIN Officer o ON cn.Officer_ID = o.Officer_ID
+        GROUP BY o.Officer_ID ORDER BY COUNT(*) DESC LIMIT 1
+    """, fetch="one")
+    driver = database.execute_query(connection, """
+        SELECT d.Driver_ID, d.License_Number FROM Correction_Notice cn
+        JOIN Driver d ON cn.Driver_ID = d.Driver_ID
+        GROUP BY d.Driver_ID ORDER BY COUNT(*) DESC LIMIT 1
+    """, fetch="one")
+    notice = database.execute_query(connection, """
+        SELECT Notice_ID, Violation_Date, VIN FROM Correction_Notice ORDER BY Notice_ID DESC LIMIT 1
+    """, fetch="one")
+    return {
+        "badge": officer["Badge_Number"],
+        "officer_id": officer["Officer_ID"],
+        "license": driver["License_Number"],
+        "driver_id": driver["Driver_ID"],
+        "notice_id": notice["Notice_ID"],
+        "last_date": notice["Violation_Date"],
+        "date": notice["Violation_Date"],
+        "vin": notice["VIN"],
+        "time": "12:00:00",
+        "code": "OTHER",
+        "text": "Plan check",
+        "state": "NY",
+        "page_size": 101,
+        "zero": 0,
+        "empty": "",
+        "search": "+ave*",
+        "one": 1,
+        "dimension": "location",
+        "first_period": "0000",
+        "last_period": "9999",
+    }
+
+def needs_plan(sql):
+    """ Plain INSERT ... VALUES statements touch no existing rows, so there is nothing to plan. """
+    return not (sql.lstrip().upper().startswith("INSERT") and "SELECT" not in sql.upper())
+
+def explain(connection, sql, params):
+    """ Return the EXPLAIN FORMAT=JSON plan of a statement as a dict. """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("EXPLAIN FORMAT=JSON " + sql, params)
+        return json.loads(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+
+def max_rows(node):
+    """ Return the largest per-scan row estimate of any table under a plan node. """
+    if isinstance(node, list):
+        return max((max_rows(child) for child in node), default=0)
+    if not isinstance(node, dict):
+        return 0
+    rows = 0
+    if isinstance(node.get("table"), dict):
+        rows = int(node["table"].get("rows_examined_per_scan", 0))
+    return max([rows] + [max_rows(child) for child in node.values()])
+
+def summarize(plan):
+    """ Reduce a plan to what the snapshot keeps and the checks need. """
+    accesses = []
+    flags = []
+
+    def walk(node):
+        if isinstance(node, list):
+            for child in node:
+                walk(child)
+            return
+        if not isinstance(node, dict):
+            return
+        if isinstance(node.get("table"), dict):
+            table = node["table"]
+            accesses.append({
+                "table": table.get("table_name"),
+                "access_type": table.get("access_type"),
+                "key": table.get("key"),
+                "rows": int(table.get("rows_examined_per_scan", 0)),
+            })
+        for flag, name in (("using_filesort", "filesort"), ("using_temporary_table", "temporary")):
+            if node.get(flag):
+                flags.append({"flag": name, "rows": max_rows(node)})
+        for child in node.values():
+            walk(child)
+
+    walk(plan)
+    return accesses, flags
+
+def problems(accesses, flags, allowed):
+    """ Return the threshold violations of a plan. """
+    found = []
+    for access in accesses:
+        if access["access_type"] == "ALL" and access["rows"] > ROW_THRESHOLD and "full_scan" not in allowed:
+            found.append(f"full scan of {access['table']} (~{access['rows']} rows)")
+    for flag in flags:
+        if flag["rows"] > ROW_THRESHOLD and flag["flag"] not in allowed:
+            found.append(f"{flag['flag']} over ~{flag['rows']} rows")
+    return found
+
+def snapshot(accesses, flags):
+    """ Row estimates drift with the data, so snapshots only keep the shape of the plan. """
+    return {
+        "tables": [{key: access[key] for key in ("table", "access_type", "key")} for access in accesses],
+        "flags": sorted({flag["flag"] for flag in flags}),
+    }
+
+# --- End of Plan inspection ---
+# ========================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the query plans of the router SQL.")
+    parser.add_argument("--update", action="store_true", help="Rewrite the plan snapshots")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Query plan checks")
+    print("=" * 60)
+
+    statements = collect_statements()
+    failures = []
+
+    # Every statement needs a spec, so new SQL cannot skip the checks
+    for entry in statements.values():
+        statement_id, _ = spec_for(entry)
+        if statement_id is None and needs_plan(entry["node"].value if isinstance(entry["node"], ast.Constant) else ast.unparse(entry["node"])):
+            failures.append(f"no PLAN_SPECS entry for {', '.join(entry['ids'])}")
+
+    # A missing snapshot file would otherwise compare every plan against nothing and pass
+    if not args.update and not os.path.exists(SNAPSHOT_FILE):
+        failures.append(f"{os.path.relpath(SNAPSHOT_FILE)} is missing, generate it on a seeded MySQL with --update and commit it")
+
+    # The plans and snapshots are MySQL's, EXPLAIN FORMAT=JSON has no SQLite counterpart
+    if database.DATABASE_BACKEND != "mysql":
+        print(f"SKIPPED: plans are only checked on MySQL, DATABASE_BACKEND is {database.DATABASE_BACKEND}")
+        for failure in failures:
+            print(f"X {failure}")
+        return EXIT_FAILED if failures else EXIT_SKIPPED
+
+    try:
+        pool = database.init_pool()
+        connection = pool.acquire()
+    except Exception as e:
+        print(f"SKIPPED: MySQL not reachable ({e})")
+        for failure in failures:
+            print(f"X {failure}")
+        return EXIT_FAILED if failures else EXIT_SKIPPED
+
+    # None when the file is missing, already reported above
+    snapshots = None
+    if os.path.exists(SNAPSHOT_FILE):
+        with open(SNAPSHOT_FILE, encoding="utf-8") as snapshot_file:
+            snapshots = json.load(snapshot_file)
+    new_snapshots = {}
+
+    try:
+        try:
+            values = sample_values(connection)
+        except HTTPException:
+            print("SKIPPED: no correction notices, seed the database first")
+            for failure in failures:
+                print(f"X {failure}")
+            return EXIT_FAILED if failures else EXIT_SKIPPED
+
+        for entry in statements.values():
+            statement_id, variants = spec_for(entry)
+            if statement_id is None:
+                continue
+
+            for number, (local_values, names, allowed) in enumerate(variants):
+                label = statement_id if len(variants) == 1 else f"{statement_id}[{number}]"
+                sql = render(entry["node"], entry["namespace"], local_values)
+                if not needs_plan(sql):
+                    continue
+
+                try:
+                    accesses, flags = summarize(explain(connection, sql, tuple(values[name] for name in names)))
+                except mysql.connector.Error as err:
+                    failures.append(f"{label}: EXPLAIN failed: {err}")
+                    continue
+
+                new_snapshots[label] = snapshot(accesses, flags)
+                issues = problems(accesses, flags, allowed)
+                if not args.update and snapshots is not None:
+                    if label not in snapshots:
+                        issues.append("no snapshot, review the plan and run with --update")
+                    elif snapshots[label] != new_snapshots[label]:
+                        issues.append("plan differs from snapshot")
+
+                print(f"{'X' if issues else '/'} {label}")
+                for issue in issues:
+                    print(f"    {issue}")
+                    failures.append(f"{label}: {issue}")
+        connection.commit()
+    finally:
+        pool.release(connection)
+        database.close_pool()
+
+    if args.update:
+        with open(SNAPSHOT_FILE, "w", encoding="utf-8") as snapshot_file:
+            json.dump(new_snapshots, snapshot_file, indent=2, sort_keys=True)
+            snapshot_file.write("\n")
+        print(f"Wrote {len(new_snapshots)} plan snapshots to {SNAPSHOT_FILE}")
+
+    print("\n" + "=" * 60)
+    print(f"{len(failures)} problem(s)" if failures else "All query plans within thresholds")
+    return EXIT_FAILED if failures else EXIT_PASSED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# end of test_query_plans.py
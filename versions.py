@@ -0,0 +1,68 @@
+# versions.py
+# Per-table change versions and conditional GET support for the NYPD Citation system.
+# Every write route bumps the version of the tables it changed, list routes derive a strong
+# ETag from the versions of the tables they read and answer If-None-Match with 304 before a
+# database connection is taken.
+#
+# The counters live in process memory: they are only correct with a single API worker and
+# when all writes go through this API. With several workers or outside writers, ETags can
+# stay the same after a change made elsewhere.
+# =========================================================
+
+import hashlib
+import threading
+import uuid
+from fastapi import HTTPException, Request, Response
+
+# Changes on every start so ETags from a previous process never match
+_epoch = uuid.uuid4().hex
+_versions = {}
+_lock = threading.Lock()
+
+# Tables read by the citation views
+CITATION_TABLES = ("Correction_Notice", "Notice_Violation", "Driver", "Officer", "Violation")
+
+def bump(*tables):
+    """ Record that the given tables changed. """
+    with _lock:
+        for table in tables:
+            _versions[table] = _versions.get(table, 0) + 1
+
+def current(*tables):
+    """ Return the current version of each table. """
+    with _lock:
+        return tuple(_versions.get(table, 0) for table in tables)
+
+def etag_for(request, tables):
+    """ Return a strong ETag for a request, changing whenever one of the tables or the query changes. """
+    key = "|".join([_epoch, request.url.path, str(sorted(request.query_params.multi_items())), repr(current(*tables))])
+    return '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+def matches(if_none_match, etag):
+    """ Return True if an If-None-Match header value matches etag. """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    candidates = [value.strip().removeprefix("W/") for value in if_none_match.split(",")]
+    return etag in candidates
+
+def conditional(*tables):
+    """
+    Build a dependency adding an ETag to the response of a list route.
+
+    Declare it before the database connection dependency, so a matching If-None-Match is
+    answered with 304 without taking a connection. The dependency returns the ETag, routes
+    returning a Response themselves must add it to that response's headers.
+    """
+    async def check(request: Request, response: Response):
+        etag = etag_for(request, tables)
+        if matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        return etag
+    return check
+
+# end of versions.py
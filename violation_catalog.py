@@ -0,0 +1,197 @@
+# violation_catalog.py
+# In-memory catalog of the Violation table for the NYPD Citation system.
+# The Violation table is small and rarely changes, so it is loaded once per process and
+# description matching is answered from a trigram index instead of a LIKE '%...%' scan.
+# =========================================================
+
+import asyncio
+import os
+import re
+import time
+import database.async_database as database
+
+# Reload the catalog after this many seconds, 0 keeps it until it is explicitly invalidated
+CATALOG_MAX_AGE = float(os.getenv("VIOLATION_CATALOG_MAX_AGE", "0"))
+
+CATALOG_QUERY = "SELECT Violation_Code, Violation_Description FROM Violation ORDER BY Violation_Code"
+
+# Match ranks, lower is better. Ties are broken by Violation_Code so results are deterministic.
+RANK_CODE = 0
+RANK_EXACT = 1
+RANK_PREFIX = 2
+RANK_WORD = 3
+RANK_SUBSTRING = 4
+RANK_TOKENS = 5
+
+def tokenize(text):
+    """ Split text into lowercase alphanumeric tokens. """
+    return re.findall(r"[a-z0-9]+", (text or "").lower())
+
+def trigrams(text):
+    """ Return the set of character trigrams of a lowercase string. """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ViolationCatalog:
+    """
+    Process-level index over the Violation table.
+
+    Supports exact code lookup and description matching equivalent to
+    Violation_Description LIKE '%text%' (case-insensitive), with a token fallback
+    for words given in a different order. Counts hits, misses and reloads.
+    """
+
+    def __init__(self, max_age=CATALOG_MAX_AGE):
+        self.max_age = max_age
+        self._reload_lock = asyncio.Lock()
+        self._set_index([])
+        self._loaded_at = None
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    # ========================================================
+    # --- Loading and invalidation ---
+
+    def load(self, rows):
+        """ Replace the catalog with rows of Violation_Code / Violation_Description. """
+        self._set_index(rows)
+        self._loaded_at = time.monotonic()
+        self.reloads += 1
+
+    async def reload(self, connection):
+        """ Reload the catalog from the Violation table. """
+        async with self._reload_lock:
+            rows = await database.execute_query(connection, CATALOG_QUERY)
+            self.load(rows)
+
+    async def ensure_loaded(self, connection):
+        """ Load the catalog if it has never been loaded, was invalidated or is older than max_age. """
+        if self._loaded_at is None or (self.max_age and time.monotonic() - self._loaded_at > self.max_age):
+            await self.reload(connection)
+
+    def invalidate(self):
+        """ Mark the catalog stale so the next ensure_loaded() reloads it. """
+        self._loaded_at = None
+
+    # --- End of Loading and invalidation ---
+    # ========================================================
+    # --- Lookups ---
+
+    def get(self, code):
+        """ Return the description for a violation code, or None if the code is unknown. """
+        description = self._by_code.get(code)
+        self._count(description is not None)
+        return description
+
+    def all(self):
+        """ Return every violation as a list of dicts ordered by code. """
+        return [
+            {"Violation_Code": code, "Violation_Description": description}
+            for code, description, _ in self._entries
+        ]
+
+    def match(self, text):
+        """ Return the best matching violation code for a code or description fragment, or None. """
+        needle = (text or "").strip().lower()
+        best = None
+
+        for rank, code in self._candidates(needle):
+            if best is None or (rank, code) < best:
+                best = (rank, code)
+
+        self._count(best is not None)
+        return best[1] if best else None
+
+    def stats(self):
+        """ Return catalog size and hit/miss counters. """
+        lookups = self.hits + self.misses
+        return {
+            "violations": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "reloads": self.reloads,
+            "loaded": self._loaded_at is not None,
+        }
+
+    # --- End of Lookups ---
+    # ========================================================
+    # --- Internal helpers ---
+
+    def _set_index(self, rows):
+        """ Build the lookup structures for a set of rows and swap them in at once. """
+        entries = []
+        by_code = {}
+        by_code_lower = {}
+        grams = {}
+        words = {}
+
+        for row in rows:
+            code = row["Violation_Code"]
+            description = row["Violation_Description"] or ""
+            lowered = description.lower()
+            position = len(entries)
+
+            entries.append((code, description, lowered))
+            by_code[code] = description
+            by_code_lower[code.lower()] = code
+            for gram in trigrams(lowered):
+                grams.setdefault(gram, set()).add(position)
+            for word in tokenize(lowered):
+                words.setdefault(word, set()).add(position)
+
+        self._entries, self._by_code, self._by_code_lower, self._grams, self._words = (
+            entries, by_code, by_code_lower, grams, words
+        )
+
+    def _candidates(self, needle):
+        """ Yield (rank, code) for every violation matching the needle. """
+        code = self._by_code_lower.get(needle)
+        if code is not None:
+            yield RANK_CODE, code
+
+        # Substring matches, narrowed down with the trigram index when the needle is long enough
+        if len(needle) >= 3:
+            postings = [self._grams.get(gram, set()) for gram in trigrams(needle)]
+            positions = set.intersection(*postings) if postings else set()
+        else:
+            positions = range(len(self._entries))
+
+        found = False
+        for position in positions:
+            code, _, lowered = self._entries[position]
+            index = lowered.find(needle)
+            if index < 0:
+                continue
+            found = True
+            if lowered == needle:
+                yield RANK_EXACT, code
+            elif index == 0:
+                yield RANK_PREFIX, code
+            elif not lowered[index - 1].isalnum():
+                yield RANK_WORD, code
+            else:
+                yield RANK_SUBSTRING, code
+
+        # Fall back to violations containing every word of the needle, in any order
+        words = tokenize(needle)
+        if not found and words:
+            postings = [self._words.get(word, set()) for word in words]
+            for position in set.intersection(*postings):
+                yield RANK_TOKENS, self._entries[position][0]
+
+    def _count(self, hit):
+        """ Record a lookup as a hit or a miss. """
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    # --- End of Internal helpers ---
+    # ========================================================
+
+# Shared catalog for the application
+catalog = ViolationCatalog()
+
+# end of violation_catalog.py